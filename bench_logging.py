@@ -0,0 +1,41 @@
+# bench_logging.py
+
+import logging
+import tempfile
+import time
+from logging_setup import ContextFilter, JsonFormatter, log_context, setup_logging, stop_logging
+
+# مقایسه‌ی هزینه‌ی لاگ هر آپدیت روی نخ فراخوان: python bench_logging.py
+
+N = 20000
+
+
+def bench(label, handler):
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(logging.INFO)
+    log = logging.getLogger("updates")
+    token = log_context.set({"update_id": 1, "user_id": 42, "handler": "bench"})
+    started = time.perf_counter()
+    for _ in range(N):
+        log.info("handled", extra={"duration_ms": 1.0})
+    elapsed = time.perf_counter() - started
+    log_context.reset(token)
+    print(f"{label:<28} {elapsed / N * 1e6:8.2f} µs/update (caller thread)")
+
+
+if __name__ == "__main__":
+    # خروجی واقعی روی فایل (مثل stderr هدایت‌شده به فایل در سرور)
+    sink = tempfile.TemporaryFile("w")
+    sync = logging.StreamHandler(sink)
+    sync.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+    bench("basicConfig-style sync", sync)
+
+    sync_json = logging.StreamHandler(sink)
+    sync_json.setFormatter(JsonFormatter())
+    sync_json.addFilter(ContextFilter())
+    bench("sync JSON", sync_json)
+
+    setup_logging(stream=sink)
+    bench("queued JSON (logging_setup)", logging.getLogger().handlers[0])
+    stop_logging()
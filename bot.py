@@ -1,6 +1,9 @@
 # bot.py
 
+import asyncio
 import logging
+import sys
+import warnings
 from telegram import (
     Update,
     ReplyKeyboardMarkup,
@@ -14,16 +17,52 @@ from telegram.ext import (
     CallbackQueryHandler,
     ConversationHandler,
     ContextTypes,
+    TypeHandler,
+    ApplicationHandlerStop,
+    PicklePersistence,
+    PersistenceInput,
     filters
 )
-from database.db import SessionLocal, init_db
+from telegram.warnings import PTBUserWarning
+from database.db import SessionLocal, init_db, current_user_id, engine, replica_engine
+from database.query_budget import query_budget
+from database import write_behind, tenancy, ledger
 from database.models import User
-from datetime import datetime
-from handlers import admin, developer
+from datetime import datetime, time as dt_time, timezone
+from handlers import admin, developer, callbacks, profiler, throttle, charts, dashboard, notifications
 import config
+import lifecycle
+import logging_setup
 
-logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
+LEDGER_FINISH_GROUP = 100
+
+# گفتگوها عمداً per-chat هستند؛ دکمه‌های inline داخل همان گفتگو دنبال می‌شوند
+warnings.filterwarnings("ignore", message="If 'per_message=False'", category=PTBUserWarning)
+
+async def skip_processed_updates(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # آپدیت تکراری (راه‌اندازی مجدد، تحویل دوباره) پیش از هر هندلری کنار گذاشته می‌شود
+    callback_id = update.callback_query.id if update.callback_query else None
+    if not ledger.claim(context.bot_data.get("team_id"), update.update_id, callback_id):
+        raise ApplicationHandlerStop
+
+async def record_processed_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # پس از همه‌ی هندلرها: آپدیتی که چیزی commit نکرده هم در دفتر ثبت می‌شود
+    ledger.finish()
+
+async def on_handler_error(update: object, context: ContextTypes.DEFAULT_TYPE):
+    # آپدیت ناموفق ثبت نمی‌شود تا تحویل دوباره‌ی آن از نو پردازش شود
+    if isinstance(update, Update):
+        ledger.fail()
+    logger.error("handler failed", exc_info=context.error)
+
+async def track_current_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # برای مسیریابی read-your-writes در database.db و محدودسازی کوئری‌ها به تیم این ربات
+    current_user_id.set(update.effective_user.id if update.effective_user else None)
+    tenancy.current_team_id.set(context.bot_data.get("team_id"))
+
+@query_budget(4)
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     name = update.effective_user.full_name
@@ -42,8 +81,8 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         db.commit()
         await update.message.reply_text("✅ شما با نقش توسعه‌دهنده ثبت شدید.")
     else:
-        user.last_login = datetime.utcnow()
-        db.commit()
+        # بدون commit در مسیر داغ؛ به‌صورت دسته‌ای نوشته می‌شود
+        write_behind.last_login_buffer.touch(user.id, datetime.utcnow())
 
     # ساخت منو
     buttons = []
@@ -72,6 +111,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     db.close()
 
+@query_budget(5)
 async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
@@ -116,6 +156,7 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     db.close()
 
+@query_budget(4)
 async def handle_menu_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = update.message.text
 
@@ -123,56 +164,85 @@ async def handle_menu_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE
     if text == "🔙 انصراف":
         return await start(update, context)
 
-    db = SessionLocal()
-    user = db.query(User).filter_by(telegram_id=update.effective_user.id).first()
-
-    # مسیردهی گزینه‌ها
+    # مسیردهی گزینه‌ها (هر هندلر خودش دسترسی را بررسی می‌کند)
     if text == "📋 لیست پروژه‌ها":
-        db.close()
         return await admin.list_projects(update, context)
     elif text == "➕ افزودن پروژه":
-        db.close()
         return await admin.add_project(update, context)
     elif text == "➕ افزودن تسک به بک‌لاگ":
-        db.close()
         return await admin.add_task_to_backlog(update, context)
     elif text == "📊 گزارش‌ها":
-        db.close()
-        await update.message.reply_text("یکی از گزینه‌ها:\n- /view_daily_reports\n- /view_sprint_reviews")
+        await update.message.reply_text(
+            "یکی از گزینه‌ها:\n- /view_daily_reports\n- /view_daily_reports archive\n- /view_sprint_reviews\n- /standup_digest\n- /burndown\n- /velocity\n- /dashboard"
+        )
     elif text == "✅ نهایی‌سازی اسپرینت":
-        db.close()
         return await admin.finalize_sprint(update, context)
     elif text == "مدیریت کاربران 👥":
-        db.close()
         return await admin.manage_users(update, context)
     elif text == "📝 ارسال گزارش روزانه":
-        db.close()
         return await developer.send_daily_report(update, context)
     elif text == "📌 تسک‌های من":
-        db.close()
         return await developer.show_my_tasks(update, context)
     elif text == "📌 ارسال تسک برای بازبینی":
-        db.close()
         return await developer.start_task_review(update, context)
     elif text == "🧐 بازبینی تسک‌ها":
-        db.close()
         return await admin.review_tasks(update, context)
     elif text == "🚀 افزودن تسک جدید":
-        db.close()
         return await developer.start_sprint_creation(update, context)
     elif text == "شروع تسک":
-        db.close()
         return await developer.start_task_selection(update, context)
     else:
-        db.close()
         await update.message.reply_text("❗ گزینه‌ی نامعتبر.")
 
-def main():
-    init_db()
-    app = ApplicationBuilder().token(config.BOT_TOKEN).build()
+_background_tasks = []
+
+async def post_init(app):
+    # کارهای دوره‌ای یک بار برای کل پردازه، مستقل از تعداد ربات‌ها
+    if not _background_tasks:
+        _background_tasks.append(asyncio.create_task(write_behind.run_periodic_flush()))
+        _background_tasks.append(asyncio.create_task(ledger.run_periodic_prune()))
+    await asyncio.to_thread(ledger.load_recent, app.bot_data.get("team_id"))
+    dashboard.start(app)
+    notifications.start(app)
+
+async def post_stop(app):
+    # اعلان‌های در انتظار تا bot هنوز باز است ارسال می‌شوند
+    await notifications.flush()
+
+async def post_shutdown(app):
+    while _background_tasks:
+        _background_tasks.pop().cancel()
+    dashboard.stop(app)
+    notifications.stop(app)
+    write_behind.flush_all()
+    charts.shutdown_pool()
+    engine.dispose()
+    if replica_engine is not None:
+        replica_engine.dispose()
+
+def build_app(token, team_id):
+    # user_data، chat_data (داشبوردهای سنجاق‌شده) و وضعیت گفتگوها ذخیره می‌شود؛
+    # bot_data آبجکت‌های زمان اجرا (تسک، پروفایلر) دارد
+    persistence = PicklePersistence(
+        f"{config.PERSISTENCE_FILE}.{team_id}",
+        store_data=PersistenceInput(bot_data=False, chat_data=True, callback_data=False),
+    )
+    app = (
+        ApplicationBuilder().token(token).persistence(persistence)
+        .post_init(post_init).post_stop(post_stop).post_shutdown(post_shutdown).build()
+    )
+    app.bot_data["team_id"] = team_id
+    # ورودی: حذف آپدیت‌های پردازش‌شده، محدودسازی/حذف ضربه‌ی تکراری، سپس ثبت کاربر جاری
+    app.add_handler(TypeHandler(Update, skip_processed_updates), group=-3)
+    app.add_handler(TypeHandler(Update, throttle.throttle_updates), group=-2)
+    app.add_handler(TypeHandler(Update, track_current_user), group=-1)
+    # خروجی: ثبت آپدیت در دفتر پس از گروه هندلرهای اصلی
+    app.add_handler(TypeHandler(Update, record_processed_update), group=LEDGER_FINISH_GROUP)
+    app.add_error_handler(on_handler_error)
 
     # گزارش روزانه
     app.add_handler(ConversationHandler(
+        name="daily_report", persistent=True,
         entry_points=[MessageHandler(filters.Regex("^📝 ارسال گزارش روزانه$"), developer.send_daily_report)],
         states={
             developer.REPORT_COMPLETED: [MessageHandler(filters.TEXT & ~filters.COMMAND, developer.daily_report_completed)],
@@ -184,24 +254,33 @@ def main():
 
     # ارسال تسک برای بازبینی
     app.add_handler(ConversationHandler(
+        name="submit_review", persistent=True,
         entry_points=[MessageHandler(filters.Regex("^📌 ارسال تسک برای بازبینی$"), developer.start_task_review)],
         states={
-            developer.TASK_SELECT_REVIEW: [MessageHandler(filters.TEXT & ~filters.COMMAND, developer.select_task_for_review)],
+            developer.TASK_SELECT_REVIEW: [CallbackQueryHandler(developer.select_task_for_review, pattern=callbacks.pattern(callbacks.SUBMIT_REVIEW))],
         },
-        fallbacks=[MessageHandler(filters.Regex("^❌ انصراف$"), start)]
+        fallbacks=[
+            CallbackQueryHandler(developer.cancel_inline, pattern=callbacks.pattern(callbacks.CANCEL)),
+            MessageHandler(filters.Regex("^❌ انصراف$"), start)
+        ]
     ))
 
     # شروع تسک
     app.add_handler(ConversationHandler(
+        name="start_task", persistent=True,
         entry_points=[MessageHandler(filters.Regex("^شروع تسک$"), developer.start_task_selection)],
         states={
-            developer.SELECT_TASK_TO_START: [MessageHandler(filters.TEXT & ~filters.COMMAND, developer.confirm_task_start)]
+            developer.SELECT_TASK_TO_START: [CallbackQueryHandler(developer.confirm_task_start, pattern=callbacks.pattern(callbacks.START_TASK))]
         },
-        fallbacks=[MessageHandler(filters.Regex("^❌ انصراف$"), start)]
+        fallbacks=[
+            CallbackQueryHandler(developer.cancel_inline, pattern=callbacks.pattern(callbacks.CANCEL)),
+            MessageHandler(filters.Regex("^❌ انصراف$"), start)
+        ]
     ))
 
     # افزودن پروژه
     app.add_handler(ConversationHandler(
+        name="add_project", persistent=True,
         entry_points=[MessageHandler(filters.Regex("^➕ افزودن پروژه$"), admin.add_project)],
         states={admin.ADD_PROJECT_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, admin.save_project)]},
         fallbacks=[MessageHandler(filters.Regex("^🔙 انصراف$"), start)]
@@ -209,33 +288,63 @@ def main():
 
     # افزودن تسک به بک‌لاگ
     app.add_handler(ConversationHandler(
+        name="add_backlog", persistent=True,
         entry_points=[MessageHandler(filters.Regex("^➕ افزودن تسک به بک‌لاگ$"), admin.add_task_to_backlog)],
         states={
-            admin.SELECT_PROJECT_FOR_BACKLOG: [MessageHandler(filters.TEXT & ~filters.COMMAND, admin.receive_backlog_tasks)],
+            admin.SELECT_PROJECT_FOR_BACKLOG: [CallbackQueryHandler(admin.receive_backlog_tasks, pattern=callbacks.pattern(callbacks.BACKLOG_PROJECT))],
             admin.ENTER_BACKLOG_TASKS:        [MessageHandler(filters.TEXT & ~filters.COMMAND, admin.save_backlog_tasks)],
         },
-        fallbacks=[MessageHandler(filters.Regex("^🔙 انصراف$"), start)]
+        fallbacks=[
+            CallbackQueryHandler(developer.cancel_inline, pattern=callbacks.pattern(callbacks.CANCEL)),
+            MessageHandler(filters.Regex("^🔙 انصراف$"), start)
+        ]
     ))
 
     # ساخت اسپرینت (افزودن تسک جدید)
     app.add_handler(ConversationHandler(
+        name="sprint_creation", persistent=True,
         entry_points=[MessageHandler(filters.Regex("^🚀 افزودن تسک جدید$"), developer.start_sprint_creation)],
         states={
-            developer.SELECT_PROJECT_FOR_SPRINT_CREATION: [MessageHandler(filters.TEXT & ~filters.COMMAND, developer.show_backlog_tasks)],
-            developer.SELECT_TASKS_FOR_SPRINT:            [MessageHandler(filters.TEXT & ~filters.COMMAND, developer.collect_tasks_for_sprint)],
+            developer.SELECT_PROJECT_FOR_SPRINT_CREATION: [
+                CallbackQueryHandler(developer.show_backlog_tasks, pattern=callbacks.pattern(callbacks.SPRINT_PROJECT))
+            ],
+            developer.SELECT_TASKS_FOR_SPRINT: [
+                CallbackQueryHandler(developer.collect_tasks_for_sprint, pattern=callbacks.pattern(
+                    callbacks.BACKLOG_TASK, callbacks.BACKLOG_AUTO, callbacks.BACKLOG_DONE, callbacks.BACKLOG_REPICK
+                ))
+            ],
         },
-        fallbacks=[MessageHandler(filters.Regex("^🔙 انصراف$"), start)]
+        fallbacks=[
+            CallbackQueryHandler(developer.cancel_inline, pattern=callbacks.pattern(callbacks.CANCEL)),
+            MessageHandler(filters.Regex("^🔙 انصراف$"), start)
+        ]
     ))
     
     # داخل main() بعد از سایر ConversationHandlers:
     app.add_handler(ConversationHandler(
+        name="review_tasks", persistent=True,
         entry_points=[MessageHandler(filters.Regex("^🧐 بازبینی تسک‌ها$"), developer.start_review_tasks)],
         states={
-            developer.REVIEW_SELECT_TASK: [MessageHandler(filters.TEXT & ~filters.COMMAND, developer.review_select_task)],
+            developer.REVIEW_SELECT_TASK: [CallbackQueryHandler(developer.review_select_task, pattern=callbacks.pattern(callbacks.REVIEW_SELECT))],
             developer.REVIEW_DECISION:    [MessageHandler(filters.TEXT & ~filters.COMMAND, developer.review_decision)],
             developer.REVIEW_REASON:      [MessageHandler(filters.TEXT & ~filters.COMMAND, developer.review_reason)],
         },
-        fallbacks=[MessageHandler(filters.Regex("^🔙 انصراف$"), developer.start_review_tasks)]
+        fallbacks=[
+            CallbackQueryHandler(developer.cancel_inline, pattern=callbacks.pattern(callbacks.CANCEL)),
+            MessageHandler(filters.Regex("^🔙 انصراف$"), developer.start_review_tasks)
+        ]
+    ))
+
+    # بازبینی مدیر از طریق دکمه‌های inline در admin.review_tasks
+    app.add_handler(ConversationHandler(
+        name="admin_review", persistent=True,
+        entry_points=[CallbackQueryHandler(
+            admin.review_decision_callback, pattern=callbacks.pattern(callbacks.ADMIN_APPROVE, callbacks.ADMIN_REJECT)
+        )],
+        states={
+            admin.REVIEW_REASON: [MessageHandler(filters.TEXT & ~filters.COMMAND, admin.review_reason)],
+        },
+        fallbacks=[MessageHandler(filters.Regex("^🔙 انصراف$"), start)]
     ))
 
 
@@ -243,11 +352,55 @@ def main():
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("view_daily_reports", admin.view_daily_reports))
     app.add_handler(CommandHandler("view_sprint_reviews", admin.view_sprint_reviews))
+    app.add_handler(CommandHandler("standup_digest", admin.standup_digest))
+    app.add_handler(CommandHandler("burndown", charts.burndown))
+    app.add_handler(CommandHandler("velocity", charts.velocity))
+    app.add_handler(CommandHandler("dashboard", dashboard.dashboard))
+    app.add_handler(CommandHandler("cache_stats", admin.cache_stats))
+    app.add_handler(CommandHandler("throttle_stats", throttle.throttle_stats))
+    app.add_handler(CommandHandler("archive", admin.archive_old_sprints))
+    app.add_handler(CommandHandler("profile", profiler.profile))
+    app.add_handler(CommandHandler("profile_stop", profiler.profile_stop))
+    app.add_handler(CommandHandler("memsnap", profiler.memory_snapshot))
+    app.add_handler(CallbackQueryHandler(
+        admin.finalize_scope, pattern=callbacks.pattern(callbacks.FINALIZE_SPRINT, callbacks.FINALIZE_PROJECT)
+    ))
     app.add_handler(CallbackQueryHandler(callback_handler))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_menu_buttons))
 
-    print("🤖 Bot is running...")
-    app.run_polling()
+    # کارهای زمان‌بندی‌شده: آرشیو شبانه و خلاصه‌ی استندآپ (نیازمند python-telegram-bot[job-queue])
+    # هر ربات jobهای تیم خودش را اجرا می‌کند
+    if app.job_queue:
+        app.job_queue.run_repeating(tenancy.scoped_job(admin.archive_job), interval=24 * 60 * 60, first=60)
+        hour, minute = map(int, config.DIGEST_TIME.split(":"))
+        app.job_queue.run_daily(
+            tenancy.scoped_job(admin.standup_digest_job), time=dt_time(hour, minute, tzinfo=timezone.utc)
+        )
+    else:
+        logger.error(
+            "job queue unavailable; nightly archive and standup digest are disabled "
+            "(install python-telegram-bot[job-queue])"
+        )
+
+    logging_setup.instrument_handlers(app)
+    return app
+
+def main():
+    logging_setup.setup_logging()
+    logging_setup.install_sql_sampling(engine)
+    if replica_engine is not None:
+        logging_setup.install_sql_sampling(replica_engine)
+
+    def build_apps():
+        init_db()
+        # همه‌ی ربات‌ها در یک حلقه‌ی رویداد و روی یک engine اجرا می‌شوند
+        team_ids = tenancy.setup_teams(config.BOT_TOKENS)
+        apps = [build_app(token, team_id) for token, team_id in zip(config.BOT_TOKENS, team_ids)]
+        print("🤖 Bot is running...")
+        return apps
+
+    # بررسی فایل PID و handover پیش از init_db: مهاجرت شِما تا خروج پردازه‌ی قبلی انجام نمی‌شود
+    lifecycle.run(build_apps, handover="--handover" in sys.argv)
 
 if __name__ == "__main__":
     main()
@@ -4,4 +4,59 @@ from dotenv import load_dotenv
 load_dotenv()
 
 BOT_TOKEN = os.getenv("TELEGRAM_TOKEN")
-DB_URL = os.getenv("SQLALCHEMY_DATABASE_URL")
\ No newline at end of file
+DB_URL = os.getenv("SQLALCHEMY_DATABASE_URL")
+# اختیاری: رپلیکای فقط‌خواندنی برای گزارش‌ها
+DB_REPLICA_URL = os.getenv("SQLALCHEMY_REPLICA_URL")
+# تا چند ثانیه پس از commit کاربر، خواندن‌های او از primary انجام شود
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+# آرشیو: داده‌های اسپرینت‌های بسته‌شده، به‌جز N اسپرینت آخر، به جداول آرشیو منتقل می‌شوند
+ARCHIVE_KEEP_SPRINTS = int(os.getenv("ARCHIVE_KEEP_SPRINTS", "3"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+
+# برنامه‌ریزی اسپرینت: ظرفیت پیش‌فرض (story point) وقتی سابقه‌ای نیست و تعداد اسپرینت‌های مبنای velocity
+PLANNING_DEFAULT_CAPACITY = int(os.getenv("PLANNING_DEFAULT_CAPACITY", "10"))
+PLANNING_VELOCITY_SPRINTS = int(os.getenv("PLANNING_VELOCITY_SPRINTS", "3"))
+
+# لاگ‌ها: سطح لاگ و نرخ نمونه‌برداری از دستورات SQL (0 تا 1)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+SQL_LOG_SAMPLE_RATE = float(os.getenv("SQL_LOG_SAMPLE_RATE", "0.01"))
+
+# ساعت ارسال خلاصه‌ی استندآپ روزانه (UTC، قالب HH:MM)
+DIGEST_TIME = os.getenv("DIGEST_TIME", "17:00")
+
+# بودجه‌ی کوئری هندلرها: در حالت strict (محیط توسعه) عبور از بودجه خطا می‌دهد، وگرنه فقط هشدار لاگ می‌شود
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "0") == "1"
+
+# محدودسازی ورودی: توکن‌باکت برای هر کاربر/چت و پنجره‌ی حذف ضربه‌ی تکراری
+THROTTLE_RATE = float(os.getenv("THROTTLE_RATE", "2"))        # توکن در ثانیه
+THROTTLE_BURST = int(os.getenv("THROTTLE_BURST", "8"))
+DEDUPE_WINDOW_SECONDS = float(os.getenv("DEDUPE_WINDOW_SECONDS", "2"))
+
+# write-behind: فاصله‌ی ثبت دسته‌ای به‌روزرسانی‌های کم‌اهمیت (مثل last_login) به ثانیه
+WRITE_BEHIND_INTERVAL = float(os.getenv("WRITE_BEHIND_INTERVAL", "30"))
+
+# رندر نمودارها در پردازه‌های جدا
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", "2"))
+
+# داشبورد زنده‌ی اسپرینت: تغییرات تسک‌ها در این بازه (ثانیه) در یک ویرایش پیام جمع می‌شوند
+DASHBOARD_DEBOUNCE_SECONDS = float(os.getenv("DASHBOARD_DEBOUNCE_SECONDS", "3"))
+
+# خاموشی امن و جابه‌جایی پردازه: مهلت تمام‌کردن آپدیت‌های در حال پردازش، فایل PID و فایل وضعیت گفتگوها
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "20"))
+PID_FILE = os.getenv("BOT_PID_FILE", "bot.pid")
+PERSISTENCE_FILE = os.getenv("BOT_PERSISTENCE_FILE", "bot_state.pickle")
+
+# اعلان‌های بازبینی: بازه‌ی جمع‌کردن رویدادها برای هر گیرنده (ثانیه) و حداکثر ارسال هم‌زمان
+NOTIFY_BATCH_SECONDS = float(os.getenv("NOTIFY_BATCH_SECONDS", "2"))
+NOTIFY_CONCURRENCY = int(os.getenv("NOTIFY_CONCURRENCY", "8"))
+
+# چند تیم در یک پردازه: توکن ربات هر تیم، جداشده با کاما (پیش‌فرض: همان TELEGRAM_TOKEN)
+BOT_TOKENS = [t.strip() for t in os.getenv("TELEGRAM_TOKENS", "").split(",") if t.strip()] or [BOT_TOKEN]
+
+# خروجی/ورودی snapshot: تعداد ردیف در هر تکه‌ی خواندن/نوشتن
+SNAPSHOT_CHUNK_SIZE = int(os.getenv("SNAPSHOT_CHUNK_SIZE", "5000"))
+
+# دفتر آپدیت‌های پردازش‌شده: مدت نگهداری (ساعت) و تعداد شناسه‌های نگه‌داشته در حافظه برای هر ربات
+LEDGER_RETENTION_HOURS = float(os.getenv("LEDGER_RETENTION_HOURS", "48"))
+LEDGER_MEMORY_SIZE = int(os.getenv("LEDGER_MEMORY_SIZE", "100000"))
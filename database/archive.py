@@ -0,0 +1,77 @@
+# database/archive.py
+
+from datetime import datetime
+from sqlalchemy import select, insert, delete, literal
+from database.db import SessionLocal
+from database.models import (
+    Sprint,
+    Task,
+    DailyReport,
+    Retrospective,
+    ArchivedTask,
+    ArchivedDailyReport,
+    ArchivedRetrospective
+)
+import config
+
+# انتقال داده‌های سرد (اسپرینت‌های بسته‌شده‌ی قدیمی) از جداول اصلی به جداول آرشیو.
+# هر دسته در یک تراکنش جدا: INSERT ... SELECT و سپس DELETE با همان شناسه‌ها.
+
+# (مدل اصلی، مدل آرشیو، شرط اضافه روی ردیف‌ها)
+_ARCHIVE_PLAN = [
+    (Task, ArchivedTask, lambda: Task.status == "Completed"),
+    (DailyReport, ArchivedDailyReport, None),
+    (Retrospective, ArchivedRetrospective, None),
+]
+
+
+def closed_sprints_to_archive(session, keep=None):
+    keep = config.ARCHIVE_KEEP_SPRINTS if keep is None else keep
+    rows = (
+        session.query(Sprint.id)
+        .filter(Sprint.status == "Completed")
+        .order_by(Sprint.id.desc())
+        .offset(keep)
+        .all()
+    )
+    return [r.id for r in rows]
+
+
+def _archive_model(session, model, archive_model, extra, sprint_ids, batch_size):
+    columns = [c.name for c in model.__table__.columns]
+    moved = 0
+    while True:
+        cond = [model.sprint_id.in_(sprint_ids)]
+        if extra is not None:
+            cond.append(extra())
+        ids = session.scalars(select(model.id).where(*cond).order_by(model.id).limit(batch_size)).all()
+        if not ids:
+            break
+
+        src = select(*[getattr(model, c) for c in columns], literal(datetime.utcnow()).label("archived_at")) \
+            .where(model.id.in_(ids))
+        session.execute(insert(archive_model).from_select(columns + ["archived_at"], src))
+        session.execute(delete(model).where(model.id.in_(ids)), execution_options={"synchronize_session": False})
+        session.commit()
+        moved += len(ids)
+    return moved
+
+
+def run_archival(keep=None, batch_size=None):
+    batch_size = batch_size or config.ARCHIVE_BATCH_SIZE
+    session = SessionLocal()
+    try:
+        sprint_ids = closed_sprints_to_archive(session, keep)
+        result = {}
+        if not sprint_ids:
+            return result
+        for model, archive_model, extra in _ARCHIVE_PLAN:
+            result[model.__tablename__] = _archive_model(
+                session, model, archive_model, extra, sprint_ids, batch_size
+            )
+        return result
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
@@ -0,0 +1,146 @@
+# database/cache.py
+
+import threading
+from collections import OrderedDict, defaultdict
+from sqlalchemy import event
+from database.db import SessionLocal, on_primary
+from database.models import Project, Task
+from database.tenancy import current_team_id
+
+# کش نتایج کوئری‌های پرتکرار (لیست پروژه‌ها، بک‌لاگ) که با commit جداول مربوطه باطل می‌شود.
+# مقادیر کش‌شده باید داده‌ی ساده (Row / tuple) باشند، نه آبجکت‌های ORM متصل به session.
+
+
+class QueryCache:
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()          # key -> (tables, value)
+        self._keys_by_table = defaultdict(set)
+        self._generations = defaultdict(int)   # table -> شمارنده‌ی باطل‌سازی
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get_or_load(self, key, tables, loader):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generations = [self._generations[table] for table in tables]
+
+        # بارگذاری بیرون از قفل؛ خواندن از primary تا مقدار کش‌شده از رپلیکای عقب‌مانده نیاید
+        with on_primary():
+            value = loader()
+
+        with self._lock:
+            # اگر در حین بارگذاری commit جدول‌ها را باطل کرده باشد، نتیجه ممکن است کهنه باشد
+            if generations != [self._generations[table] for table in tables]:
+                return value
+            self._entries[key] = (tuple(tables), value)
+            self._entries.move_to_end(key)
+            for table in tables:
+                self._keys_by_table[table].add(key)
+            while len(self._entries) > self.maxsize:
+                old_key, (old_tables, _) = self._entries.popitem(last=False)
+                for table in old_tables:
+                    self._keys_by_table[table].discard(old_key)
+                self.evictions += 1
+        return value
+
+    def invalidate_tables(self, tables):
+        with self._lock:
+            for table in tables:
+                self._generations[table] += 1
+                for key in self._keys_by_table.pop(table, ()):
+                    if self._entries.pop(key, None) is not None:
+                        self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_table.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+query_cache = QueryCache()
+
+
+# ============================
+# Invalidation via session events
+# ============================
+def _dirty_tables(session):
+    return session.info.setdefault("cache_dirty_tables", set())
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_flushed_tables(session, flush_context):
+    tables = _dirty_tables(session)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, "__table__", None)
+        if table is not None:
+            tables.add(table.name)
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _collect_bulk_tables(orm_execute_state):
+    # دستورات مجموعه‌ای update()/delete() از flush عبور نمی‌کنند
+    if orm_execute_state.is_select:
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    if table is not None:
+        _dirty_tables(orm_execute_state.session).add(table.name)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _invalidate_on_commit(session):
+    tables = session.info.pop("cache_dirty_tables", None)
+    if tables:
+        query_cache.invalidate_tables(tables)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("cache_dirty_tables", None)
+
+
+# ============================
+# Cached queries
+# ============================
+def all_projects(session):
+    return query_cache.get_or_load(
+        ("projects:all", current_team_id.get()), ["projects"],
+        lambda: session.query(Project.id, Project.name, Project.created_at).all()
+    )
+
+
+def projects_by_creator(session, user_id):
+    return query_cache.get_or_load(
+        ("projects:creator", current_team_id.get(), user_id), ["projects"],
+        lambda: session.query(Project.id, Project.name, Project.created_at)
+                       .filter(Project.created_by == user_id).all()
+    )
+
+
+def backlog_tasks(session, project_id):
+    return query_cache.get_or_load(
+        ("tasks:backlog", current_team_id.get(), project_id), ["tasks"],
+        lambda: session.query(Task.id, Task.title, Task.story_point)
+                       .filter(Task.project_id == project_id, Task.status == "Backlog")
+                       .order_by(Task.id).all()
+    )
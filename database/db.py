@@ -1,10 +1,77 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from config import DB_URL
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker, Session
+from config import DB_URL, DB_REPLICA_URL, READ_YOUR_WRITES_SECONDS
 from database.models import Base
+from database import migrate
+
+engine = create_engine(DB_URL)
+replica_engine = create_engine(DB_REPLICA_URL) if DB_REPLICA_URL else None
+
+# کاربر آپدیت جاری و اینکه هندلر فعلی فقط‌خواندنی است
+current_user_id = ContextVar("current_user_id", default=None)
+_read_only = ContextVar("read_only", default=False)
+_last_write = {}  # telegram_id -> زمان آخرین commit
+
+
+def _recently_wrote(user_id):
+    ts = _last_write.get(user_id)
+    return ts is not None and time.monotonic() - ts < READ_YOUR_WRITES_SECONDS
+
+
+class RoutingSession(Session):
+    # خواندن‌های هندلرهای فقط‌خواندنی به رپلیکا می‌روند، مگر اینکه کاربر همین الان چیزی نوشته باشد
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if (
+            replica_engine is not None
+            and _read_only.get()
+            and not self._flushing
+            and not _recently_wrote(current_user_id.get())
+        ):
+            return replica_engine
+        return engine
+
+
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _remember_write(session):
+    user_id = current_user_id.get()
+    if user_id is None:
+        return
+    now = time.monotonic()
+    _last_write[user_id] = now
+    if len(_last_write) > 10000:
+        for uid, ts in list(_last_write.items()):
+            if now - ts >= READ_YOUR_WRITES_SECONDS:
+                del _last_write[uid]
+
+
+def read_only(handler):
+    @functools.wraps(handler)
+    async def wrapper(update, context, *args, **kwargs):
+        token = _read_only.set(True)
+        try:
+            return await handler(update, context, *args, **kwargs)
+        finally:
+            _read_only.reset(token)
+    return wrapper
+
+
+@contextmanager
+def on_primary():
+    # خواندن‌های داخل این بلوک حتی در هندلر فقط‌خواندنی از primary انجام می‌شوند
+    token = _read_only.set(False)
+    try:
+        yield
+    finally:
+        _read_only.reset(token)
 
-engine = create_engine(DB_URL, echo=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+    migrate.upgrade(engine)
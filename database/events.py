@@ -0,0 +1,41 @@
+# database/events.py
+
+import logging
+from collections import namedtuple
+from sqlalchemy import event
+from database.db import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# گذرگاه رویداد داخلی: رویدادها در session ثبت و فقط پس از commit موفق به مشترک‌ها تحویل داده می‌شوند.
+# مشترک‌ها همگام و در همان نخِ commit صدا زده می‌شوند و باید سریع برگردند (کار اصلی را زمان‌بندی کنند).
+
+TaskTransition = namedtuple("TaskTransition", "task_id from_status to_status")
+
+_subscribers = []
+
+
+def subscribe(fn):
+    _subscribers.append(fn)
+    return fn
+
+
+def record(session, evt):
+    session.info.setdefault("pending_events", []).append(evt)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _publish_on_commit(session):
+    events = session.info.pop("pending_events", None)
+    if not events:
+        return
+    for fn in _subscribers:
+        try:
+            fn(events)
+        except Exception:
+            logger.exception("event subscriber failed", extra={"subscriber": fn.__qualname__})
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("pending_events", None)
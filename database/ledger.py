@@ -0,0 +1,159 @@
+# database/ledger.py
+
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from sqlalchemy import event, select, delete
+from sqlalchemy.exc import IntegrityError
+from database.db import SessionLocal
+from database.models import ProcessedUpdate
+import config
+
+logger = logging.getLogger(__name__)
+
+# پردازش دقیقاً‌یک‌باره‌ی آپدیت‌ها، حتی پس از راه‌اندازی مجدد یا تحویل دوباره (webhook).
+# - در ورودی، update_id و شناسه‌ی callback query در مجموعه‌ی حافظه (O(1)) بررسی می‌شوند؛
+#   این مجموعه هنگام شروع از جدول processed_updates پر می‌شود.
+# - ردیف دفتر در before_commit همان session هندلر، یعنی در همان تراکنش اثرات آن، نوشته می‌شود
+#   و کلید فقط پس از commit به مجموعه‌ی حافظه اضافه می‌شود. هندلری که خطا دهد یا rollback کند
+#   ثبت نمی‌شود و تحویل دوباره‌ی آن دوباره پردازش می‌شود.
+#   اگر پردازه‌ی دیگری همان آپدیت را زودتر ثبت کرده باشد، کلید اصلی تکراری کل تراکنش را باطل می‌کند.
+# - آپدیتی که هندلرش commit نکرده (فقط‌خواندنی) در پایان پردازش با finish() ثبت می‌شود.
+# - ردیف‌های قدیمی‌تر از LEDGER_RETENTION_HOURS به‌صورت دوره‌ای حذف می‌شوند.
+
+# آپدیت جاری: {"team_id", "update_id", "callback_id", "recorded", "failed"}
+current_update = ContextVar("current_update", default=None)
+
+_lock = threading.Lock()
+_seen = {}  # team_id -> OrderedDict(key -> None)
+
+
+def _keys(update_id, callback_id):
+    return [("u", update_id)] + ([("c", callback_id)] if callback_id else [])
+
+
+def _remember(team_id, keys):
+    seen = _seen.setdefault(team_id, OrderedDict())
+    for key in keys:
+        seen[key] = None
+        seen.move_to_end(key)
+    while len(seen) > config.LEDGER_MEMORY_SIZE:
+        seen.popitem(last=False)
+
+
+def claim(team_id, update_id, callback_id=None):
+    # False یعنی این آپدیت قبلاً پردازش شده و باید نادیده گرفته شود
+    team_id = team_id or 0
+    with _lock:
+        seen = _seen.get(team_id, ())
+        if any(key in seen for key in _keys(update_id, callback_id)):
+            return False
+    current_update.set({
+        "team_id": team_id, "update_id": update_id, "callback_id": callback_id,
+        "recorded": False, "failed": False,
+    })
+    return True
+
+
+def fail():
+    # هندلر آپدیت جاری خطا داد؛ finish آن را ثبت نمی‌کند تا تحویل دوباره پردازش شود
+    state = current_update.get()
+    if state is not None:
+        state["failed"] = True
+
+
+def finish():
+    # آپدیتی که هندلرش چیزی commit نکرده هم ثبت می‌شود تا پس از راه‌اندازی مجدد تکرار نشود
+    state = current_update.get()
+    if state is None or state["recorded"] or state["failed"]:
+        return False
+    session = SessionLocal()
+    try:
+        session.commit()  # ردیف در before_commit اضافه می‌شود
+        return True
+    except IntegrityError:
+        # پردازه‌ی دیگری همین آپدیت را زودتر ثبت کرده است
+        session.rollback()
+        return False
+    finally:
+        session.close()
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _record_in_same_transaction(session):
+    state = current_update.get()
+    if state is None or state["recorded"] or state["failed"]:
+        return
+    # در همان flush پیش از COMMIT نوشته می‌شود
+    session.add(ProcessedUpdate(
+        team_id=state["team_id"],
+        update_id=state["update_id"],
+        callback_id=state["callback_id"],
+        processed_at=datetime.utcnow(),
+    ))
+    state["recorded"] = True
+    session.info["ledger_row"] = state
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _remember_on_commit(session):
+    state = session.info.pop("ledger_row", None)
+    if state is not None:
+        with _lock:
+            _remember(state["team_id"], _keys(state["update_id"], state["callback_id"]))
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _forget_on_rollback(session):
+    # تراکنش شامل ردیف دفتر باطل شد؛ commit بعدی همین آپدیت دوباره آن را می‌نویسد
+    state = session.info.pop("ledger_row", None)
+    if state is not None:
+        state["recorded"] = False
+
+
+def load_recent(team_id):
+    team_id = team_id or 0
+    cutoff = datetime.utcnow() - timedelta(hours=config.LEDGER_RETENTION_HOURS)
+    session = SessionLocal()
+    try:
+        rows = session.execute(
+            select(ProcessedUpdate.update_id, ProcessedUpdate.callback_id)
+            .where(ProcessedUpdate.team_id == team_id, ProcessedUpdate.processed_at >= cutoff)
+            .order_by(ProcessedUpdate.update_id.desc())
+            .limit(config.LEDGER_MEMORY_SIZE)
+        ).all()
+    finally:
+        session.close()
+    keys = []
+    for update_id, callback_id in reversed(rows):
+        keys += _keys(update_id, callback_id)
+    with _lock:
+        _remember(team_id, keys)
+    return len(rows)
+
+
+def prune(retention_hours=None):
+    retention_hours = config.LEDGER_RETENTION_HOURS if retention_hours is None else retention_hours
+    cutoff = datetime.utcnow() - timedelta(hours=retention_hours)
+    session = SessionLocal()
+    try:
+        result = session.execute(
+            delete(ProcessedUpdate).where(ProcessedUpdate.processed_at < cutoff),
+            execution_options={"synchronize_session": False}
+        )
+        session.commit()
+        return result.rowcount
+    finally:
+        session.close()
+
+
+async def run_periodic_prune(interval=60 * 60):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(prune)
+        except Exception:
+            logger.exception("ledger prune failed")
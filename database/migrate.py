@@ -0,0 +1,144 @@
+# database/migrate.py
+
+import logging
+from sqlalchemy import inspect, MetaData, UniqueConstraint
+from sqlalchemy.schema import CreateTable
+from database.models import Base
+
+logger = logging.getLogger(__name__)
+
+# ارتقای پایگاه‌داده‌های موجود. create_all جدول‌های موجود را تغییر نمی‌دهد، پس ستون‌ها و ایندکس‌هایی
+# که بعداً به مدل‌ها اضافه شده‌اند اینجا با ALTER TABLE / CREATE INDEX ساخته می‌شوند.
+# هر مرحله ابتدا با inspector بررسی می‌شود؛ اجرای دوباره بی‌اثر است.
+
+# قیدهای یکتای قدیمی که دیگر در مدل نیستند: (جدول، ستون‌ها)
+# users.telegram_id با چندتیمی شدن فقط در هر تیم یکتاست (UniqueConstraint('team_id', 'telegram_id'))
+DROPPED_UNIQUES = [
+    ("users", ["telegram_id"]),
+]
+
+
+def _literal(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _column_ddl(column, dialect):
+    quote = dialect.identifier_preparer.quote
+    ddl = f"{quote(column.name)} {column.type.compile(dialect=dialect)}"
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if default is not None:
+        # ردیف‌های موجود مقدار پیش‌فرض مدل را می‌گیرند (مثلاً version = 0)
+        ddl += f" DEFAULT {_literal(default)}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+    for fk in column.foreign_keys:
+        ddl += f" REFERENCES {quote(fk.column.table.name)}({quote(fk.column.name)})"
+    return ddl
+
+
+def _add_columns(conn):
+    inspector = inspect(conn)
+    existing = set(inspector.get_table_names())
+    quote = conn.dialect.identifier_preparer.quote
+    steps = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing:
+            continue
+        present = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in present:
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {quote(table.name)} ADD COLUMN {_column_ddl(column, conn.dialect)}"
+                )
+                steps.append(f"{table.name}.{column.name}")
+    return steps
+
+
+def _unique_column_sets(inspector, table_name):
+    found = {}
+    for uc in inspector.get_unique_constraints(table_name):
+        found[tuple(uc["column_names"])] = uc["name"]
+    for ix in inspector.get_indexes(table_name):
+        if ix.get("unique"):
+            found.setdefault(tuple(ix["column_names"]), ix["name"])
+    return found
+
+
+def _rebuild_sqlite_table(conn, table):
+    # SQLite قید را با ALTER TABLE حذف نمی‌کند؛ جدول با شِمای مدل از نو ساخته و داده کپی می‌شود.
+    # ایندکس‌ها بعداً در _add_indexes ساخته می‌شوند.
+    quote = conn.dialect.identifier_preparer.quote
+    metadata = MetaData()
+    for fk in table.foreign_keys:
+        fk.column.table.to_metadata(metadata)
+    temp = table.to_metadata(metadata, name=f"{table.name}__upgrade")
+    temp.indexes.clear()
+    conn.exec_driver_sql(str(CreateTable(temp).compile(dialect=conn.dialect)))
+    columns = ", ".join(quote(c.name) for c in table.columns)
+    conn.exec_driver_sql(
+        f"INSERT INTO {quote(temp.name)} ({columns}) SELECT {columns} FROM {quote(table.name)}"
+    )
+    conn.exec_driver_sql(f"DROP TABLE {quote(table.name)}")
+    conn.exec_driver_sql(f"ALTER TABLE {quote(temp.name)} RENAME TO {quote(table.name)}")
+
+
+def _replace_uniques(conn):
+    inspector = inspect(conn)
+    existing = set(inspector.get_table_names())
+    quote = conn.dialect.identifier_preparer.quote
+    steps = []
+    for table_name, columns in DROPPED_UNIQUES:
+        if table_name not in existing:
+            continue
+        uniques = _unique_column_sets(inspector, table_name)
+        if tuple(columns) not in uniques:
+            continue
+        table = Base.metadata.tables[table_name]
+        if conn.dialect.name == "sqlite":
+            _rebuild_sqlite_table(conn, table)
+            steps.append(f"rebuild {table_name}")
+            continue
+
+        name = uniques[tuple(columns)]
+        drop = "DROP INDEX" if conn.dialect.name == "mysql" else "DROP CONSTRAINT"
+        conn.exec_driver_sql(f"ALTER TABLE {quote(table_name)} {drop} {quote(name)}")
+        for constraint in table.constraints:
+            if not isinstance(constraint, UniqueConstraint):
+                continue
+            cols = tuple(c.name for c in constraint.columns)
+            if cols not in uniques:
+                name = quote(f"uq_{table_name}_{'_'.join(cols)}")
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {quote(table_name)} ADD CONSTRAINT {name} UNIQUE ({', '.join(map(quote, cols))})"
+                )
+        steps.append(f"unique {table_name}({', '.join(columns)})")
+    return steps
+
+
+def _add_indexes(conn):
+    inspector = inspect(conn)
+    steps = []
+    for table in Base.metadata.sorted_tables:
+        present = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in present:
+                index.create(bind=conn)
+                steps.append(index.name)
+    return steps
+
+
+def upgrade(engine):
+    # پس از create_all اجرا شود تا جدول‌های جدید پیش‌تر ساخته شده باشند
+    with engine.begin() as conn:
+        steps = _add_columns(conn)
+    with engine.begin() as conn:
+        steps += _replace_uniques(conn)
+    with engine.begin() as conn:
+        steps += _add_indexes(conn)
+    if steps:
+        logger.info("schema upgraded", extra={"steps": steps})
+    return steps
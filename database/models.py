@@ -1,13 +1,31 @@
-from sqlalchemy import Column, Integer, String, Text, Date, DateTime, Enum, ForeignKey, Float, BigInteger, Boolean
+from sqlalchemy import (
+    Column, Integer, String, Text, Date, DateTime, Enum, ForeignKey, Float, BigInteger, Boolean,
+    Index, UniqueConstraint
+)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
 Base = declarative_base()
 
+# هر تیم یک ربات (توکن) دارد؛ جداول تیمی ستون team_id دارند و ایندکس‌هایشان با team_id شروع می‌شود
+# تا هزینه‌ی کوئری هر تیم به حجم داده‌ی تیم‌های دیگر وابسته نباشد (database/tenancy.py).
+class Team(Base):
+    __tablename__ = 'teams'
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100))
+    bot_id = Column(BigInteger, unique=True)  # بخش عددی توکن ربات
+    created_at = Column(DateTime)
+
+
 class User(Base):
     __tablename__ = 'users'
+    __table_args__ = (
+        UniqueConstraint('team_id', 'telegram_id'),
+        Index('ix_users_team_role', 'team_id', 'role'),
+    )
     id = Column(Integer, primary_key=True)
-    telegram_id = Column(BigInteger, unique=True)
+    team_id = Column(Integer, ForeignKey('teams.id'))
+    telegram_id = Column(BigInteger)
     name = Column(String(100))
     role = Column(Enum('ProductOwner', 'Developer', 'CEO'))
     joined_at = Column(DateTime)
@@ -24,7 +42,9 @@ class User(Base):
 
 class Project(Base):
     __tablename__ = 'projects'
+    __table_args__ = (Index('ix_projects_team_creator', 'team_id', 'created_by'),)
     id = Column(Integer, primary_key=True)
+    team_id = Column(Integer, ForeignKey('teams.id'))
     name = Column(String(150))
     description = Column(Text)
     created_by = Column(Integer, ForeignKey('users.id'))
@@ -33,7 +53,12 @@ class Project(Base):
 
 class Sprint(Base):
     __tablename__ = 'sprints'
+    __table_args__ = (
+        Index('ix_sprints_team_status', 'team_id', 'status'),
+        Index('ix_sprints_team_creator_status', 'team_id', 'created_by', 'status'),
+    )
     id = Column(Integer, primary_key=True)
+    team_id = Column(Integer, ForeignKey('teams.id'))
     start_date = Column(Date)
     end_date = Column(Date)
     status = Column(Enum('Active', 'Completed'))
@@ -47,7 +72,14 @@ class Sprint(Base):
 
 class Task(Base):
     __tablename__ = 'tasks'
+    __table_args__ = (
+        Index('ix_tasks_team_status', 'team_id', 'status'),
+        Index('ix_tasks_team_sprint_status', 'team_id', 'sprint_id', 'status'),
+        Index('ix_tasks_team_assignee_status', 'team_id', 'assigned_to', 'status'),
+        Index('ix_tasks_team_project_status', 'team_id', 'project_id', 'status'),
+    )
     id = Column(Integer, primary_key=True)
+    team_id = Column(Integer, ForeignKey('teams.id'))
     sprint_id = Column(Integer, ForeignKey('sprints.id'), nullable=True)
     title = Column(String(255))
     description = Column(Text)
@@ -57,11 +89,19 @@ class Task(Base):
     created_at = Column(DateTime)
     reviewed = Column(Boolean, default=False)
     project_id = Column(Integer, ForeignKey('projects.id'))
+    reason = Column(Text, nullable=True)  # دلیل آخرین رد در بازبینی
+    version = Column(Integer, nullable=False, default=0)  # برای به‌روزرسانی شرطی (optimistic locking)
+    completed_at = Column(DateTime, nullable=True)  # زمان تأیید نهایی؛ مبنای نمودار burndown
 
 
 class DailyReport(Base):
     __tablename__ = 'dailyreports'
+    __table_args__ = (
+        Index('ix_dailyreports_team_date', 'team_id', 'report_date'),
+        Index('ix_dailyreports_team_sprint', 'team_id', 'sprint_id'),
+    )
     id = Column(Integer, primary_key=True)
+    team_id = Column(Integer, ForeignKey('teams.id'))
     user_id = Column(Integer, ForeignKey('users.id'))
     sprint_id = Column(Integer, ForeignKey('sprints.id'))
     report_date = Column(Date)
@@ -72,7 +112,9 @@ class DailyReport(Base):
 
 class SprintReview(Base):
     __tablename__ = 'sprintreviews'
+    __table_args__ = (Index('ix_sprintreviews_team_sprint', 'team_id', 'sprint_id'),)
     id = Column(Integer, primary_key=True)
+    team_id = Column(Integer, ForeignKey('teams.id'))
     sprint_id = Column(Integer, ForeignKey('sprints.id'))
     created_by = Column(Integer, ForeignKey('users.id'))
     review_date = Column(Date)
@@ -82,8 +124,75 @@ class SprintReview(Base):
 
 class Retrospective(Base):
     __tablename__ = 'retrospectives'
+    __table_args__ = (Index('ix_retrospectives_team_sprint', 'team_id', 'sprint_id'),)
     id = Column(Integer, primary_key=True)
+    team_id = Column(Integer, ForeignKey('teams.id'))
     sprint_id = Column(Integer, ForeignKey('sprints.id'))
     held_by = Column(Integer, ForeignKey('users.id'))
     retro_date = Column(Date)
     discussion_points = Column(Text)
+
+
+class ProcessedUpdate(Base):
+    # دفتر آپدیت‌های پردازش‌شده برای پردازش دقیقاً‌یک‌باره (database/ledger.py)
+    __tablename__ = 'processed_updates'
+    __table_args__ = (UniqueConstraint('team_id', 'callback_id'),)
+    team_id = Column(Integer, primary_key=True, autoincrement=False)
+    update_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    callback_id = Column(String(64), nullable=True)
+    processed_at = Column(DateTime, index=True)
+
+
+# ============================
+# Archive (cold) tables
+# ============================
+# داده‌های اسپرینت‌های بسته‌شده‌ی قدیمی توسط database/archive.py به این جداول منتقل می‌شوند.
+# شناسه‌ها همان شناسه‌های جدول اصلی هستند.
+
+class ArchivedTask(Base):
+    __tablename__ = 'tasks_archive'
+    __table_args__ = (Index('ix_tasks_archive_team_sprint', 'team_id', 'sprint_id'),)
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    team_id = Column(Integer)
+    sprint_id = Column(Integer)
+    title = Column(String(255))
+    description = Column(Text)
+    assigned_to = Column(Integer, index=True)
+    status = Column(String(20))
+    story_point = Column(Integer, nullable=True)
+    created_at = Column(DateTime)
+    reviewed = Column(Boolean, default=False)
+    project_id = Column(Integer)
+    reason = Column(Text, nullable=True)
+    version = Column(Integer, nullable=False, default=0)
+    completed_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime)
+
+
+class ArchivedDailyReport(Base):
+    __tablename__ = 'dailyreports_archive'
+    __table_args__ = (
+        Index('ix_dailyreports_archive_team_sprint', 'team_id', 'sprint_id'),
+        Index('ix_dailyreports_archive_team_date', 'team_id', 'report_date'),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    team_id = Column(Integer)
+    user_id = Column(Integer)
+    sprint_id = Column(Integer)
+    report_date = Column(Date)
+    completed_tasks = Column(Text)
+    planned_tasks = Column(Text)
+    blockers = Column(Text)
+    archived_at = Column(DateTime)
+
+
+class ArchivedRetrospective(Base):
+    __tablename__ = 'retrospectives_archive'
+    __table_args__ = (Index('ix_retrospectives_archive_team_sprint', 'team_id', 'sprint_id'),)
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    team_id = Column(Integer)
+    sprint_id = Column(Integer)
+    held_by = Column(Integer)
+    retro_date = Column(Date)
+    discussion_points = Column(Text)
+    archived_at = Column(DateTime)
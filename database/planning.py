@@ -0,0 +1,169 @@
+# database/planning.py
+
+from datetime import datetime
+from sqlalchemy import select, update, insert, func, case, union_all
+from database.models import User, Sprint, Task, SprintReview, ArchivedTask
+import config
+
+# برنامه‌ریزی اسپرینت بر اساس ظرفیت: velocity از اسپرینت‌های بسته‌شده‌ی قبلی،
+# انتخاب تسک‌ها با کوله‌پشتی 0/1، و ثبت کل انتخاب با یک UPDATE.
+# بستن اسپرینت هم مجموعه‌ای است: تعداد دستورها به تعداد تسک‌ها بستگی ندارد.
+
+
+def velocity(session, user_id, sprints=None):
+    # میانگین story point تکمیل‌شده در آخرین اسپرینت‌های کاربر (جداول اصلی + آرشیو)
+    sprints = sprints or config.PLANNING_VELOCITY_SPRINTS
+    closed = (
+        select(Sprint.id)
+        .where(Sprint.created_by == user_id, Sprint.status == "Completed")
+        .order_by(Sprint.id.desc())
+        .limit(sprints)
+        .subquery()
+    )
+    done = union_all(
+        select(Task.sprint_id, Task.story_point)
+        .where(Task.sprint_id.in_(select(closed.c.id)), Task.status == "Completed"),
+        select(ArchivedTask.sprint_id, ArchivedTask.story_point)
+        .where(ArchivedTask.sprint_id.in_(select(closed.c.id)), ArchivedTask.status == "Completed"),
+    ).subquery()
+    # اسپرینت بسته‌شده‌ی بدون تسک تکمیل‌شده با امتیاز صفر در میانگین حساب می‌شود
+    per_sprint = (
+        select(func.coalesce(func.sum(done.c.story_point), 0).label("points"))
+        .select_from(closed.outerjoin(done, done.c.sprint_id == closed.c.id))
+        .group_by(closed.c.id)
+        .subquery()
+    )
+    avg = session.execute(select(func.avg(per_sprint.c.points))).scalar()
+    return int(avg) if avg else None
+
+
+def capacity_for(session, user_id):
+    return velocity(session, user_id) or config.PLANNING_DEFAULT_CAPACITY
+
+
+def propose(items, capacity):
+    # items: [(task_id, story_point)] به ترتیب اولویت (قدیمی‌تر اول)
+    # بیشینه کردن مجموع story point با سقف capacity؛ در تساوی، تسک‌های قدیمی‌تر ترجیح دارند.
+    # O(n * capacity) زمان و حافظه‌ی بیتی، برای هزاران تسک کافی است.
+    cands = [(tid, sp) for tid, sp in items if sp and 0 < sp <= capacity]
+    n = len(cands)
+    if not n or capacity <= 0:
+        return []
+
+    scale = n * n + 1  # وزن اولویت هرگز بر یک واحد story point غلبه نمی‌کند
+    best = [0] * (capacity + 1)
+    keep = []
+    for rank, (_, sp) in enumerate(cands):
+        value = sp * scale + (n - rank)
+        taken = bytearray(capacity + 1)
+        for c in range(capacity, sp - 1, -1):
+            v = best[c - sp] + value
+            if v > best[c]:
+                best[c] = v
+                taken[c] = 1
+        keep.append(taken)
+
+    chosen = []
+    c = capacity
+    for i in range(n - 1, -1, -1):
+        if keep[i][c]:
+            tid, sp = cands[i]
+            chosen.append(tid)
+            c -= sp
+    chosen.reverse()
+    return chosen
+
+
+def commit_sprint(session, user_id, task_ids):
+    # برداشتن تسک‌های انتخابی با یک UPDATE؛ تسک‌هایی که دیگر Backlog نیستند نادیده گرفته می‌شوند.
+    # اسپرینت فقط وقتی ساخته می‌شود که دست‌کم یک تسک برداشته شده باشد.
+    taken = session.execute(
+        update(Task)
+        .where(Task.id.in_(task_ids), Task.status == "Backlog")
+        .values(sprint_id=None, status="NotStarted", assigned_to=user_id, version=Task.version + 1),
+        execution_options={"synchronize_session": False}
+    ).rowcount
+    if not taken:
+        return None, 0
+    sprint = Sprint(start_date=datetime.utcnow(), status="Active", created_by=user_id)
+    session.add(sprint)
+    session.flush()
+    session.execute(
+        update(Task)
+        .where(Task.id.in_(task_ids), Task.assigned_to == user_id,
+               Task.status == "NotStarted", Task.sprint_id.is_(None))
+        .values(sprint_id=sprint.id),
+        execution_options={"synchronize_session": False}
+    )
+    return sprint, taken
+
+
+def close_sprints(session, sprint_ids, closed_by, team_id=None):
+    # بستن اسپرینت‌ها، ثبت SprintReview و برگرداندن تسک‌های ناتمام به Backlog؛ همه در تراکنش جاری.
+    # اگر یکی از اسپرینت‌ها در این فاصله بسته شده باشد None برمی‌گردد و فراخواننده باید rollback کند.
+    sprint_ids = list(sprint_ids)
+    today = datetime.utcnow().date()
+    closed = session.execute(
+        update(Sprint)
+        .where(Sprint.id.in_(sprint_ids), Sprint.status == "Active")
+        .values(status="Completed", end_date=today),
+        execution_options={"synchronize_session": False}
+    ).rowcount
+    if closed != len(sprint_ids):
+        return None
+
+    # یک کوئری تجمیعی برای همه‌ی اسپرینت‌ها و توسعه‌دهنده‌ها
+    done = Task.status == "Completed"
+    done_points = func.coalesce(func.sum(case((done, Task.story_point), else_=0)), 0).label("done_points")
+    rows = session.execute(
+        select(
+            Task.sprint_id,
+            User.name,
+            func.count(Task.id).label("tasks"),
+            func.sum(case((done, 1), else_=0)).label("done_tasks"),
+            func.coalesce(func.sum(Task.story_point), 0).label("points"),
+            done_points,
+        )
+        .outerjoin(User, User.id == Task.assigned_to)
+        .where(Task.sprint_id.in_(sprint_ids))
+        .group_by(Task.sprint_id, Task.assigned_to, User.name)
+        .order_by(Task.sprint_id, done_points.desc())
+    ).all()
+
+    by_sprint = {sid: [] for sid in sprint_ids}
+    for row in rows:
+        by_sprint[row.sprint_id].append(row)
+
+    reviews = {}
+    for sid, devs in by_sprint.items():
+        tasks = sum(r.tasks for r in devs)
+        done_tasks = sum(r.done_tasks for r in devs)
+        points = sum(r.points for r in devs)
+        done_points = sum(r.done_points for r in devs)
+        # بر اساس story point؛ اگر امتیازی ثبت نشده، بر اساس تعداد تسک‌ها
+        if points:
+            percentage = round(100.0 * done_points / points, 1)
+        else:
+            percentage = round(100.0 * done_tasks / tasks, 1) if tasks else 0.0
+        lines = [
+            f"👤 {r.name or 'بدون مسئول'}: {r.done_points}/{r.points} امتیاز ({r.done_tasks}/{r.tasks} تسک)"
+            for r in devs
+        ]
+        reviews[sid] = {
+            "completed_percentage": percentage,
+            "notes": "\n".join(lines) or "—",
+            "returned": tasks - done_tasks,
+        }
+
+    session.execute(insert(SprintReview), [
+        dict(team_id=team_id, sprint_id=sid, created_by=closed_by, review_date=today,
+             notes=r["notes"], completed_percentage=r["completed_percentage"])
+        for sid, r in reviews.items()
+    ])
+    session.execute(
+        update(Task)
+        .where(Task.sprint_id.in_(sprint_ids), Task.status != "Completed")
+        .values(status="Backlog", sprint_id=None, assigned_to=None, version=Task.version + 1),
+        execution_options={"synchronize_session": False}
+    )
+    return reviews
@@ -0,0 +1,83 @@
+# database/query_budget.py
+
+import functools
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import config
+
+# شمارش دستورات SQL هر هندلر از طریق رویدادهای engine و مقایسه با بودجه‌ی اعلام‌شده.
+# بودجه‌ها ثابت‌اند؛ هندلری که تعداد کوئری‌اش با تعداد ردیف‌ها رشد کند (N+1) روی داده‌ی بزرگ‌تر از آن عبور می‌کند.
+# tests/test_query_budgets.py همه‌ی هندلرهای دارای بودجه را روی داده‌ی N و 10N اجرا می‌کند و هر دو را بررسی می‌کند.
+
+logger = logging.getLogger("query_budget")
+
+# شمارنده‌های فعال (تو در تو): هر دستور SQL به همه‌ی آن‌ها اضافه می‌شود
+_active_counters = ContextVar("active_query_counters", default=())
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def add(self, statement):
+        self.count += 1
+        self.statements.append(statement)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    for counter in _active_counters.get():
+        counter.add(statement)
+
+
+@contextmanager
+def counting():
+    counter = QueryCounter()
+    token = _active_counters.set(_active_counters.get() + (counter,))
+    try:
+        yield counter
+    finally:
+        _active_counters.reset(token)
+
+
+@contextmanager
+def unbudgeted():
+    # کارهای دسته‌ای داخل یک هندلر (مثلاً آرشیو) که عمداً از بودجه‌ی آن مستثنا هستند
+    token = _active_counters.set(())
+    try:
+        yield
+    finally:
+        _active_counters.reset(token)
+
+
+def query_budget(limit):
+    def decorator(handler):
+        name = f"{handler.__module__}.{handler.__qualname__}"
+
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            with counting() as counter:
+                result = await handler(*args, **kwargs)
+            if counter.count > limit:
+                logger.warning(
+                    "query budget exceeded",
+                    extra={"handler": name, "queries": counter.count, "budget": limit}
+                )
+                if config.QUERY_BUDGET_STRICT:
+                    raise QueryBudgetExceeded(
+                        f"{name} ran {counter.count} queries (budget {limit}):\n"
+                        + "\n".join(counter.statements)
+                    )
+            return result
+
+        wrapper.query_budget = limit
+        return wrapper
+    return decorator
@@ -0,0 +1,157 @@
+# database/snapshot.py
+
+import argparse
+import gzip
+import json
+import time
+from datetime import date, datetime
+from sqlalchemy import create_engine, select, func, Date, DateTime
+from database.models import Base
+import config
+
+# خروجی/ورودی کامل داده‌ها برای پشتیبان‌گیری و جابه‌جایی بین MySQL و SQLite.
+# قالب: JSONL فشرده (gzip). خط اول سربرگ، سپس برای هر جدول یک خط {"table", "columns"}
+# و بعد ردیف‌ها به‌صورت آرایه (نام ستون‌ها فقط یک بار). خواندن و نوشتن هر دو تکه‌تکه است
+# و حافظه به اندازه‌ی یک تکه (SNAPSHOT_CHUNK_SIZE) مصرف می‌شود.
+#
+#   python -m database.snapshot export backup.jsonl.gz
+#   python -m database.snapshot import backup.jsonl.gz [--url sqlite:///other.db]
+
+FORMAT = "scrum-bot-snapshot"
+VERSION = 1
+
+
+def _tables():
+    # به ترتیب وابستگی کلیدهای خارجی تا ورود داده بدون خطای FK انجام شود
+    return Base.metadata.sorted_tables
+
+
+def _encode(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"cannot serialize {type(value).__name__}")
+
+
+def _decoders(table, columns):
+    decoders = []
+    for name in columns:
+        column_type = table.c[name].type
+        if isinstance(column_type, DateTime):
+            decoders.append(datetime.fromisoformat)
+        elif isinstance(column_type, Date):
+            decoders.append(date.fromisoformat)
+        else:
+            decoders.append(None)
+    return decoders
+
+
+def _begin_snapshot(conn):
+    # همه‌ی جداول از یک تصویر ثابت خوانده می‌شوند، حتی اگر ربات همزمان می‌نویسد
+    if conn.dialect.name == "sqlite":
+        conn = conn.execution_options(isolation_level="SERIALIZABLE")
+        conn.exec_driver_sql("BEGIN")
+    elif conn.dialect.name == "mysql":
+        conn = conn.execution_options(isolation_level="REPEATABLE READ")
+        conn.exec_driver_sql("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+    else:
+        conn = conn.execution_options(isolation_level="REPEATABLE READ")
+    return conn
+
+
+# ============================
+# Export
+# ============================
+def export_snapshot(path, engine, chunk_size=None):
+    chunk_size = chunk_size or config.SNAPSHOT_CHUNK_SIZE
+    counts = {}
+    with engine.connect() as conn, gzip.open(path, "wt", encoding="utf-8", compresslevel=6) as out:
+        conn = _begin_snapshot(conn)
+        out.write(json.dumps({"format": FORMAT, "version": VERSION, "exported_at": datetime.utcnow()},
+                             default=_encode) + "\n")
+        for table in _tables():
+            columns = [c.name for c in table.columns]
+            out.write(json.dumps({"table": table.name, "columns": columns}) + "\n")
+            result = conn.execution_options(yield_per=chunk_size).execute(
+                select(table).order_by(*table.primary_key.columns)
+            )
+            count = 0
+            for rows in result.partitions():
+                out.writelines(json.dumps(list(row), ensure_ascii=False, default=_encode) + "\n" for row in rows)
+                count += len(rows)
+            counts[table.name] = count
+        conn.rollback()
+    return counts
+
+
+# ============================
+# Import
+# ============================
+def import_snapshot(path, engine, chunk_size=None):
+    chunk_size = chunk_size or config.SNAPSHOT_CHUNK_SIZE
+    tables = {t.name: t for t in _tables()}
+    Base.metadata.create_all(bind=engine)
+    counts = {}
+
+    with engine.begin() as conn, gzip.open(path, "rt", encoding="utf-8") as src:
+        non_empty = [
+            name for name, table in tables.items()
+            if conn.execute(select(func.count()).select_from(table)).scalar()
+        ]
+        if non_empty:
+            raise ValueError(f"target database is not empty: {', '.join(non_empty)}")
+
+        header = json.loads(next(src))
+        if header.get("format") != FORMAT or header.get("version") != VERSION:
+            raise ValueError(f"unsupported snapshot: {header.get('format')} v{header.get('version')}")
+
+        table = columns = decoders = None
+        batch = []
+
+        def flush():
+            if batch:
+                conn.execute(table.insert(), batch)
+                counts[table.name] = counts.get(table.name, 0) + len(batch)
+                batch.clear()
+
+        for line in src:
+            item = json.loads(line)
+            if isinstance(item, dict):
+                flush()
+                if item["table"] not in tables:
+                    raise ValueError(f"unknown table in snapshot: {item['table']}")
+                table = tables[item["table"]]
+                columns = item["columns"]
+                unknown = set(columns) - set(table.c.keys())
+                if unknown:
+                    raise ValueError(f"unknown columns in {table.name}: {', '.join(sorted(unknown))}")
+                decoders = _decoders(table, columns)
+                counts[table.name] = 0
+                continue
+
+            batch.append({
+                name: (decode(value) if decode and value is not None else value)
+                for name, decode, value in zip(columns, decoders, item)
+            })
+            if len(batch) >= chunk_size:
+                flush()
+        flush()
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="snapshot export/import")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("path")
+    parser.add_argument("--url", default=config.DB_URL, help="database URL (default: SQLALCHEMY_DATABASE_URL)")
+    parser.add_argument("--chunk-size", type=int, default=None)
+    args = parser.parse_args()
+
+    target = create_engine(args.url)
+    started = time.perf_counter()
+    if args.action == "export":
+        result = export_snapshot(args.path, target, args.chunk_size)
+    else:
+        result = import_snapshot(args.path, target, args.chunk_size)
+    for name, count in result.items():
+        print(f"{name:<28} {count:>10}")
+    print(f"{args.action}: {sum(result.values())} rows in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,123 @@
+# database/tenancy.py
+
+import contextlib
+import functools
+from contextvars import ContextVar
+from datetime import datetime
+from sqlalchemy import event, update
+from sqlalchemy.orm import with_loader_criteria
+from database.db import SessionLocal
+from database.models import (
+    Team,
+    User,
+    Project,
+    Sprint,
+    Task,
+    DailyReport,
+    SprintReview,
+    Retrospective,
+    ArchivedTask,
+    ArchivedDailyReport,
+    ArchivedRetrospective
+)
+
+# چند تیم (هر کدام با ربات خودش) در یک پردازه و روی یک engine.
+# تیم آپدیت جاری در current_team_id است و همه‌ی SELECT/UPDATE/DELETE های ORM روی جداول تیمی
+# به‌طور خودکار با team_id آن محدود می‌شوند؛ ردیف‌های جدید هم team_id جاری را می‌گیرند.
+# بدون تیم جاری (کارهای سراسری مثل ارسال اعلان‌ها) محدودیتی اعمال نمی‌شود.
+
+current_team_id = ContextVar("current_team_id", default=None)
+
+TEAM_MODELS = (
+    User, Project, Sprint, Task, DailyReport, SprintReview, Retrospective,
+    ArchivedTask, ArchivedDailyReport, ArchivedRetrospective,
+)
+
+
+@contextlib.contextmanager
+def team_scope(team_id):
+    token = current_team_id.set(team_id)
+    try:
+        yield
+    finally:
+        current_team_id.reset(token)
+
+
+def unscoped():
+    return team_scope(None)
+
+
+def scoped_job(callback):
+    # jobها در تسک جدا اجرا می‌شوند؛ تیم از برنامه‌ی (Application) صاحب job خوانده می‌شود
+    @functools.wraps(callback)
+    async def wrapper(context):
+        with team_scope(context.application.bot_data.get("team_id")):
+            return await callback(context)
+    return wrapper
+
+
+# ============================
+# Scoping via session events
+# ============================
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _scope_to_team(orm_execute_state):
+    team_id = current_team_id.get()
+    if team_id is None or orm_execute_state.is_column_load or orm_execute_state.is_relationship_load:
+        return
+    if not (orm_execute_state.is_select or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    orm_execute_state.statement = orm_execute_state.statement.options(*[
+        with_loader_criteria(model, model.team_id == team_id, include_aliases=True)
+        for model in TEAM_MODELS
+    ])
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _stamp_new_rows(session, flush_context, instances):
+    team_id = current_team_id.get()
+    if team_id is None:
+        return
+    for obj in session.new:
+        if isinstance(obj, TEAM_MODELS) and obj.team_id is None:
+            obj.team_id = team_id
+
+
+# ============================
+# Teams
+# ============================
+def bot_id_from_token(token):
+    return int(token.split(":", 1)[0])
+
+
+def ensure_team(session, bot_id, name=None):
+    team = session.query(Team).filter_by(bot_id=bot_id).first()
+    if team is None:
+        team = Team(bot_id=bot_id, name=name or str(bot_id), created_at=datetime.utcnow())
+        session.add(team)
+        session.flush()
+    return team.id
+
+
+def adopt_orphans(session, team_id):
+    # داده‌های قبل از چندتیمی شدن (team_id خالی) به تیم اول تعلق می‌گیرند
+    moved = 0
+    for model in TEAM_MODELS:
+        result = session.execute(
+            update(model).where(model.team_id.is_(None)).values(team_id=team_id),
+            execution_options={"synchronize_session": False}
+        )
+        moved += result.rowcount
+    return moved
+
+
+def setup_teams(tokens):
+    session = SessionLocal()
+    try:
+        with unscoped():
+            team_ids = [ensure_team(session, bot_id_from_token(token)) for token in tokens]
+            if team_ids:
+                adopt_orphans(session, team_ids[0])
+        session.commit()
+        return team_ids
+    finally:
+        session.close()
@@ -0,0 +1,40 @@
+# database/transitions.py
+
+from datetime import datetime
+from sqlalchemy import update, func
+from database.models import Task, User
+from database import events
+
+# تغییر وضعیت تسک‌ها با UPDATE شرطی (compare-and-swap) به‌جای قفل سطری.
+# اگر تسک در این فاصله توسط کاربر دیگری تغییر کرده باشد، rowcount صفر است و False برمی‌گردد.
+# هر تغییر موفق یک رویداد TaskTransition ثبت می‌کند که پس از commit منتشر می‌شود.
+
+
+def transition_task(session, task_id, from_status, to_status, version=None, owner_id=None, **values):
+    stmt = update(Task).where(Task.id == task_id, Task.status == from_status)
+    if version is not None:
+        stmt = stmt.where(Task.version == version)
+    if owner_id is not None:
+        stmt = stmt.where(Task.assigned_to == owner_id)
+    stmt = stmt.values(status=to_status, version=Task.version + 1, **values)
+    result = session.execute(stmt, execution_options={"synchronize_session": False})
+    if result.rowcount != 1:
+        return False
+    events.record(session, events.TaskTransition(task_id, from_status, to_status))
+    return True
+
+
+def approve_task(session, task_id, version=None):
+    # InReview -> Completed و افزودن امتیاز، هر دو در همان تراکنش
+    if not transition_task(session, task_id, "InReview", "Completed", version,
+                           reviewed=True, completed_at=datetime.utcnow()):
+        return False
+    task = session.query(Task.assigned_to, Task.story_point).filter(Task.id == task_id).one()
+    if task.assigned_to and task.story_point:
+        session.execute(
+            update(User)
+            .where(User.id == task.assigned_to)
+            .values(total_points=func.coalesce(User.total_points, 0) + task.story_point),
+            execution_options={"synchronize_session": False}
+        )
+    return True
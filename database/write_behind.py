@@ -0,0 +1,79 @@
+# database/write_behind.py
+
+import asyncio
+import logging
+import threading
+from sqlalchemy import update, case
+from database.db import SessionLocal
+from database.models import User
+import config
+
+# بافر write-behind برای نوشتن‌های پرتکرار و کم‌ارزش (last_login):
+# در مسیر داغ فقط در حافظه ثبت می‌شود و به‌صورت دوره‌ای با یک UPDATE چندردیفی نوشته می‌شود.
+
+logger = logging.getLogger("write_behind")
+
+CHUNK_SIZE = 500
+
+
+class TouchBuffer:
+    def __init__(self, model, column):
+        self.model = model
+        self.column = column
+        self._pending = {}  # pk -> value (آخرین مقدار برنده است)
+        self._lock = threading.Lock()
+
+    def touch(self, pk, value):
+        with self._lock:
+            self._pending[pk] = value
+
+    def __len__(self):
+        return len(self._pending)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        items = list(pending.items())
+        session = SessionLocal()
+        try:
+            pk = self.model.__mapper__.primary_key[0]
+            for i in range(0, len(items), CHUNK_SIZE):
+                chunk = dict(items[i:i + CHUNK_SIZE])
+                session.execute(
+                    update(self.model)
+                    .where(pk.in_(chunk))
+                    .values({self.column: case(chunk, value=pk)}),
+                    execution_options={"synchronize_session": False}
+                )
+            session.commit()
+        except Exception:
+            session.rollback()
+            # برگرداندن به بافر، بدون بازنویسی مقادیر جدیدتر
+            with self._lock:
+                for key, value in pending.items():
+                    self._pending.setdefault(key, value)
+            raise
+        finally:
+            session.close()
+        return len(items)
+
+
+last_login_buffer = TouchBuffer(User, "last_login")
+BUFFERS = [last_login_buffer]
+
+
+def flush_all():
+    return sum(buf.flush() for buf in BUFFERS)
+
+
+async def run_periodic_flush(interval=None):
+    interval = interval or config.WRITE_BEHIND_INTERVAL
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(flush_all)
+        except Exception:
+            logger.exception("write-behind flush failed")
@@ -7,7 +7,8 @@ from telegram import (
     InlineKeyboardMarkup
 )
 from telegram.ext import ContextTypes, ConversationHandler
-from database.db import SessionLocal
+from database.db import SessionLocal, read_only
+from database.query_budget import query_budget, unbudgeted
 from database.models import (
     User,
     Project,
@@ -15,8 +16,13 @@ from database.models import (
     Task,
     DailyReport,
     SprintReview,
-    Retrospective
+    ArchivedDailyReport
 )
+from database import cache, transitions, archive, planning
+from database.tenancy import current_team_id
+from handlers import callbacks, notifications
+import asyncio
+from sqlalchemy import insert
 from datetime import datetime
 from bot import start
 # ============================
@@ -32,6 +38,7 @@ REVIEW_DECISION, REVIEW_REASON = range(100, 102)
 # ============================
 # Add Project
 # ============================
+@query_budget(1)
 async def add_project(update: Update, context: ContextTypes.DEFAULT_TYPE):
     session = SessionLocal()
     user = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
@@ -48,6 +55,7 @@ async def add_project(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     return ADD_PROJECT_NAME
 
+@query_budget(3)
 async def save_project(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = update.message.text.strip()
     if text == "🔙 انصراف":
@@ -80,6 +88,8 @@ async def save_project(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # ============================
 # List Projects
 # ============================
+@read_only
+@query_budget(2)
 async def list_projects(update: Update, context: ContextTypes.DEFAULT_TYPE):
     session = SessionLocal()
     user = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
@@ -89,7 +99,7 @@ async def list_projects(update: Update, context: ContextTypes.DEFAULT_TYPE):
         session.close()
         return
 
-    projects = session.query(Project).filter_by(created_by=user.id).all()
+    projects = cache.projects_by_creator(session, user.id)
     if not projects:
         await update.message.reply_text("❌ هیچ پروژه‌ای ثبت نشده است.")
     else:
@@ -104,6 +114,7 @@ async def list_projects(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # ============================
 # Add Task to Backlog
 # ============================
+@query_budget(2)
 async def add_task_to_backlog(update: Update, context: ContextTypes.DEFAULT_TYPE):
     session = SessionLocal()
     user = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
@@ -112,41 +123,44 @@ async def add_task_to_backlog(update: Update, context: ContextTypes.DEFAULT_TYPE
         session.close()
         return ConversationHandler.END
 
-    projects = session.query(Project).filter_by(created_by=user.id).all()
+    projects = cache.projects_by_creator(session, user.id)
     session.close()
     if not projects:
         await update.message.reply_text("❌ شما هیچ پروژه‌ای ندارید.")
         return ConversationHandler.END
 
-    keyboard = [[p.name] for p in projects]
-    keyboard.append(["🔙 انصراف"])
-    context.user_data["project_map"] = {p.name: p.id for p in projects}
+    keyboard = [[InlineKeyboardButton(p.name, callback_data=callbacks.encode(callbacks.BACKLOG_PROJECT, p.id))] for p in projects]
+    keyboard.append([InlineKeyboardButton("🔙 انصراف", callback_data=callbacks.encode(callbacks.CANCEL))])
 
     await update.message.reply_text(
         "📋 یک پروژه را برای افزودن تسک به بک‌لاگ انتخاب کنید:",
-        reply_markup=ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True)
+        reply_markup=InlineKeyboardMarkup(keyboard)
     )
     return SELECT_PROJECT_FOR_BACKLOG
 
+@query_budget(2)
 async def receive_backlog_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    text = update.message.text.strip()
-    if text == "🔙 انصراف":
-        await update.message.reply_text("❌ عملیات افزودن تسک لغو شد.")
-        return ConversationHandler.END
+    query = update.callback_query
+    await query.answer()
+    _, ids = callbacks.decode(query.data)
 
-    project_map = context.user_data.get("project_map", {})
-    project_id = project_map.get(text)
-    if not project_id:
-        await update.message.reply_text("❌ پروژه نامعتبر است.")
+    session = SessionLocal()
+    user = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
+    projects = cache.projects_by_creator(session, user.id) if user else []
+    session.close()
+    project_id = ids[0] if ids else None
+    if not any(p.id == project_id for p in projects):
+        await query.edit_message_text("❌ پروژه نامعتبر است.")
         return ConversationHandler.END
 
     context.user_data["selected_project_id"] = project_id
-    await update.message.reply_text(
+    await query.edit_message_text(
         "✍️ تسک‌های بک‌لاگ را وارد کنید (هر سطر: عنوان [فاصله] داستان‌پوینت).\n"
         "مثال:\nتسک1    2\nتسک2    1\n\nبرای لغو «🔙 انصراف» را بزنید."
     )
     return ENTER_BACKLOG_TASKS
 
+@query_budget(2)
 async def save_backlog_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = update.message.text.strip()
     if text == "🔙 انصراف":
@@ -156,7 +170,7 @@ async def save_backlog_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE)
     session = SessionLocal()
     project_id = context.user_data["selected_project_id"]
     lines = text.split("\n")
-    count = 0
+    rows = []
     for line in lines:
         parts = line.strip().rsplit(maxsplit=1)
         if len(parts) != 2:
@@ -166,24 +180,28 @@ async def save_backlog_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE)
             sp = int(sp_str)
         except ValueError:
             continue
-        session.add(Task(
+        rows.append(dict(
+            team_id=current_team_id.get(),
             project_id=project_id,
             title=title.strip(),
             story_point=sp,
             status="Backlog",
             created_at=datetime.now()
         ))
-        count += 1
 
+    # یک INSERT چندردیفی به‌جای یک INSERT برای هر تسک
+    if rows:
+        session.execute(insert(Task), rows)
     session.commit()
     session.close()
-    await update.message.reply_text(f"✅ {count} تسک به بک‌لاگ پروژه اضافه شد.")
+    await update.message.reply_text(f"✅ {len(rows)} تسک به بک‌لاگ پروژه اضافه شد.")
     return ConversationHandler.END
 
 
 # ============================
 # Review Tasks (Admin)
 # ============================
+@query_budget(2)
 async def review_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
     session = SessionLocal()
     user = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
@@ -207,8 +225,8 @@ async def review_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         keyboard = InlineKeyboardMarkup([
             [
-                InlineKeyboardButton("✅ تایید", callback_data=f"approve_{t.id}"),
-                InlineKeyboardButton("❌ رد", callback_data=f"reject_{t.id}")
+                InlineKeyboardButton("✅ تایید", callback_data=callbacks.encode(callbacks.ADMIN_APPROVE, t.id, t.version)),
+                InlineKeyboardButton("❌ رد", callback_data=callbacks.encode(callbacks.ADMIN_REJECT, t.id, t.version))
             ]
         ])
         await update.message.reply_text(txt, reply_markup=keyboard)
@@ -216,31 +234,52 @@ async def review_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
     session.close()
     return REVIEW_DECISION
 
+@query_budget(6)
 async def review_decision_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    data = query.data  # e.g. "approve_5" or "reject_7"
-    action, tid = data.split("_")
-    context.user_data["review_task_id"] = int(tid)
+    action, ids = callbacks.decode(query.data)  # (ADMIN_APPROVE|ADMIN_REJECT, [task_id, version])
+    if len(ids) != 2:
+        await query.edit_message_text("❌ این دکمه منقضی شده است.")
+        return ConversationHandler.END
+    tid, version = ids
 
     session = SessionLocal()
-    task = session.query(Task).get(int(tid))
+    user = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
+    if not user or user.role not in ["ProductOwner", "CEO"]:
+        await query.edit_message_text("⛔️ دسترسی محدود است.")
+        session.close()
+        return ConversationHandler.END
+
+    task = session.get(Task, tid)
+    if not task or task.status != "InReview" or task.version != version:
+        session.close()
+        await query.edit_message_text(f"⚠️ تسک [{tid}] قبلاً توسط بازبین دیگری بررسی شده است.")
+        return ConversationHandler.END
+    # داده‌ی callback از سمت کاربر می‌آید؛ بازبینی تسک خود مجاز نیست
+    if task.assigned_to == user.id:
+        session.close()
+        await query.edit_message_text("⛔️ نمی‌توانید تسک خودتان را بازبینی کنید.")
+        return ConversationHandler.END
 
-    if action == "approve":
-        dev = session.query(User).get(task.assigned_to)
-        if dev:
-            dev.total_points += task.story_point
-        task.status = "Completed"
+    if action == callbacks.ADMIN_APPROVE:
+        ok = transitions.approve_task(session, tid, version)
         session.commit()
         session.close()
+        if not ok:
+            await query.edit_message_text(f"⚠️ تسک [{tid}] قبلاً توسط بازبین دیگری بررسی شده است.")
+            return ConversationHandler.END
         await query.edit_message_text(f"✅ تسک [{tid}] تایید و تکمیل شد.")
         return ConversationHandler.END
 
     # action == "reject"
     session.close()
+    context.user_data["review_task_id"] = tid
+    context.user_data["review_task_version"] = version
     await query.edit_message_text("❌ لطفاً دلیل رد تسک را وارد کنید (یا «🔙 انصراف»):")
     return REVIEW_REASON
 
+@query_budget(2)
 async def review_reason(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = update.message.text.strip()
     if text == "🔙 انصراف":
@@ -250,13 +289,16 @@ async def review_reason(update: Update, context: ContextTypes.DEFAULT_TYPE):
     tid = context.user_data.get("review_task_id")
 
     session = SessionLocal()
-    task = session.query(Task).get(tid)
-    if task:
-        task.status = "Backlog"
-        task.reason = reason
-        session.commit()
+    ok = transitions.transition_task(
+        session, tid, "InReview", "Backlog",
+        context.user_data.get("review_task_version"), reason=reason
+    )
+    session.commit()
     session.close()
 
+    if not ok:
+        await update.message.reply_text(f"⚠️ تسک [{tid}] قبلاً توسط بازبین دیگری بررسی شده است.")
+        return ConversationHandler.END
     await update.message.reply_text(f"✅ تسک [{tid}] رد شد و دلیل ثبت گردید.")
     return ConversationHandler.END
 
@@ -264,6 +306,8 @@ async def review_reason(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # ============================
 # View Daily Reports (Admin)
 # ============================
+@read_only
+@query_budget(2)
 async def view_daily_reports(update: Update, context: ContextTypes.DEFAULT_TYPE):
     from database.models import DailyReport
     session = SessionLocal()
@@ -273,7 +317,13 @@ async def view_daily_reports(update: Update, context: ContextTypes.DEFAULT_TYPE)
         session.close()
         return
 
-    reports = session.query(DailyReport).order_by(DailyReport.report_date.desc()).limit(5).all()
+    # /view_daily_reports archive [sprint_id] → گزارش‌های آرشیوشده
+    args = context.args or []
+    model = ArchivedDailyReport if args and args[0] == "archive" else DailyReport
+    q = session.query(model)
+    if model is ArchivedDailyReport and len(args) > 1 and args[1].isdigit():
+        q = q.filter(model.sprint_id == int(args[1]))
+    reports = q.order_by(model.report_date.desc()).limit(5).all()
     if not reports:
         await update.message.reply_text("❌ هیچ گزارشی ثبت نشده است.")
     else:
@@ -291,9 +341,96 @@ async def view_daily_reports(update: Update, context: ContextTypes.DEFAULT_TYPE)
     session.close()
 
 
+# ============================
+# Standup Digest (per active sprint)
+# ============================
+NO_BLOCKER_WORDS = {"", "-", "ندارد", "نداره", "هیچ", "no", "none"}
+
+def build_standup_digests(session, day):
+    # یک پیام برای هر اسپرینت فعال؛ تعداد کوئری‌ها مستقل از تعداد اسپرینت‌ها و اعضاست
+    sprints = session.query(Sprint.id, Sprint.start_date).filter(Sprint.status == "Active").order_by(Sprint.id).all()
+    if not sprints:
+        return []
+    sprint_ids = [s.id for s in sprints]
+
+    members = {}
+    rows = (
+        session.query(Task.sprint_id, User.id, User.name)
+        .join(User, User.id == Task.assigned_to)
+        .filter(Task.sprint_id.in_(sprint_ids))
+        .distinct()
+        .all()
+    )
+    for sprint_id, user_id, name in rows:
+        members.setdefault(sprint_id, {})[user_id] = name
+
+    reports = {}
+    rows = (
+        session.query(DailyReport.sprint_id, DailyReport.user_id, User.name,
+                      DailyReport.completed_tasks, DailyReport.planned_tasks, DailyReport.blockers)
+        .join(User, User.id == DailyReport.user_id)
+        .filter(DailyReport.sprint_id.in_(sprint_ids), DailyReport.report_date == day)
+        .order_by(DailyReport.sprint_id, DailyReport.id)
+        .all()
+    )
+    for r in rows:
+        reports.setdefault(r.sprint_id, []).append(r)
+
+    digests = []
+    for s in sprints:
+        sprint_reports = reports.get(s.id, [])
+        reported = {r.user_id for r in sprint_reports}
+        missing = [name for uid, name in members.get(s.id, {}).items() if uid not in reported]
+        blocked = [r for r in sprint_reports if (r.blockers or "").strip().lower() not in NO_BLOCKER_WORDS]
+
+        lines = [f"🧩 اسپرینت {s.id} — خلاصه‌ی استندآپ {day}", f"📝 گزارش‌ها: {len(sprint_reports)}"]
+        if blocked:
+            lines.append("\n🚫 موانع:")
+            lines += [f"• {r.name}: {r.blockers}" for r in blocked]
+        if sprint_reports:
+            lines.append("\n✅ گزارش‌ها:")
+            lines += [f"• {r.name}: {r.completed_tasks} ← {r.planned_tasks}" for r in sprint_reports]
+        if missing:
+            lines.append("\n⏳ گزارش نداده‌اند: " + "، ".join(missing))
+        digests.append((s.id, "\n".join(lines)))
+    return digests
+
+@read_only
+@query_budget(4)
+async def standup_digest(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    session = SessionLocal()
+    user = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
+    if not user or user.role not in ["ProductOwner", "CEO"]:
+        await update.message.reply_text("⛔️ شما دسترسی به این بخش ندارید.")
+        session.close()
+        return
+
+    digests = build_standup_digests(session, datetime.utcnow().date())
+    session.close()
+    if not digests:
+        await update.message.reply_text("❌ هیچ اسپرینت فعالی وجود ندارد.")
+        return
+    for _, text in digests:
+        await update.message.reply_text(text)
+
+async def standup_digest_job(context: ContextTypes.DEFAULT_TYPE):
+    session = SessionLocal()
+    digests = build_standup_digests(session, datetime.utcnow().date())
+    recipients = [
+        r.telegram_id for r in
+        session.query(User.telegram_id).filter(User.role.in_(["ProductOwner", "CEO"])).all()
+    ]
+    session.close()
+    # ارسال با همان فرستنده‌ی اعلان‌ها: مسدودبودن ربات برای یک گیرنده بقیه را متوقف نمی‌کند
+    for _, text in digests:
+        await notifications.send_all({None: context.bot}, {(None, chat_id): text for chat_id in recipients})
+
+
 # ============================
 # View Sprint Review Reports (Admin)
 # ============================
+@read_only
+@query_budget(2)
 async def view_sprint_reviews(update: Update, context: ContextTypes.DEFAULT_TYPE):
     from database.models import SprintReview
     session = SessionLocal()
@@ -321,8 +458,9 @@ async def view_sprint_reviews(update: Update, context: ContextTypes.DEFAULT_TYPE
 
 
 # ============================
-# Finalize Sprint & Create Retrospective
+# Finalize Sprint & Create Sprint Review
 # ============================
+@query_budget(3)
 async def finalize_sprint(update: Update, context: ContextTypes.DEFAULT_TYPE):
     session = SessionLocal()
     user = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
@@ -331,29 +469,92 @@ async def finalize_sprint(update: Update, context: ContextTypes.DEFAULT_TYPE):
         session.close()
         return
 
-    active_sprints = session.query(Sprint).filter_by(status="Active").all()
-    if not active_sprints:
+    sprints = (
+        session.query(Sprint.id, Sprint.start_date, User.name)
+        .outerjoin(User, User.id == Sprint.created_by)
+        .filter(Sprint.status == "Active")
+        .order_by(Sprint.id).all()
+    )
+    if not sprints:
         await update.message.reply_text("❌ هیچ اسپرینت فعالی وجود ندارد.")
         session.close()
         return
+    projects = (
+        session.query(Project.id, Project.name)
+        .join(Task, Task.project_id == Project.id)
+        .join(Sprint, Sprint.id == Task.sprint_id)
+        .filter(Sprint.status == "Active")
+        .distinct().order_by(Project.id).all()
+    )
+    session.close()
 
-    for s in active_sprints:
-        s.status = "Completed"
-        session.add(Retrospective(
-            sprint_id=s.id,
-            held_by=user.id,
-            retro_date=datetime.now(),
-            discussion_points="جمع‌بندی خودکار ربات."
-        ))
+    rows = [
+        [InlineKeyboardButton(f"🏁 اسپرینت {s.id} - {s.name or '—'} ({s.start_date})",
+                              callback_data=callbacks.encode(callbacks.FINALIZE_SPRINT, s.id))]
+        for s in sprints
+    ]
+    rows += [
+        [InlineKeyboardButton(f"📁 همه‌ی اسپرینت‌های پروژه {p.name}",
+                              callback_data=callbacks.encode(callbacks.FINALIZE_PROJECT, p.id))]
+        for p in projects
+    ]
+    await update.message.reply_text("✅ اسپرینت یا پروژه‌ای را برای نهایی‌سازی انتخاب کنید:",
+                                    reply_markup=InlineKeyboardMarkup(rows))
+
+@query_budget(7)
+async def finalize_scope(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    action, ids = callbacks.decode(query.data)
+    if not ids:
+        await query.edit_message_text("❌ انتخاب نامعتبر است.")
+        return
 
+    session = SessionLocal()
+    user = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
+    if not user or user.role not in ["ProductOwner", "CEO"]:
+        await query.edit_message_text("⛔️ دسترسی محدود است.")
+        session.close()
+        return
+
+    if action == callbacks.FINALIZE_PROJECT:
+        # اسپرینت‌های فعالی که تسکی از این پروژه دارند
+        sprint_ids = [
+            sid for sid, in session.query(Task.sprint_id)
+            .join(Sprint, Sprint.id == Task.sprint_id)
+            .filter(Task.project_id == ids[0], Sprint.status == "Active")
+            .distinct().all()
+        ]
+    else:
+        sprint_ids = ids[:1]
+    if not sprint_ids:
+        await query.edit_message_text("❌ هیچ اسپرینت فعالی برای این پروژه وجود ندارد.")
+        session.close()
+        return
+
+    reviews = planning.close_sprints(session, sprint_ids, user.id, user.team_id)
+    if reviews is None:
+        session.rollback()
+        session.close()
+        await query.edit_message_text("⚠️ این اسپرینت پیش‌تر بسته شده یا در این فاصله تغییر کرده است.")
+        return
     session.commit()
     session.close()
-    await update.message.reply_text("✅ تمامی اسپرینت‌های فعال بسته شدند و رتروسپکتیو ثبت شد.")
+
+    parts = [
+        f"🏁 اسپرینت {sid}: {r['completed_percentage']}% انجام شد، {r['returned']} تسک به Backlog برگشت.\n{r['notes']}"
+        for sid, r in reviews.items()
+    ]
+    text = "✅ نهایی‌سازی انجام شد و اسپرینت ریویو ثبت شد.\n\n" + "\n\n".join(parts)
+    if len(text) > 4096:  # محدودیت طول پیام تلگرام؛ جزئیات کامل در /view_sprint_reviews
+        text = text[:4000] + "\n…"
+    await query.edit_message_text(text)
 
 
 # ============================
 # CEO: Manage Users
 # ============================
+@query_budget(2)
 async def manage_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
     session = SessionLocal()
     user = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
@@ -385,31 +586,46 @@ async def manage_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 # ============================
-# Approve Reviewed Tasks (alternative bulk)
+# CEO: Archive Old Sprints
 # ============================
-async def approve_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@query_budget(1)
+async def archive_old_sprints(update: Update, context: ContextTypes.DEFAULT_TYPE):
     session = SessionLocal()
     user = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
-    if not user or user.role not in ["ProductOwner", "CEO"]:
-        await update.message.reply_text("⛔️ دسترسی ندارید.")
-        session.close()
+    session.close()
+    if not user or user.role != "CEO":
+        await update.message.reply_text("⛔️ فقط مدیرعامل مجاز است.")
         return
 
-    tasks = session.query(Task).filter_by(status="InReview").all()
-    if not tasks:
-        await update.message.reply_text("❌ هیچ تسکی در وضعیت بازبینی نیست.")
-        session.close()
+    await update.message.reply_text("🗄️ آرشیو اسپرینت‌های قدیمی شروع شد...")
+    # حلقه‌ی دسته‌ای با حجم داده‌ی آرشیوی رشد می‌کند؛ فقط بررسی دسترسی در بودجه شمرده می‌شود
+    with unbudgeted():
+        moved = await asyncio.to_thread(archive.run_archival)
+    if not any(moved.values()):
+        await update.message.reply_text("✅ داده‌ای برای آرشیو وجود نداشت.")
         return
+    lines = [f"🔹 {table}: {count}" for table, count in moved.items()]
+    await update.message.reply_text("✅ آرشیو انجام شد:\n" + "\n".join(lines))
 
-    for t in tasks:
-        dev = session.query(User).get(t.assigned_to)
-        if dev:
-            dev.total_points += t.story_point
-        t.status = "Completed"
-        t.reviewed = True
-        session.commit()
-        await update.message.reply_text(
-            f"✅ تسک '{t.title}' تایید شد و {t.story_point} امتیاز به {dev.name} اضافه شد."
-        )
+async def archive_job(context: ContextTypes.DEFAULT_TYPE):
+    await asyncio.to_thread(archive.run_archival)
 
+
+# ============================
+# CEO: Query Cache Stats
+# ============================
+@query_budget(1)
+async def cache_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    session = SessionLocal()
+    user = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
     session.close()
+    if not user or user.role != "CEO":
+        await update.message.reply_text("⛔️ فقط مدیرعامل مجاز است.")
+        return
+
+    st = cache.query_cache.stats()
+    await update.message.reply_text(
+        f"🗃️ کش کوئری: {st['size']}/{st['maxsize']}\n"
+        f"✅ hit: {st['hits']} | ❌ miss: {st['misses']} | نرخ: {st['hit_rate']:.0%}\n"
+        f"♻️ evict: {st['evictions']} | باطل‌شده: {st['invalidations']}"
+    )
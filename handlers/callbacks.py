@@ -0,0 +1,64 @@
+# handlers/callbacks.py
+
+import re
+
+# کدگذاری فشرده‌ی callback_data برای دکمه‌های inline:
+#   "<version><action>:<id>.<id>..."   مثلاً "1rs:2n.3"  (شناسه‌ها در مبنای ۳۶)
+# به این ترتیب شناسه‌ها در خود دکمه حمل می‌شوند و نیازی به نگه‌داشتن نگاشت برچسب→شناسه در user_data نیست.
+# با تغییر قالب، VERSION را عوض کنید تا دکمه‌های قدیمی به‌جای تفسیر اشتباه، منقضی شوند.
+
+VERSION = "1"
+MAX_BYTES = 64  # محدودیت تلگرام برای callback_data
+
+# actions
+CANCEL = "cx"
+SUBMIT_REVIEW = "sr"      # developer.select_task_for_review
+START_TASK = "st"         # developer.confirm_task_start
+SPRINT_PROJECT = "sp"     # developer.show_backlog_tasks
+BACKLOG_TASK = "bt"       # developer.collect_tasks_for_sprint
+BACKLOG_AUTO = "ba"
+BACKLOG_DONE = "bd"
+BACKLOG_REPICK = "bp"
+REVIEW_SELECT = "rs"      # developer.review_select_task
+BACKLOG_PROJECT = "bl"    # admin.receive_backlog_tasks
+ADMIN_APPROVE = "aa"      # admin.review_decision_callback
+ADMIN_REJECT = "ar"
+FINALIZE_SPRINT = "fs"    # admin.finalize_scope
+FINALIZE_PROJECT = "fp"
+
+
+def _b36(n):
+    if n < 0:
+        raise ValueError("negative id")
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    out = ""
+    while True:
+        n, r = divmod(n, 36)
+        out = digits[r] + out
+        if not n:
+            return out
+
+
+def encode(action, *ids):
+    data = f"{VERSION}{action}:" + ".".join(_b36(int(i)) for i in ids)
+    if len(data.encode()) > MAX_BYTES:
+        raise ValueError(f"callback data too long: {data!r}")
+    return data
+
+
+def decode(data):
+    # (action, [ids]) یا (None, []) برای داده‌ی نامعتبر/نسخه‌ی قدیمی
+    if not data or not data.startswith(VERSION):
+        return None, []
+    action, sep, payload = data[len(VERSION):].partition(":")
+    if not sep:
+        return None, []
+    try:
+        ids = [int(x, 36) for x in payload.split(".")] if payload else []
+    except ValueError:
+        return None, []
+    return action, ids
+
+
+def pattern(*actions):
+    return re.compile(rf"^{re.escape(VERSION)}(?:{'|'.join(map(re.escape, actions))}):")
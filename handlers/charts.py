@@ -0,0 +1,217 @@
+# handlers/charts.py
+
+import asyncio
+import io
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from sqlalchemy import select, func, case, union_all
+from telegram import Update
+from telegram.ext import ContextTypes
+from database.db import SessionLocal, read_only
+from database.models import User, Sprint, Task, ArchivedTask
+from database.query_budget import query_budget
+from database.cache import query_cache
+from database.tenancy import current_team_id
+import config
+
+# نمودارهای burndown و velocity: داده با یک کوئری تجمیعی، رندر PNG در ProcessPoolExecutor
+# تا حلقه‌ی رویداد مسدود نشود. سری داده در query_cache با commit جدول tasks باطل می‌شود و
+# تصویر هر اسپرینت تا وقتی سری‌اش تغییر نکرده دوباره رندر نمی‌شود.
+
+DEFAULT_SPRINT_DAYS = 14
+VELOCITY_SPRINTS = 10
+MAX_CACHED_CHARTS = 64
+CHART_TABLES = ["tasks", "tasks_archive", "sprints"]
+
+_pool = None
+_rendered = OrderedDict()  # (kind, key) -> (series, png)
+
+
+def _executor():
+    global _pool
+    if _pool is None:
+        # spawn به‌جای fork: پردازه‌ی ربات thread دارد (QueueListener لاگ، profiler) و fork قفل‌های آن‌ها را به ارث می‌برد
+        _pool = ProcessPoolExecutor(max_workers=config.CHART_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+# ============================
+# Rendering (runs in worker processes)
+# ============================
+def _figure():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt, plt.subplots(figsize=(8, 4.5), dpi=110)
+
+
+def _png(plt, fig):
+    buf = io.BytesIO()
+    fig.tight_layout()
+    fig.savefig(buf, format="png")
+    plt.close(fig)
+    return buf.getvalue()
+
+
+def render_burndown(series):
+    sprint_id, start, end, total, remaining = series
+    plt, (fig, ax) = _figure()
+    start, end = date.fromisoformat(start), date.fromisoformat(end)
+    ax.plot([start, end], [total, 0], linestyle="--", color="gray", label="ideal")
+    if remaining:
+        days = [date.fromisoformat(d) for d, _ in remaining]
+        ax.step(days, [r for _, r in remaining], where="post", marker="o", label="remaining")
+    ax.set_title(f"Sprint {sprint_id} burndown")
+    ax.set_ylabel("story points")
+    ax.legend()
+    fig.autofmt_xdate()
+    return _png(plt, fig)
+
+
+def render_velocity(series):
+    plt, (fig, ax) = _figure()
+    labels = [str(sid) for sid, _, _ in series]
+    committed = [c for _, c, _ in series]
+    done = [d for _, _, d in series]
+    x = range(len(series))
+    ax.bar([i - 0.2 for i in x], committed, width=0.4, label="committed", color="#c0c0c0")
+    ax.bar([i + 0.2 for i in x], done, width=0.4, label="completed", color="#2a9d8f")
+    if done:
+        avg = sum(done) / len(done)
+        ax.axhline(avg, linestyle="--", color="#e76f51", label=f"avg {avg:.1f}")
+    ax.set_xticks(list(x), labels)
+    ax.set_xlabel("sprint")
+    ax.set_ylabel("story points")
+    ax.set_title("Velocity")
+    ax.legend()
+    return _png(plt, fig)
+
+
+# ============================
+# Series (one aggregate query each)
+# ============================
+def _sprint_tasks(sprint_filter):
+    return union_all(
+        select(Task.sprint_id, Task.story_point, Task.status, Task.completed_at).where(sprint_filter(Task.sprint_id)),
+        select(ArchivedTask.sprint_id, ArchivedTask.story_point, ArchivedTask.status, ArchivedTask.completed_at)
+        .where(sprint_filter(ArchivedTask.sprint_id)),
+    ).subquery()
+
+
+def burndown_series(session, sprint):
+    t = _sprint_tasks(lambda col: col == sprint.id)
+    done = (t.c.status == "Completed") & t.c.completed_at.isnot(None)
+    day = case((done, func.date(t.c.completed_at)), else_=None).label("day")
+    rows = session.execute(
+        select(day, func.coalesce(func.sum(t.c.story_point), 0)).group_by(day).order_by(day)
+    ).all()
+
+    total = sum(int(points) for _, points in rows)
+    start = sprint.start_date or date.today()
+    end = sprint.end_date or start + timedelta(days=DEFAULT_SPRINT_DAYS)
+    remaining, left = [(start.isoformat(), total)], total
+    for d, points in rows:
+        if d is None:
+            continue
+        left -= int(points)
+        remaining.append((str(d)[:10], left))
+    today = min(date.today(), end).isoformat()
+    if sprint.status == "Active" and remaining[-1][0] < today:
+        remaining.append((today, left))
+    return (sprint.id, start.isoformat(), end.isoformat(), total, remaining)
+
+
+def velocity_series(session):
+    last = select(Sprint.id).where(Sprint.status == "Completed").order_by(Sprint.id.desc()).limit(VELOCITY_SPRINTS)
+    last_ids = [r.id for r in session.execute(last)]
+    if not last_ids:
+        return ()
+    t = _sprint_tasks(lambda col: col.in_(last_ids))
+    rows = session.execute(
+        select(
+            t.c.sprint_id,
+            func.coalesce(func.sum(t.c.story_point), 0),
+            func.coalesce(func.sum(case((t.c.status == "Completed", t.c.story_point), else_=0)), 0),
+        ).group_by(t.c.sprint_id).order_by(t.c.sprint_id)
+    ).all()
+    return tuple((sid, int(committed), int(done)) for sid, committed, done in rows)
+
+
+async def _render(kind, key, series, renderer):
+    cached = _rendered.get((kind, key))
+    if cached and cached[0] == series:
+        _rendered.move_to_end((kind, key))
+        return cached[1]
+    loop = asyncio.get_running_loop()
+    png = await loop.run_in_executor(_executor(), renderer, series)
+    _rendered[(kind, key)] = (series, png)
+    while len(_rendered) > MAX_CACHED_CHARTS:
+        _rendered.popitem(last=False)
+    return png
+
+
+# ============================
+# /burndown [sprint_id] و /velocity
+# ============================
+@read_only
+@query_budget(3)
+async def burndown(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    session = SessionLocal()
+    user = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
+    if not user:
+        session.close()
+        await update.message.reply_text("❌ کاربر یافت نشد.")
+        return
+
+    q = session.query(Sprint)
+    if context.args and context.args[0].isdigit():
+        sprint = q.filter(Sprint.id == int(context.args[0])).first()
+    else:
+        sprint = q.filter(Sprint.created_by == user.id, Sprint.status == "Active").order_by(Sprint.id.desc()).first()
+    if not sprint:
+        session.close()
+        await update.message.reply_text("❌ اسپرینتی یافت نشد.")
+        return
+
+    series = query_cache.get_or_load(
+        ("chart:burndown", current_team_id.get(), sprint.id), CHART_TABLES, lambda: burndown_series(session, sprint)
+    )
+    session.close()
+    try:
+        png = await _render("burndown", sprint.id, series, render_burndown)
+    except ImportError:
+        await update.message.reply_text("❌ رسم نمودار در دسترس نیست (matplotlib نصب نیست).")
+        return
+    await update.message.reply_photo(photo=png, caption=f"📉 Burndown اسپرینت {sprint.id}")
+
+@read_only
+@query_budget(3)
+async def velocity(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    session = SessionLocal()
+    user = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
+    if not user or user.role not in ["ProductOwner", "CEO"]:
+        session.close()
+        await update.message.reply_text("⛔️ شما دسترسی به این بخش ندارید.")
+        return
+
+    team_id = current_team_id.get()
+    series = query_cache.get_or_load(("chart:velocity", team_id), CHART_TABLES, lambda: velocity_series(session))
+    session.close()
+    if not series:
+        await update.message.reply_text("❌ هنوز اسپرینت بسته‌شده‌ای وجود ندارد.")
+        return
+    try:
+        png = await _render("velocity", team_id, series, render_velocity)
+    except ImportError:
+        await update.message.reply_text("❌ رسم نمودار در دسترس نیست (matplotlib نصب نیست).")
+        return
+    await update.message.reply_photo(photo=png, caption="📊 Velocity اسپرینت‌های اخیر")
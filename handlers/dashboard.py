@@ -0,0 +1,318 @@
+# handlers/dashboard.py
+
+import asyncio
+import logging
+import threading
+from sqlalchemy import event, select, func
+from sqlalchemy.sql import operators, visitors
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter
+from telegram import Update
+from telegram.error import BadRequest, Forbidden
+from telegram.ext import ContextTypes
+from database.db import SessionLocal
+from database.models import User, Sprint, Task
+from database.query_budget import query_budget
+from database.tenancy import unscoped
+import config
+
+logger = logging.getLogger(__name__)
+
+# داشبورد سنجاق‌شده برای هر اسپرینت فعال که با تغییر وضعیت تسک‌ها در جا ویرایش می‌شود.
+# تغییرات از رویدادهای session جمع می‌شوند و در بازه‌ی DASHBOARD_DEBOUNCE_SECONDS
+# به یک کوئری تجمیعی و حداکثر یک edit_message_text برای هر پیام تبدیل می‌شوند.
+# پیام‌ها در chat_data["dashboards"] هر چت نگه داشته می‌شوند: sprint_id -> [message_id, text]
+# (chat_data با PicklePersistence ذخیره می‌شود و داشبوردها پس از راه‌اندازی مجدد هم به‌روز می‌مانند)
+
+ALL = object()
+STATUS_LINES = [
+    ("NotStarted", "⬜ شروع‌نشده"),
+    ("InProgress", "🔄 در حال انجام"),
+    ("InReview", "🧐 در بازبینی"),
+    ("Completed", "✅ تکمیل‌شده"),
+]
+
+_apps = {}  # team_id -> Application
+_loop = None
+_lock = threading.Lock()
+_dirty = set()        # sprint_id ها یا ALL
+_dirty_tasks = set()  # task_id هایی که اسپرینتشان هنگام refresh خوانده می‌شود
+_timer = None
+
+
+def start(app):
+    global _loop
+    _apps[app.bot_data.get("team_id")] = app
+    _loop = asyncio.get_running_loop()
+
+
+def stop(app):
+    global _loop, _timer
+    _apps.pop(app.bot_data.get("team_id"), None)
+    if not _apps:
+        if _timer is not None:
+            _timer.cancel()
+            _timer = None
+        _loop = None
+
+
+# ============================
+# Change tracking via session events
+# ============================
+def _changed_sprints(session):
+    return session.info.setdefault("dashboard_sprints", set())
+
+
+def _changed_tasks(session):
+    return session.info.setdefault("dashboard_tasks", set())
+
+
+def _ids_in_criteria(whereclause, column):
+    # مقادیر column = :x و column IN (...) در شرط WHERE؛ None اگر شرطی روی این ستون نیست
+    ids = None
+    for element in visitors.iterate(whereclause):
+        if not isinstance(element, BinaryExpression) or not isinstance(element.right, BindParameter):
+            continue
+        # ستون‌های دستورهای ORM annotate شده‌اند؛ مقایسه با نام جدول و ستون
+        left_table = getattr(element.left, "table", None)
+        if getattr(left_table, "name", None) != column.table.name or getattr(element.left, "name", None) != column.name:
+            continue
+        if element.operator is operators.eq:
+            ids = (ids or set()) | {element.right.value}
+        elif element.operator is operators.in_op:
+            ids = (ids or set()) | set(element.right.value or ())
+    return ids
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_flushed_sprints(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Task):
+            _changed_sprints(session).add(obj.sprint_id)
+        elif isinstance(obj, Sprint):
+            _changed_sprints(session).add(obj.id)
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _collect_bulk_sprints(orm_execute_state):
+    # update()/delete() مجموعه‌ای: اسپرینت‌ها (یا تسک‌ها) از شرط WHERE خوانده می‌شوند؛
+    # فقط اگر شرط قابل تشخیص نباشد همه‌ی داشبوردها به‌روز می‌شوند
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    statement = orm_execute_state.statement
+    table = getattr(statement, "table", None)
+    if table is None or table.name not in ("tasks", "sprints"):
+        return
+    session = orm_execute_state.session
+    whereclause = statement.whereclause
+    if whereclause is not None:
+        if table.name == "sprints":
+            sprint_ids = _ids_in_criteria(whereclause, Sprint.__table__.c.id)
+        else:
+            sprint_ids = _ids_in_criteria(whereclause, Task.__table__.c.sprint_id)
+            task_ids = _ids_in_criteria(whereclause, Task.__table__.c.id)
+            if sprint_ids is None and task_ids is not None:
+                _changed_tasks(session).update(task_ids)
+                return
+        if sprint_ids is not None:
+            _changed_sprints(session).update(sprint_ids)
+            return
+    _changed_sprints(session).add(ALL)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _notify_on_commit(session):
+    sprints = session.info.pop("dashboard_sprints", None)
+    tasks = session.info.pop("dashboard_tasks", None)
+    if sprints or tasks:
+        mark_dirty(sprints or (), tasks or ())
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("dashboard_sprints", None)
+    session.info.pop("dashboard_tasks", None)
+
+
+def mark_dirty(sprint_ids, task_ids=()):
+    # ممکن است از thread دیگری (asyncio.to_thread) فراخوانی شود
+    loop = _loop
+    if loop is None or loop.is_closed():
+        return
+    with _lock:
+        _dirty.update(sprint_ids)
+        _dirty_tasks.update(task_ids)
+    loop.call_soon_threadsafe(_schedule)
+
+
+def _schedule():
+    global _timer
+    if _timer is None and _loop is not None:
+        _timer = _loop.call_later(config.DASHBOARD_DEBOUNCE_SECONDS, _fire)
+
+
+def _fire():
+    global _timer
+    _timer = None
+    asyncio.ensure_future(refresh())
+
+
+# ============================
+# Rendering
+# ============================
+def _progress_bar(done, total, width=10):
+    filled = round(width * done / total) if total else 0
+    return "▓" * filled + "░" * (width - filled)
+
+
+def render(sprint_id, sprint_status, start_date, end_date, stats):
+    total_count = sum(c for c, _ in stats.values())
+    total_points = sum(p for _, p in stats.values())
+    done_points = stats.get("Completed", (0, 0))[1]
+
+    lines = [f"📌 داشبورد اسپرینت {sprint_id}"]
+    if start_date:
+        lines.append(f"🗓 {start_date} تا {end_date or '—'}")
+    lines.append("")
+    for status, label in STATUS_LINES:
+        count, points = stats.get(status, (0, 0))
+        lines.append(f"{label}: {count} ({points} امتیاز)")
+    percent = (100 * done_points / total_points) if total_points else 0
+    lines.append("")
+    lines.append(f"پیشرفت: {_progress_bar(done_points, total_points)} {percent:.0f}%")
+    lines.append(f"مجموع: {total_count} تسک، {total_points} امتیاز")
+    if sprint_status == "Completed":
+        lines.append("\n🏁 اسپرینت بسته شد.")
+    return "\n".join(lines)
+
+
+def load_texts(session, sprint_ids):
+    rows = session.execute(
+        select(
+            Sprint.id, Sprint.status, Sprint.start_date, Sprint.end_date,
+            Task.status, func.count(Task.id), func.coalesce(func.sum(Task.story_point), 0),
+        )
+        .outerjoin(Task, Task.sprint_id == Sprint.id)
+        .where(Sprint.id.in_(sprint_ids))
+        .group_by(Sprint.id, Sprint.status, Sprint.start_date, Sprint.end_date, Task.status)
+    ).all()
+
+    sprints, stats = {}, {}
+    for sid, sprint_status, start_date, end_date, task_status, count, points in rows:
+        sprints[sid] = (sprint_status, start_date, end_date)
+        if task_status is not None:
+            stats.setdefault(sid, {})[task_status] = (count, int(points))
+    return {
+        sid: (info[0], render(sid, *info, stats.get(sid, {})))
+        for sid, info in sprints.items()
+    }
+
+
+# ============================
+# Refresh (debounced)
+# ============================
+def _dashboards(app):
+    # sprint_id -> {chat_id: [message_id, text]} از chat_data همه‌ی چت‌های این ربات
+    index = {}
+    for chat_id, data in app.chat_data.items():
+        for sid, entry in data.get("dashboards", {}).items():
+            index.setdefault(sid, {})[chat_id] = entry
+    return index
+
+
+async def refresh():
+    with _lock:
+        dirty = set(_dirty)
+        tasks = set(_dirty_tasks)
+        _dirty.clear()
+        _dirty_tasks.clear()
+
+    indexes = [(app, _dashboards(app)) for app in list(_apps.values())]
+    if not any(index for _, index in indexes):
+        return
+
+    session = SessionLocal()
+    try:
+        with unscoped():
+            if tasks and ALL not in dirty:
+                dirty.update(session.scalars(
+                    select(Task.sprint_id).where(Task.id.in_(tasks), Task.sprint_id.isnot(None)).distinct()
+                ))
+            plan = []
+            for app, index in indexes:
+                targets = list(index) if ALL in dirty else [sid for sid in dirty if sid in index]
+                if targets:
+                    plan.append((app, index, targets))
+            # شناسه‌ی اسپرینت‌ها یکتاست؛ یک کوئری برای همه‌ی تیم‌ها
+            texts = load_texts(session, {sid for _, _, targets in plan for sid in targets}) if plan else {}
+    finally:
+        session.close()
+
+    for app, index, targets in plan:
+        await _apply(app, index, targets, texts)
+
+
+async def _apply(app, index, targets, texts):
+    changed = set()
+    for sid in targets:
+        status, text = texts.get(sid, ("Completed", f"📌 اسپرینت {sid} دیگر وجود ندارد."))
+        for chat_id, entry in index[sid].items():
+            chat_dashboards = app.chat_data[chat_id]["dashboards"]
+            if entry[1] != text:
+                try:
+                    await app.bot.edit_message_text(text, chat_id=chat_id, message_id=entry[0])
+                    entry[1] = text
+                except BadRequest as e:
+                    if "not modified" in str(e).lower():
+                        entry[1] = text
+                    else:
+                        # پیام حذف شده یا قابل ویرایش نیست
+                        chat_dashboards.pop(sid, None)
+                except Forbidden:
+                    chat_dashboards.pop(sid, None)
+                except Exception:
+                    logger.exception("dashboard edit failed", extra={"sprint_id": sid, "chat_id": chat_id})
+                changed.add(chat_id)
+            if status == "Completed" and chat_dashboards.pop(sid, None) is not None:
+                changed.add(chat_id)
+    if changed:
+        # تغییرات خارج از پردازش آپدیت‌اند؛ PTB باید خودش بداند این chat_data ها ذخیره شوند
+        app.mark_data_for_update_persistence(chat_ids=changed)
+
+
+# ============================
+# /dashboard [sprint_id]
+# ============================
+@query_budget(3)
+async def dashboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    session = SessionLocal()
+    user = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
+    if not user:
+        session.close()
+        await update.message.reply_text("❌ کاربر یافت نشد.")
+        return
+
+    q = session.query(Sprint.id).filter(Sprint.status == "Active")
+    if context.args and context.args[0].isdigit():
+        sprint_id = q.filter(Sprint.id == int(context.args[0])).scalar()
+    else:
+        sprint_id = q.filter(Sprint.created_by == user.id).order_by(Sprint.id.desc()).limit(1).scalar()
+    if not sprint_id:
+        session.close()
+        await update.message.reply_text("❌ اسپرینت فعالی یافت نشد.")
+        return
+
+    _, text = load_texts(session, [sprint_id])[sprint_id]
+    session.close()
+
+    chat_id = update.effective_chat.id
+    dashboards = context.chat_data.setdefault("dashboards", {})
+    old = dashboards.get(sprint_id)
+    message = await update.message.reply_text(text)
+    dashboards[sprint_id] = [message.message_id, text]
+    try:
+        await context.bot.pin_chat_message(chat_id, message.message_id, disable_notification=True)
+        if old:
+            await context.bot.unpin_chat_message(chat_id, old[0])
+    except (BadRequest, Forbidden):
+        # سنجاق کردن در گروه نیاز به دسترسی ادمین دارد؛ پیام بدون سنجاق هم به‌روز می‌شود
+        pass
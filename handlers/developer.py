@@ -1,9 +1,12 @@
 # handlers/developer.py
 
-from telegram import Update, ReplyKeyboardMarkup
+from telegram import Update, ReplyKeyboardMarkup, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
-from database.db import SessionLocal
-from database.models import Task, DailyReport, User, Sprint, Project
+from database.db import SessionLocal, read_only
+from database.query_budget import query_budget
+from database.models import Task, DailyReport, User, Sprint
+from database import cache, transitions, planning
+from handlers import callbacks
 from datetime import datetime
 
 # Conversation states for daily report
@@ -22,12 +25,14 @@ SELECT_TASK_TO_START = 101
 # --------------------
 # ارسال گزارش روزانه
 # --------------------
+@query_budget(0)
 async def send_daily_report(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(
         "📝 لطفاً تسک‌های انجام‌شده امروز را وارد کنید:\n(🔙 انصراف برای خروج)"
     )
     return REPORT_COMPLETED
 
+@query_budget(0)
 async def daily_report_completed(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.message.text.strip() == "🔙 انصراف":
         return ConversationHandler.END
@@ -35,6 +40,7 @@ async def daily_report_completed(update: Update, context: ContextTypes.DEFAULT_T
     await update.message.reply_text("📅 برنامه تسک‌های امروز را وارد کنید:")
     return REPORT_PLANNED
 
+@query_budget(0)
 async def daily_report_planned(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.message.text.strip() == "🔙 انصراف":
         return ConversationHandler.END
@@ -42,6 +48,7 @@ async def daily_report_planned(update: Update, context: ContextTypes.DEFAULT_TYP
     await update.message.reply_text("🚧 اگر مانعی هست وارد کنید، در غیر اینصورت ‘ندارد’ بنویسید:")
     return REPORT_BLOCKERS
 
+@query_budget(4)
 async def daily_report_blockers(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.message.text.strip() == "🔙 انصراف":
         return ConversationHandler.END
@@ -54,15 +61,12 @@ async def daily_report_blockers(update: Update, context: ContextTypes.DEFAULT_TY
         await update.message.reply_text("❌ کاربر یافت نشد.")
         return ConversationHandler.END
 
-    sprint_ids = {
-        t.sprint_id for t in session.query(Task).filter_by(assigned_to=user.id) if t.sprint_id
-    }
-    active = None
-    for sid in sprint_ids:
-        s = session.query(Sprint).filter_by(id=sid, status="Active").first()
-        if s:
-            active = s
-            break
+    active = (
+        session.query(Sprint.id)
+        .join(Task, Task.sprint_id == Sprint.id)
+        .filter(Task.assigned_to == user.id, Sprint.status == "Active")
+        .first()
+    )
 
     if not active:
         session.close()
@@ -85,56 +89,79 @@ async def daily_report_blockers(update: Update, context: ContextTypes.DEFAULT_TY
     return ConversationHandler.END
 
 
+# --------------------
+# دکمه‌های inline (شناسه‌ها داخل callback_data، بدون نگاشت در user_data)
+# --------------------
+def _task_keyboard(action, tasks, cancel=True):
+    rows = [[InlineKeyboardButton(f"{t.id}: {t.title}", callback_data=callbacks.encode(action, t.id))] for t in tasks]
+    if cancel:
+        rows.append([InlineKeyboardButton("🔙 انصراف", callback_data=callbacks.encode(callbacks.CANCEL))])
+    return InlineKeyboardMarkup(rows)
+
+@query_budget(0)
+async def cancel_inline(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    context.user_data.pop("selected_task_ids", None)
+    await query.edit_message_text("❌ عملیات لغو شد.")
+    return ConversationHandler.END
+
+
 # --------------------
 # ارسال تسک برای بازبینی (توسط خود کاربر)
 # --------------------
+@query_budget(2)
 async def start_task_review(update: Update, context: ContextTypes.DEFAULT_TYPE):
     session = SessionLocal()
     user = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
-    tasks = session.query(Task).filter_by(assigned_to=user.id, status="InProgress").all() if user else []
+    tasks = session.query(Task.id, Task.title).filter_by(assigned_to=user.id, status="InProgress").all() if user else []
     session.close()
 
     if not tasks:
         await update.message.reply_text("❌ تسک در حال انجام ندارید.")
         return ConversationHandler.END
 
-    context.user_data["task_map"] = {f"{t.id}: {t.title}": t.id for t in tasks}
-    keyboard = [[f"{t.id}: {t.title}"] for t in tasks] + [["🔙 انصراف"]]
     await update.message.reply_text(
         "📌 تسکی را برای ارسال به بازبینی انتخاب کنید:",
-        reply_markup=ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True)
+        reply_markup=_task_keyboard(callbacks.SUBMIT_REVIEW, tasks)
     )
     return TASK_SELECT_REVIEW
 
+@query_budget(4)
 async def select_task_for_review(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    sel = update.message.text.strip()
-    if sel == "🔙 انصراف":
-        return ConversationHandler.END
-
-    tid = context.user_data.get("task_map", {}).get(sel)
-    if not tid:
-        await update.message.reply_text("❌ انتخاب نامعتبر.")
+    query = update.callback_query
+    await query.answer()
+    _, ids = callbacks.decode(query.data)
+    if not ids:
+        await query.edit_message_text("❌ انتخاب نامعتبر.")
         return ConversationHandler.END
+    tid = ids[0]
 
     session = SessionLocal()
+    user = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
     task = session.query(Task).get(tid)
-    if not task:
+    if not user or not task:
         session.close()
-        await update.message.reply_text("❌ تسک یافت نشد.")
+        await query.edit_message_text("❌ تسک یافت نشد.")
         return ConversationHandler.END
 
     title = task.title
-    task.status = "InReview"
+    ok = transitions.transition_task(session, tid, "InProgress", "InReview", owner_id=user.id)
     session.commit()
     session.close()
 
-    await update.message.reply_text(f"✅ تسک ‘{title}’ برای بازبینی ارسال شد.")
+    if not ok:
+        await query.edit_message_text(f"⚠️ وضعیت تسک ‘{title}’ تغییر کرده است؛ دوباره تلاش کنید.")
+        return ConversationHandler.END
+    await query.edit_message_text(f"✅ تسک ‘{title}’ برای بازبینی ارسال شد.")
     return ConversationHandler.END
 
 
 # --------------------
 # مشاهده تسک‌های من
 # --------------------
+@read_only
+@query_budget(2)
 async def show_my_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
     session = SessionLocal()
     user = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
@@ -152,199 +179,265 @@ async def show_my_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # --------------------
 # شروع تسک
 # --------------------
+@query_budget(2)
 async def start_task_selection(update: Update, context: ContextTypes.DEFAULT_TYPE):
     session = SessionLocal()
     user = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
-    tasks = session.query(Task).filter_by(assigned_to=user.id, status="NotStarted").all() if user else []
+    tasks = session.query(Task.id, Task.title).filter_by(assigned_to=user.id, status="NotStarted").all() if user else []
     session.close()
 
     if not tasks:
         await update.message.reply_text("❌ تسک شروع‌نشده ندارید.")
         return ConversationHandler.END
 
-    context.user_data["start_task_map"] = {f"{t.id}: {t.title}": t.id for t in tasks}
-    keyboard = [[lbl] for lbl in context.user_data["start_task_map"].keys()] + [["❌ انصراف"]]
     await update.message.reply_text(
         "▶️ تسکی را برای شروع انتخاب کنید:",
-        reply_markup=ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True)
+        reply_markup=_task_keyboard(callbacks.START_TASK, tasks)
     )
     return SELECT_TASK_FOR_START
 
+@query_budget(4)
 async def confirm_task_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    sel = update.message.text.strip()
-    if sel == "❌ انصراف":
-        return ConversationHandler.END
-
-    tid = context.user_data.get("start_task_map", {}).get(sel)
-    if not tid:
-        await update.message.reply_text("❌ نامعتبر.")
+    query = update.callback_query
+    await query.answer()
+    _, ids = callbacks.decode(query.data)
+    if not ids:
+        await query.edit_message_text("❌ نامعتبر.")
         return ConversationHandler.END
+    tid = ids[0]
 
     session = SessionLocal()
+    user = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
     task = session.query(Task).get(tid)
-    if not task:
+    if not user or not task:
         session.close()
-        await update.message.reply_text("❌ تسک نیست.")
+        await query.edit_message_text("❌ تسک نیست.")
         return ConversationHandler.END
 
     title = task.title
-    task.status = "InProgress"
+    ok = transitions.transition_task(session, tid, "NotStarted", "InProgress", owner_id=user.id)
     session.commit()
     session.close()
 
-    await update.message.reply_text(f"✅ تسک ‘{title}’ شروع شد.")
+    if not ok:
+        await query.edit_message_text(f"⚠️ تسک ‘{title}’ قبلاً شروع شده است.")
+        return ConversationHandler.END
+    await query.edit_message_text(f"✅ تسک ‘{title}’ شروع شد.")
     return ConversationHandler.END
 
 
 # --------------------
 # افزودن تسک جدید به پروژه
 # --------------------
+@query_budget(1)
 async def start_sprint_creation(update: Update, context: ContextTypes.DEFAULT_TYPE):
     session = SessionLocal()
-    projects = session.query(Project).all()
+    projects = cache.all_projects(session)
     session.close()
 
     if not projects:
-        await update.message.reply_text("❌ پروژه‌ای نیست.")
+        await update.effective_message.reply_text("❌ پروژه‌ای نیست.")
         return ConversationHandler.END
 
-    context.user_data["project_map"] = {p.name:p.id for p in projects}
-    keyboard = [[p.name] for p in projects] + [["🔙 انصراف"]]
-    await update.message.reply_text(
+    rows = [[InlineKeyboardButton(p.name, callback_data=callbacks.encode(callbacks.SPRINT_PROJECT, p.id))] for p in projects]
+    rows.append([InlineKeyboardButton("🔙 انصراف", callback_data=callbacks.encode(callbacks.CANCEL))])
+    await update.effective_message.reply_text(
         "🚀 پروژه‌ای را برای افزودن تسک انتخاب کنید:",
-        reply_markup=ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True)
+        reply_markup=InlineKeyboardMarkup(rows)
     )
     return SELECT_PROJECT_FOR_SPRINT_CREATION
 
+def _visible_project(session, project_id):
+    # شناسه‌ی پروژه از callback_data (ورودی کاربر) می‌آید؛ فقط پروژه‌های تیم خود کاربر پذیرفته می‌شوند
+    return project_id is not None and any(p.id == project_id for p in cache.all_projects(session))
+
+@query_budget(2)
 async def show_backlog_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    text = update.message.text.strip()
-    if text == "🔙 انصراف":
-        await update.message.reply_text("❌ عملیات لغو شد.")
-        return ConversationHandler.END
+    query = update.callback_query
+    await query.answer()
+    _, ids = callbacks.decode(query.data)
+    project_id = ids[0] if ids else None
 
     session = SessionLocal()
-    project_map = context.user_data.get("project_map", {})
-    project_id = project_map.get(text)
-    if not project_id:
-        await update.message.reply_text("❌ پروژه نامعتبر است.")
+    if not _visible_project(session, project_id):
         session.close()
+        await query.edit_message_text("❌ پروژه نامعتبر است.")
         return ConversationHandler.END
-
-    tasks = session.query(Task).filter_by(project_id=project_id, status="Backlog").all()
+    tasks = cache.backlog_tasks(session, project_id)
     session.close()
     if not tasks:
-        await update.message.reply_text("❌ این پروژه تسک Backlog ندارد.")
+        await query.edit_message_text("❌ این پروژه تسک Backlog ندارد.")
         return ConversationHandler.END
 
-    context.user_data["task_map"] = {f"{t.title} ({t.story_point})": t.id for t in tasks}
     context.user_data["selected_task_ids"] = []
+    context.user_data["backlog_project_id"] = project_id
 
-    keyboard = [[k] for k in context.user_data["task_map"].keys()]
-    keyboard += [
-        ["پایان"],
-        ["🔙 انتخاب پروژه مجدد"],
-        ["🔙 انصراف"],
+    rows = [
+        [InlineKeyboardButton(f"{t.title} ({t.story_point})", callback_data=callbacks.encode(callbacks.BACKLOG_TASK, t.id))]
+        for t in tasks
     ]
-    await update.message.reply_text(
+    rows += [
+        [InlineKeyboardButton("🤖 پیشنهاد خودکار", callback_data=callbacks.encode(callbacks.BACKLOG_AUTO))],
+        [InlineKeyboardButton("پایان", callback_data=callbacks.encode(callbacks.BACKLOG_DONE))],
+        [InlineKeyboardButton("🔙 انتخاب پروژه مجدد", callback_data=callbacks.encode(callbacks.BACKLOG_REPICK))],
+        [InlineKeyboardButton("🔙 انصراف", callback_data=callbacks.encode(callbacks.CANCEL))],
+    ]
+    await query.edit_message_text(
         "✅ تسک‌هایی که می‌خواهید اضافه کنید را انتخاب کنید.\n(برای پایان «پایان» را بزنید)",
-        reply_markup=ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True)
+        reply_markup=InlineKeyboardMarkup(rows)
     )
     return SELECT_TASKS_FOR_SPRINT
 
+@query_budget(5)
 async def collect_tasks_for_sprint(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    text = update.message.text.strip()
+    query = update.callback_query
+    action, ids = callbacks.decode(query.data)
 
-    if text == "پایان":
-        selected = context.user_data.get("selected_task_ids", [])
+    if action == callbacks.BACKLOG_DONE:
+        await query.answer()
+        selected = context.user_data.pop("selected_task_ids", [])
         if not selected:
-            await update.message.reply_text("❌ هیچ تسکی انتخاب نشده.")
+            await query.edit_message_text("❌ هیچ تسکی انتخاب نشده.")
             return ConversationHandler.END
         session = SessionLocal()
         user = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
-        sprint = Sprint(start_date=datetime.utcnow(), status="Active", created_by=user.id)
-        session.add(sprint); session.flush()
-        for tid in selected:
-            task = session.query(Task).get(tid)
-            if task:
-                task.sprint_id = sprint.id
-                task.status = "NotStarted"
-                task.assigned_to = user.id
+        _, taken = planning.commit_sprint(session, user.id, selected)
         session.commit(); session.close()
-        await update.message.reply_text("✅ تسک‌ها اضافه شدند.")
+        if not taken:
+            await query.edit_message_text("❌ همه‌ی تسک‌ها پیش‌تر توسط دیگران برداشته شده بودند؛ اسپرینتی ساخته نشد.")
+        elif taken < len(selected):
+            await query.edit_message_text(f"✅ {taken} تسک اضافه شد؛ بقیه پیش‌تر توسط دیگران برداشته شده بودند.")
+        else:
+            await query.edit_message_text("✅ تسک‌ها اضافه شدند.")
         return ConversationHandler.END
 
-    if text == "🔙 انصراف":
-        await update.message.reply_text("❌ عملیات لغو شد.")
+    if action == callbacks.BACKLOG_REPICK:
+        await query.answer()
+        context.user_data.pop("selected_task_ids", None)
+        return await start_sprint_creation(update, context)
+
+    session = SessionLocal()
+    project_id = context.user_data.get("backlog_project_id")
+    if not _visible_project(session, project_id):
+        session.close()
+        await query.answer("❌ پروژه نامعتبر است.")
         return ConversationHandler.END
+    tasks = cache.backlog_tasks(session, project_id)
 
-    if text == "🔙 انتخاب پروژه مجدد":
-        return await start_sprint_creation(update, context)
+    if action == callbacks.BACKLOG_AUTO:
+        user = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
+        capacity = planning.capacity_for(session, user.id)
+        session.close()
+        await query.answer()
+
+        chosen = planning.propose([(t.id, t.story_point) for t in tasks], capacity)
+        if not chosen:
+            await query.message.reply_text(f"❌ هیچ ترکیبی در ظرفیت {capacity} امتیاز جا نمی‌شود.")
+            return SELECT_TASKS_FOR_SPRINT
+
+        context.user_data["selected_task_ids"] = chosen
+        by_id = {t.id: t for t in tasks}
+        total = sum(by_id[tid].story_point for tid in chosen)
+        lines = [f"🔹 {by_id[tid].title} ({by_id[tid].story_point})" for tid in chosen]
+        await query.message.reply_text(
+            f"🤖 پیشنهاد برای ظرفیت {capacity} امتیاز ({total} امتیاز، {len(chosen)} تسک):\n"
+            + "\n".join(lines)
+            + "\n\nبرای ثبت «پایان» را بزنید."
+        )
+        return SELECT_TASKS_FOR_SPRINT
 
-    tid = context.user_data.get("task_map", {}).get(text)
-    if tid and tid not in context.user_data["selected_task_ids"]:
-        context.user_data["selected_task_ids"].append(tid)
-        await update.message.reply_text(f"➕ تسک ‘{text}’ اضافه شد؛ برای پایان «پایان» را بزنید.")
+    session.close()
+    selected = context.user_data.setdefault("selected_task_ids", [])
+    tid = ids[0] if ids else None
+    if tid and tid not in selected and any(t.id == tid for t in tasks):
+        selected.append(tid)
+        await query.answer(f"➕ تسک {tid} اضافه شد؛ برای پایان «پایان» را بزنید.")
     else:
-        await update.message.reply_text("❌ نامعتبر یا تکراری است.")
+        await query.answer("❌ نامعتبر یا تکراری است.")
     return SELECT_TASKS_FOR_SPRINT
 
 
 # --------------------
 # بازبینی و تأیید/رد تسک‌های دیگران
 # --------------------
+@query_budget(2)
 async def start_review_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
     session = SessionLocal()
     me = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
-    tasks = session.query(Task).filter(Task.status=="InReview", Task.assigned_to!=me.id).all() if me else []
+    tasks = session.query(Task.id, Task.title, Task.version).filter(Task.status=="InReview", Task.assigned_to!=me.id).all() if me else []
     session.close()
 
     if not tasks:
         await update.message.reply_text("❌ کاری برای بازبینی ندارید.")
         return ConversationHandler.END
 
-    context.user_data["review_map"] = {f"{t.id}: {t.title}": t.id for t in tasks}
-    keyboard = [[f"{t.id}: {t.title}"] for t in tasks] + [["🔙 انصراف"]]
+    rows = [
+        [InlineKeyboardButton(f"{t.id}: {t.title}", callback_data=callbacks.encode(callbacks.REVIEW_SELECT, t.id, t.version))]
+        for t in tasks
+    ]
+    rows.append([InlineKeyboardButton("🔙 انصراف", callback_data=callbacks.encode(callbacks.CANCEL))])
     await update.message.reply_text(
         "🧐 تسکی برای بازبینی انتخاب کنید:",
-        reply_markup=ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True)
+        reply_markup=InlineKeyboardMarkup(rows)
     )
     return REVIEW_SELECT_TASK
 
+@query_budget(2)
 async def review_select_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    sel = update.message.text.strip()
-    if sel == "🔙 انصراف":
-        return ConversationHandler.END
-    tid = context.user_data.get("review_map", {}).get(sel)
-    if not tid:
-        await update.message.reply_text("❌ نامعتبر.")
+    query = update.callback_query
+    await query.answer()
+    _, ids = callbacks.decode(query.data)
+    if len(ids) != 2:
+        await query.edit_message_text("❌ نامعتبر.")
         return ConversationHandler.END
+    tid, version = ids
 
     session = SessionLocal()
-    task = session.query(Task).get(tid)
+    me = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
+    task = session.get(Task, tid)
     session.close()
+    if not task or task.status != "InReview" or task.version != version:
+        await query.edit_message_text("⚠️ این تسک دیگر در انتظار بازبینی نیست.")
+        return ConversationHandler.END
+    # فهرست start_review_tasks تسک‌های خود کاربر را ندارد، اما داده‌ی callback قابل جعل است
+    if not me or task.assigned_to == me.id:
+        await query.edit_message_text("⛔️ نمی‌توانید تسک خودتان را بازبینی کنید.")
+        return ConversationHandler.END
     context.user_data["review_task_id"] = tid
+    context.user_data["review_task_version"] = version
 
     keyboard = [["✅ تأیید"], ["❌ رد"]]
-    await update.message.reply_text(f"🧐 تسک ‘{task.title}’؟", reply_markup=ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True))
+    await query.message.reply_text(f"🧐 تسک ‘{task.title}’؟", reply_markup=ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True))
     return REVIEW_DECISION
 
+@query_budget(6)
 async def review_decision(update: Update, context: ContextTypes.DEFAULT_TYPE):
     choice = update.message.text.strip()
     tid = context.user_data.get("review_task_id")
 
     if choice == "✅ تأیید":
         session = SessionLocal()
-        task = session.query(Task).get(tid)
+        me = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
+        task = session.get(Task, tid) if tid else None
+        # تسک در این فاصله آرشیو شده یا شناسه‌ی ذخیره‌شده در گفتگو کهنه است
+        if task is None:
+            session.close()
+            await update.message.reply_text("⚠️ این تسک دیگر در انتظار بازبینی نیست.")
+            return ConversationHandler.END
+        if not me or task.assigned_to == me.id:
+            session.close()
+            await update.message.reply_text("⛔️ نمی‌توانید تسک خودتان را بازبینی کنید.")
+            return ConversationHandler.END
         title, sp = task.title, task.story_point
-        dev = session.query(User).get(task.assigned_to)
-        # اضافه کردن امتیاز
-        if dev:
-            dev.total_points += sp
-        task.status = "Completed"
-        task.reviewed = True
+        # تغییر وضعیت و اضافه کردن امتیاز فقط اگر بازبین دیگری زودتر اقدام نکرده باشد
+        ok = transitions.approve_task(session, tid, context.user_data.get("review_task_version"))
         session.commit()
         session.close()
 
+        if not ok:
+            await update.message.reply_text(f"⚠️ تسک ‘{title}’ قبلاً توسط بازبین دیگری بررسی شده است.")
+            return ConversationHandler.END
+
         await update.message.reply_text(f"✅ تسک ‘{title}’ تأیید شد و {sp} امتیاز اضافه شد.")
         # پیام تأیید دریافت‌شدن توسط ربات
         await update.message.reply_text("🤖 درخواست شما ثبت شد و ربات آن را دریافت کرد.")
@@ -359,19 +452,30 @@ async def review_decision(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ لطفاً یکی از دو گزینه را انتخاب کنید.")
         return REVIEW_DECISION
     
+@query_budget(3)
 async def review_reason(update: Update, context: ContextTypes.DEFAULT_TYPE):
     reason = update.message.text.strip()
     tid = context.user_data.get("review_task_id")
     session = SessionLocal()
-    task = session.query(Task).get(tid)
+    task = session.get(Task, tid) if tid else None
+    if task is None:
+        session.close()
+        await update.message.reply_text("⚠️ این تسک دیگر در انتظار بازبینی نیست.")
+        return ConversationHandler.END
     title = task.title
 
     # برگرداندن وضعیت به 'InProgress'
-    task.reason = reason
-    task.status = "InProgress"
+    ok = transitions.transition_task(
+        session, tid, "InReview", "InProgress",
+        context.user_data.get("review_task_version"), reason=reason
+    )
     session.commit()
     session.close()
 
+    if not ok:
+        await update.message.reply_text(f"⚠️ تسک ‘{title}’ قبلاً توسط بازبین دیگری بررسی شده است.")
+        return ConversationHandler.END
+
     await update.message.reply_text(f"✅ تسک ‘{title}’ رد شد و دلیل شما ثبت گردید.")
     # پیام ضبط‌شدن توسط ربات
     await update.message.reply_text("🤖 درخواست شما ثبت شد و ربات آن را دریافت کرد.")
@@ -0,0 +1,172 @@
+# handlers/notifications.py
+
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from telegram.error import BadRequest, Forbidden, RetryAfter
+from database.db import SessionLocal
+from database.models import User, Task
+from database import events
+from database.tenancy import unscoped
+import config
+
+logger = logging.getLogger(__name__)
+
+# اعلان تغییر وضعیت تسک‌ها به بازبین‌ها و صاحب تسک، بر اساس رویدادهای database.events.
+# رویدادهای NOTIFY_BATCH_SECONDS اخیر برای هر گیرنده در یک پیام جمع می‌شوند و
+# ارسال‌ها با حداکثر NOTIFY_CONCURRENCY درخواست هم‌زمان انجام می‌شود.
+
+MAX_LINES = 20
+SEND_ATTEMPTS = 3
+
+_apps = {}  # team_id -> Application
+_loop = None
+_lock = threading.Lock()
+_pending = []
+_timer = None
+
+
+def start(app):
+    global _loop
+    _apps[app.bot_data.get("team_id")] = app
+    _loop = asyncio.get_running_loop()
+
+
+def stop(app):
+    global _loop, _timer
+    _apps.pop(app.bot_data.get("team_id"), None)
+    if not _apps:
+        if _timer is not None:
+            _timer.cancel()
+            _timer = None
+        _loop = None
+
+
+@events.subscribe
+def _on_events(evts):
+    # ممکن است از thread دیگری (asyncio.to_thread) فراخوانی شود
+    loop = _loop
+    transitions = [e for e in evts if isinstance(e, events.TaskTransition)]
+    if loop is None or loop.is_closed() or not transitions:
+        return
+    with _lock:
+        _pending.extend(transitions)
+    loop.call_soon_threadsafe(_schedule)
+
+
+def _schedule():
+    global _timer
+    if _timer is None and _loop is not None:
+        _timer = _loop.call_later(config.NOTIFY_BATCH_SECONDS, _fire)
+
+
+def _fire():
+    global _timer
+    _timer = None
+    asyncio.ensure_future(flush())
+
+
+# ============================
+# Recipients and messages
+# ============================
+def _line(evt, title, reason):
+    if evt.to_status == "InReview":
+        return f"🧐 تسک ‘{title}’ برای بازبینی ارسال شد."
+    if evt.to_status == "Completed":
+        return f"✅ تسک ‘{title}’ تأیید شد."
+    if evt.from_status == "InReview":
+        return f"❌ تسک ‘{title}’ رد شد.\n   دلیل: {reason or '—'}"
+    return None
+
+
+def build_messages(session, evts):
+    # کلید پیام‌ها (team_id, chat_id) است؛ هر پیام با ربات همان تیم ارسال می‌شود
+    task_ids = {e.task_id for e in evts}
+    tasks = {
+        row.id: row for row in session.query(
+            Task.id, Task.team_id, Task.title, Task.reason, Task.assigned_to, User.telegram_id
+        ).outerjoin(User, User.id == Task.assigned_to).filter(Task.id.in_(task_ids))
+    }
+    # بازبین‌ها: همه‌ی کاربران همان تیم به‌جز صاحب تسک (همان قاعده‌ی «🧐 بازبینی تسک‌ها»)
+    reviewers = defaultdict(list)
+    review_teams = {tasks[e.task_id].team_id for e in evts if e.to_status == "InReview" and e.task_id in tasks}
+    if review_teams:
+        for row in session.query(User.id, User.team_id, User.telegram_id).filter(
+            User.team_id.in_(review_teams), User.telegram_id.isnot(None)
+        ):
+            reviewers[row.team_id].append(row)
+
+    lines = defaultdict(list)
+    for evt in evts:
+        task = tasks.get(evt.task_id)
+        line = task and _line(evt, task.title, task.reason)
+        if not line:
+            continue
+        if evt.to_status == "InReview":
+            for reviewer in reviewers[task.team_id]:
+                if reviewer.id != task.assigned_to:
+                    lines[(task.team_id, reviewer.telegram_id)].append(line)
+        elif task.telegram_id:
+            lines[(task.team_id, task.telegram_id)].append(line)
+
+    messages = {}
+    for key, items in lines.items():
+        if len(items) == 1:
+            messages[key] = items[0]
+            continue
+        shown = items[:MAX_LINES]
+        text = "🔔 اعلان‌ها:\n\n" + "\n".join(shown)
+        if len(items) > MAX_LINES:
+            text += f"\n… و {len(items) - MAX_LINES} مورد دیگر"
+        messages[key] = text
+    return messages
+
+
+# ============================
+# Bounded-concurrency sender
+# ============================
+async def send_all(bots, messages, concurrency=None):
+    semaphore = asyncio.Semaphore(concurrency or config.NOTIFY_CONCURRENCY)
+
+    async def send(team_id, chat_id, text):
+        bot = bots.get(team_id)
+        if bot is None:
+            return False
+        async with semaphore:
+            for _ in range(SEND_ATTEMPTS):
+                try:
+                    await bot.send_message(chat_id, text)
+                    return True
+                except RetryAfter as e:
+                    await asyncio.sleep(e.retry_after)
+                except (Forbidden, BadRequest):
+                    # کاربر ربات را مسدود کرده یا چت وجود ندارد
+                    return False
+                except Exception:
+                    logger.exception("notification send failed", extra={"chat_id": chat_id})
+                    return False
+            return False
+
+    results = await asyncio.gather(*(send(team_id, c, t) for (team_id, c), t in messages.items()))
+    return sum(results)
+
+
+async def flush():
+    with _lock:
+        evts = list(_pending)
+        _pending.clear()
+    if not _apps or not evts:
+        return 0
+
+    session = SessionLocal()
+    try:
+        with unscoped():
+            messages = build_messages(session, evts)
+    finally:
+        session.close()
+    if not messages:
+        return 0
+    sent = await send_all({team_id: app.bot for team_id, app in _apps.items()}, messages)
+    logger.info("notifications sent", extra={"events": len(evts), "recipients": len(messages), "sent": sent})
+    return sent
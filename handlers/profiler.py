@@ -0,0 +1,245 @@
+# handlers/profiler.py
+
+import asyncio
+import io
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from telegram import Update
+from telegram.ext import ContextTypes
+from database.db import SessionLocal
+from database.query_budget import query_budget
+from database.models import User
+
+# پروفایلر نمونه‌برداری و اسنپ‌شات حافظه برای ربات در حال اجرا (فقط مدیرعامل).
+# تا زمانی که فرمانی اجرا نشده، هیچ نخ یا ردیابی فعالی وجود ندارد.
+
+MAX_PROFILE_SECONDS = 300
+TOP_N = 25
+
+
+class SamplingProfiler:
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self._thread = None
+        self._stop = threading.Event()
+        self.started_at = None
+        self.stopped_at = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, target_thread_id):
+        self.samples.clear()
+        self._stop.clear()
+        self.started_at = time.monotonic()
+        self.stopped_at = None
+        self._thread = threading.Thread(
+            target=self._run, args=(target_thread_id,), name="sampling-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self.stopped_at = time.monotonic()
+        return self.samples
+
+    def _run(self, target_thread_id):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(target_thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self):
+        # قالب collapsed stacks قابل استفاده در flamegraph.pl / speedscope
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def summary(self):
+        total = sum(self.samples.values())
+        duration = (self.stopped_at or time.monotonic()) - (self.started_at or time.monotonic())
+        own, inclusive = Counter(), Counter()
+        for stack, count in self.samples.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for f in set(frames):
+                inclusive[f] += count
+
+        lines = [f"samples: {total}  duration: {duration:.1f}s  interval: {self.interval * 1000:.0f}ms", ""]
+        lines.append("== self time ==")
+        lines += [f"{c / total:6.1%}  {f}" for f, c in own.most_common(TOP_N)] if total else []
+        lines += ["", "== inclusive time =="]
+        lines += [f"{c / total:6.1%}  {f}" for f, c in inclusive.most_common(TOP_N)] if total else []
+        return "\n".join(lines) + "\n"
+
+
+def _approx_size(obj, seen=None):
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_approx_size(k, seen) + _approx_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_approx_size(i, seen) for i in obj)
+    return size
+
+
+def _context_data_stats(application):
+    user_data = application.user_data
+    return {
+        "users": len(user_data),
+        "user_data_bytes": sum(_approx_size(d) for d in user_data.values()),
+        "bot_data_bytes": _approx_size(application.bot_data),
+    }
+
+
+async def _is_ceo(update: Update):
+    session = SessionLocal()
+    user = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
+    session.close()
+    if not user or user.role != "CEO":
+        await update.message.reply_text("⛔️ فقط مدیرعامل مجاز است.")
+        return False
+    return True
+
+
+# ============================
+# /profile <seconds> و /profile_stop
+# ============================
+def _forget(bot_data):
+    for key in ("profiler", "profiler_task", "profiler_stop"):
+        bot_data.pop(key, None)
+
+
+async def _finish_profile(context: ContextTypes.DEFAULT_TYPE, chat_id, seconds, stopped):
+    profiler = context.bot_data.get("profiler")
+    try:
+        await asyncio.wait_for(stopped.wait(), timeout=seconds)
+    except asyncio.TimeoutError:
+        pass
+    except asyncio.CancelledError:
+        # خاموش شدن ربات: نمونه‌بردار متوقف می‌شود و نتیجه‌ای ارسال نمی‌شود
+        if profiler is not None:
+            profiler.stop()
+        _forget(context.bot_data)
+        raise
+    if profiler is None:
+        return
+    profiler.stop()
+    _forget(context.bot_data)
+
+    summary = profiler.summary()
+    await context.bot.send_document(
+        chat_id=chat_id,
+        document=io.BytesIO(profiler.collapsed().encode()),
+        filename="profile.collapsed.txt",
+        caption="🔥 collapsed stacks (flamegraph.pl / speedscope)"
+    )
+    await context.bot.send_document(
+        chat_id=chat_id,
+        document=io.BytesIO(summary.encode()),
+        filename="profile_summary.txt",
+        caption=summary.splitlines()[0]
+    )
+
+@query_budget(1)
+async def profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not await _is_ceo(update):
+        return
+    if "profiler" in context.bot_data:
+        await update.message.reply_text("⚠️ پروفایلر در حال اجراست؛ برای توقف /profile_stop")
+        return
+
+    try:
+        seconds = min(int(context.args[0]), MAX_PROFILE_SECONDS) if context.args else 30
+    except ValueError:
+        seconds = 0
+    if seconds <= 0:
+        await update.message.reply_text(f"❌ استفاده: /profile <ثانیه> (۱ تا {MAX_PROFILE_SECONDS})")
+        return
+
+    profiler = SamplingProfiler()
+    profiler.start(threading.get_ident())  # نخ حلقه‌ی رویداد
+    stopped = asyncio.Event()
+    context.bot_data["profiler"] = profiler
+    context.bot_data["profiler_stop"] = stopped
+    context.bot_data["profiler_task"] = context.application.create_task(
+        _finish_profile(context, update.effective_chat.id, seconds, stopped), update=update
+    )
+    await update.message.reply_text(f"⏱️ پروفایل‌گیری به مدت {seconds} ثانیه شروع شد.")
+
+@query_budget(1)
+async def profile_stop(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not await _is_ceo(update):
+        return
+    stopped = context.bot_data.get("profiler_stop")
+    if stopped is None:
+        await update.message.reply_text("❌ پروفایلری در حال اجرا نیست.")
+        return
+    # توقف زودتر از موعد؛ نتیجه همان‌طور که در پایان زمان ارسال می‌شد ارسال می‌شود
+    stopped.set()
+    await update.message.reply_text("⏹️ پروفایلر متوقف شد؛ نتیجه در حال ارسال است.")
+
+
+# ============================
+# /memsnap [stop]
+# ============================
+@query_budget(1)
+async def memory_snapshot(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not await _is_ceo(update):
+        return
+
+    if context.args and context.args[0] == "stop":
+        tracemalloc.stop()
+        context.bot_data.pop("memsnap_baseline", None)
+        await update.message.reply_text("🛑 ردیابی حافظه متوقف شد.")
+        return
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(10)
+        context.bot_data["memsnap_baseline"] = (
+            tracemalloc.take_snapshot(), _context_data_stats(context.application)
+        )
+        await update.message.reply_text(
+            "🧠 ردیابی حافظه شروع شد. بعد از مدتی دوباره /memsnap بزنید تا رشد حافظه گزارش شود "
+            "(/memsnap stop برای توقف)."
+        )
+        return
+
+    snapshot = tracemalloc.take_snapshot()
+    base_snapshot, base_stats = context.bot_data.get("memsnap_baseline", (None, None))
+    stats = _context_data_stats(context.application)
+    current, peak = tracemalloc.get_traced_memory()
+
+    lines = [f"traced: {current / 1024:.0f} KiB  peak: {peak / 1024:.0f} KiB", ""]
+    lines.append("== user_data / bot_data ==")
+    for key, value in stats.items():
+        growth = f"  (+{value - base_stats[key]})" if base_stats else ""
+        lines.append(f"{key}: {value}{growth}")
+
+    lines += ["", "== top allocations =="]
+    lines += [str(s) for s in snapshot.statistics("lineno")[:TOP_N]]
+    if base_snapshot is not None:
+        lines += ["", "== growth since baseline =="]
+        lines += [str(s) for s in snapshot.compare_to(base_snapshot, "lineno")[:TOP_N]]
+
+    text = "\n".join(lines) + "\n"
+    await update.message.reply_document(
+        document=io.BytesIO(text.encode()),
+        filename="memory_snapshot.txt",
+        caption=lines[0]
+    )
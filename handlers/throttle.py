@@ -0,0 +1,145 @@
+# handlers/throttle.py
+
+import logging
+import time
+from collections import Counter, OrderedDict
+from telegram import Update
+from telegram.ext import ContextTypes, ApplicationHandlerStop
+from database.db import SessionLocal
+from database.query_budget import query_budget
+from database.models import User
+import config
+
+# مرحله‌ی ورودی، پیش از همه‌ی هندلرها (گروه منفی در bot.main):
+#  - توکن‌باکت برای هر (کاربر، چت)؛ آپدیت بدون توکن دور ریخته می‌شود و کاربر یک بار پیام «آهسته‌تر» می‌گیرد.
+#    هیچ آپدیتی منتظر نمی‌ماند: آپدیت‌ها به ترتیب پردازش می‌شوند و تأخیر یک کاربر صف بقیه را هم نگه می‌داشت.
+#  - حذف پیام متنی/داده‌ی دکمه‌ی تکراری در پنجره‌ی کوتاه و callback_query id تکراری
+
+logger = logging.getLogger("throttle")
+
+IDLE_EVICT_SECONDS = 600
+MAX_SEEN_CALLBACKS = 10000
+SLOW_DOWN = "⏳ پیام‌ها خیلی سریع ارسال می‌شوند؛ لطفاً چند لحظه صبر کنید."
+
+
+class Throttle:
+    def __init__(self, rate, burst, dedupe_window):
+        self.rate = rate
+        self.burst = burst
+        self.dedupe_window = dedupe_window
+        self._buckets = {}                 # key -> [tokens, last_refill]
+        self._warned = set()               # کلیدهایی که در دوره‌ی فعلی محدودیت، هشدار گرفته‌اند
+        self._last_payload = {}            # key -> (payload, ts)
+        self._seen_callbacks = OrderedDict()
+        self._last_sweep = time.monotonic()
+        self.stats = Counter()
+
+    def is_duplicate(self, key, payload, callback_id, now):
+        if callback_id is not None:
+            if callback_id in self._seen_callbacks:
+                return True
+            self._seen_callbacks[callback_id] = now
+            if len(self._seen_callbacks) > MAX_SEEN_CALLBACKS:
+                self._seen_callbacks.popitem(last=False)
+
+        if payload is None:
+            return False
+        last = self._last_payload.get(key)
+        self._last_payload[key] = (payload, now)
+        return last is not None and last[0] == payload and now - last[1] < self.dedupe_window
+
+    def reserve(self, key, now):
+        # False یعنی توکنی نمانده و آپدیت باید دور ریخته شود
+        tokens, last = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens < 1:
+            self._buckets[key] = [tokens, now]
+            return False
+        self._buckets[key] = [tokens - 1, now]
+        self._warned.discard(key)
+        return True
+
+    def should_warn(self, key):
+        if key in self._warned:
+            return False
+        self._warned.add(key)
+        return True
+
+    def sweep(self, now):
+        if now - self._last_sweep < IDLE_EVICT_SECONDS:
+            return
+        self._last_sweep = now
+        for key, (_, last) in list(self._buckets.items()):
+            if now - last > IDLE_EVICT_SECONDS:
+                self._buckets.pop(key, None)
+                self._last_payload.pop(key, None)
+                self._warned.discard(key)
+
+
+throttle = Throttle(
+    config.THROTTLE_RATE, config.THROTTLE_BURST, config.DEDUPE_WINDOW_SECONDS
+)
+
+
+def _payload(update: Update):
+    if update.callback_query is not None:
+        return "cb:" + (update.callback_query.data or ""), update.callback_query.id
+    if update.message is not None and update.message.text is not None:
+        return "msg:" + update.message.text, None
+    return None, None
+
+
+async def throttle_updates(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+    chat = update.effective_chat
+    if user is None:
+        return
+    # هر ربات (تیم) سهمیه‌ی جدا دارد
+    key = (context.bot_data.get("team_id"), user.id, chat.id if chat else None)
+    now = time.monotonic()
+    throttle.sweep(now)
+    throttle.stats["seen"] += 1
+
+    payload, callback_id = _payload(update)
+    if throttle.is_duplicate(key, payload, callback_id, now):
+        throttle.stats["dropped_duplicate"] += 1
+        await _drop(update)
+
+    if not throttle.reserve(key, now):
+        throttle.stats["dropped_rate"] += 1
+        notice = None
+        if throttle.should_warn(key):
+            throttle.stats["warned"] += 1
+            notice = SLOW_DOWN
+        await _drop(update, notice)
+
+
+async def _drop(update: Update, notice=None):
+    logger.info("update dropped", extra={"update_id": update.update_id})
+    try:
+        if update.callback_query is not None:
+            # چرخش دکمه در کلاینت متوقف شود
+            await update.callback_query.answer(notice)
+        elif notice and update.effective_message is not None:
+            await update.effective_message.reply_text(notice)
+    except Exception:
+        pass
+    raise ApplicationHandlerStop
+
+
+@query_budget(1)
+async def throttle_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    session = SessionLocal()
+    user = session.query(User).filter_by(telegram_id=update.effective_user.id).first()
+    session.close()
+    if not user or user.role != "CEO":
+        await update.message.reply_text("⛔️ فقط مدیرعامل مجاز است.")
+        return
+
+    st = throttle.stats
+    await update.message.reply_text(
+        f"🚦 ورودی: {st['seen']}\n"
+        f"🔁 تکراری حذف‌شده: {st['dropped_duplicate']}\n"
+        f"⛔️ حذف به‌خاطر نرخ: {st['dropped_rate']}\n"
+        f"⏳ هشدار «آهسته‌تر»: {st['warned']}"
+    )
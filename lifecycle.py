@@ -0,0 +1,164 @@
+# lifecycle.py
+
+import asyncio
+import logging
+import os
+import signal
+import time
+import config
+import logging_setup
+
+logger = logging.getLogger(__name__)
+
+# اجرای ربات(ها) با خاموشی مرحله‌ای به‌جای app.run_polling():
+#   1) توقف دریافت آپدیت (PTB آفست آپدیت‌های دریافت‌شده را به تلگرام تأیید می‌کند)
+#   2) پردازش آپدیت‌های در صف و هندلرهای در حال اجرا تا SHUTDOWN_DRAIN_SECONDS
+#   3) post_stop (ارسال اعلان‌های باقی‌مانده)، ذخیره‌ی وضعیت گفتگوها (persistence)
+#      و post_shutdown: ثبت write-behind و بستن engine
+#   4) بستن لاگ
+# در حالت handover (python bot.py --handover) پردازه‌ی جدید ابتدا پردازه‌ی قبلی را از روی
+# فایل PID با SIGTERM متوقف می‌کند و پس از خروج کاملش polling را از همان آفست ادامه می‌دهد؛
+# بنابراین آپدیتی نه گم می‌شود و نه دو بار پردازش.
+
+CANCEL_GRACE_SECONDS = 5  # مهلت پایان تسک‌های لغوشده پس از گذشتن SHUTDOWN_DRAIN_SECONDS
+
+
+# ============================
+# PID file / handover
+# ============================
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read_pid():
+    try:
+        with open(config.PID_FILE) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def take_over(handover):
+    pid = _read_pid()
+    if pid and pid != os.getpid() and _alive(pid):
+        if not handover:
+            raise SystemExit(
+                f"bot already running (pid {pid}); use --handover to replace it"
+            )
+        logger.info("handover: stopping previous process", extra={"old_pid": pid})
+        os.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + config.SHUTDOWN_DRAIN_SECONDS + 10
+        while _alive(pid):
+            if time.monotonic() > deadline:
+                raise SystemExit(f"previous process {pid} did not exit")
+            time.sleep(0.2)
+        logger.info("handover: previous process exited", extra={"old_pid": pid})
+
+    with open(config.PID_FILE, "w") as f:
+        f.write(str(os.getpid()))
+
+
+def release():
+    if _read_pid() == os.getpid():
+        try:
+            os.remove(config.PID_FILE)
+        except OSError:
+            pass
+
+
+# ============================
+# Run / staged shutdown
+# ============================
+async def _drain(apps, force):
+    # app.stop() صف آپدیت‌ها، jobها و تسک‌های create_task را تا انتها اجرا می‌کند
+    stopping = asyncio.ensure_future(asyncio.gather(*(app.stop() for app in apps)))
+    forced = asyncio.create_task(force.wait())
+    done, _ = await asyncio.wait(
+        {stopping, forced}, timeout=config.SHUTDOWN_DRAIN_SECONDS, return_when=asyncio.FIRST_COMPLETED
+    )
+    forced.cancel()
+    if stopping in done:
+        return True
+
+    logger.warning(
+        "drain deadline exceeded; cancelling in-flight handlers",
+        extra={"pending_updates": sum(app.update_queue.qsize() for app in apps)},
+    )
+    stopping.cancel()
+    # هندلرهای نیمه‌کاره لغو می‌شوند؛ تراکنش‌های commit‌نشده‌شان rollback می‌شود
+    current = asyncio.current_task()
+    others = [t for t in asyncio.all_tasks() if t is not current]
+    for task in others:
+        task.cancel()
+    # بعضی تسک‌ها (مثل _update_fetcher در PTB) CancelledError را می‌بلعند؛ انتظار هم مهلت دارد
+    _, pending = await asyncio.wait(others, timeout=CANCEL_GRACE_SECONDS) if others else (None, ())
+    if pending:
+        logger.warning(
+            "tasks still running after cancel; shutting down anyway",
+            extra={"tasks": sorted(t.get_name() for t in pending)},
+        )
+    return False
+
+
+async def serve(apps):
+    loop = asyncio.get_running_loop()
+    stop, force = asyncio.Event(), asyncio.Event()
+
+    def on_signal():
+        # سیگنال دوم: بدون انتظار برای تمام‌شدن هندلرها
+        (force if stop.is_set() else stop).set()
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, on_signal)
+
+    initialized = []
+    try:
+        for app in apps:
+            await app.initialize()
+            initialized.append(app)
+            if app.post_init:
+                await app.post_init(app)
+        for app in apps:
+            await app.updater.start_polling()
+            await app.start()
+        logger.info("bot started", extra={"pid": os.getpid(), "bots": len(apps)})
+
+        await stop.wait()
+        logger.info("shutdown: stop fetching updates")
+        await asyncio.gather(*(app.updater.stop() for app in apps))
+        logger.info("shutdown: draining in-flight updates")
+        drained = await _drain(apps, force)
+        logger.info("shutdown: drained", extra={"clean": drained})
+    finally:
+        for app in initialized:
+            if app.updater.running:
+                await app.updater.stop()
+            if app.running:
+                await app.stop()
+            if app.post_stop:
+                await app.post_stop(app)
+            # update_persistence + flush در app.shutdown
+            await app.shutdown()
+        for app in initialized:
+            if app.post_shutdown:
+                await app.post_shutdown(app)
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(sig)
+
+
+def run(build_apps, handover=False):
+    # build_apps (مهاجرت شِما و ساخت ربات‌ها) فقط پس از خروج پردازه‌ی قبلی اجرا می‌شود
+    take_over(handover)
+    try:
+        apps = build_apps()
+        asyncio.run(serve(apps))
+    finally:
+        release()
+        logger.info("shutdown complete")
+        logging_setup.stop_logging()
@@ -0,0 +1,177 @@
+# logging_setup.py
+
+import atexit
+import functools
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+from contextvars import ContextVar
+from sqlalchemy import event
+from telegram.ext import ConversationHandler, TypeHandler
+from database.query_budget import counting
+import config
+
+# لاگ ساخت‌یافته (JSON) که نوشتنش روی یک نخ پس‌زمینه انجام می‌شود؛
+# حلقه‌ی رویداد فقط رکورد را در صف می‌گذارد.
+
+# اطلاعات آپدیت جاری که به هر رکورد اضافه می‌شود
+log_context = ContextVar("log_context", default=None)
+
+_STD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class ContextFilter(logging.Filter):
+    def filter(self, record):
+        ctx = log_context.get()
+        if ctx:
+            for key, value in ctx.items():
+                if not hasattr(record, key):
+                    setattr(record, key, value)
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    # پیش‌فرض QueueHandler رکورد را در نخ فراخوان کپی و فرمت می‌کند؛ اینجا فقط پیام ادغام می‌شود
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STD_ATTRS and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+_listener = None
+
+
+def setup_logging(stream=None, level=None):
+    # QueueHandler روی root؛ QueueListener روی نخ جدا فرمت و می‌نویسد
+    global _listener
+    log_queue = queue.SimpleQueue()
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter())
+
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(level or config.LOG_LEVEL)
+    # لاگ هر درخواست HTTP به تلگرام (long polling) ارزشی ندارد
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    stop_logging()
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+@atexit.register
+def stop_logging():
+    # رکوردهای باقی‌مانده در صف را می‌نویسد؛ فراخوانی چندباره بی‌اثر است
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+# ============================
+# SQL sampling
+# ============================
+sql_logger = logging.getLogger("sql")
+
+
+def install_sql_sampling(engine, rate=None):
+    rate = config.SQL_LOG_SAMPLE_RATE if rate is None else rate
+    if rate <= 0:
+        return
+
+    # زمان شروع روی context همان اجرا نگه داشته می‌شود؛ دستور ناموفق چیزی روی اتصال باقی نمی‌گذارد
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None and random.random() < rate:
+            context._sql_sample_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_sql_sample_start", None)
+        if started is not None:
+            sql_logger.info(
+                "sql",
+                extra={
+                    "sql": statement,
+                    "sql_ms": round((time.perf_counter() - started) * 1000, 3),
+                    "sample_rate": rate,
+                }
+            )
+
+
+# ============================
+# Per-update handler instrumentation
+# ============================
+update_logger = logging.getLogger("updates")
+
+
+def _instrument_callback(handler):
+    callback = handler.callback
+    if getattr(callback, "_instrumented", False):
+        return
+    name = f"{callback.__module__}.{callback.__qualname__}"
+
+    @functools.wraps(callback)
+    async def wrapper(update, context, *args, **kwargs):
+        user = getattr(update, "effective_user", None)
+        token = log_context.set({
+            "update_id": getattr(update, "update_id", None),
+            "user_id": user.id if user else None,
+            "handler": name,
+        })
+        started = time.perf_counter()
+        try:
+            with counting() as queries:
+                return await callback(update, context, *args, **kwargs)
+        finally:
+            update_logger.info("handled", extra={
+                "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                "queries": queries.count,
+            })
+            log_context.reset(token)
+
+    wrapper._instrumented = True
+    handler.callback = wrapper
+
+
+def instrument_handlers(app):
+    # گروه‌های منفی و TypeHandlerها (ورودی/خروجی/میان‌افزار) شمرده نمی‌شوند تا هر آپدیت یک رکورد «handled» داشته باشد
+    for group_id, group in app.handlers.items():
+        if group_id < 0:
+            continue
+        for handler in group:
+            if isinstance(handler, TypeHandler):
+                continue
+            if isinstance(handler, ConversationHandler):
+                nested = list(handler.entry_points) + list(handler.fallbacks)
+                for state_handlers in handler.states.values():
+                    nested += state_handlers
+                for h in nested:
+                    _instrument_callback(h)
+            else:
+                _instrument_callback(handler)
+
@@ -0,0 +1,39 @@
+# tests/conftest.py
+
+import os
+import sys
+import tempfile
+
+# پیکربندی باید پیش از import ماژول‌های پروژه تنظیم شود (engine هنگام import ساخته می‌شود)
+_DB_DIR = tempfile.mkdtemp(prefix="scrum-bot-tests-")
+os.environ["SQLALCHEMY_DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+os.environ.pop("SQLALCHEMY_REPLICA_URL", None)
+os.environ.setdefault("TELEGRAM_TOKEN", "1000:test")
+os.environ["QUERY_BUDGET_STRICT"] = "1"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy import MetaData
+
+import handlers.admin  # noqa: F401  (handlers.admin پیش از bot، به خاطر import چرخشی)
+from database.db import engine, init_db
+from database.cache import query_cache
+from database import ledger
+
+
+def drop_everything():
+    # جدول‌های واقعی پایگاه‌داده، حتی اگر با مدل‌های فعلی فرق داشته باشند (تست ارتقا)
+    meta = MetaData()
+    meta.reflect(bind=engine)
+    meta.drop_all(bind=engine)
+
+
+@pytest.fixture
+def db():
+    drop_everything()
+    init_db()
+    query_cache.clear()
+    ledger._seen.clear()
+    yield engine
+    query_cache.clear()
+    ledger._seen.clear()
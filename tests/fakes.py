@@ -0,0 +1,90 @@
+# tests/fakes.py
+
+import asyncio
+import itertools
+import types
+
+# جایگزین‌های سبک Update و Context برای صدا زدن مستقیم هندلرها؛ پاسخ‌ها در sent جمع می‌شوند.
+
+_update_ids = itertools.count(1)
+
+
+class Message:
+    def __init__(self, sent, text=None, chat_id=1):
+        self.sent = sent
+        self.text = text
+        self.chat_id = chat_id
+        self.message_id = 1
+
+    async def reply_text(self, text, **kwargs):
+        self.sent.append(("reply", text, kwargs.get("reply_markup")))
+        return Message(self.sent, text, self.chat_id)
+
+    async def reply_photo(self, photo=None, **kwargs):
+        self.sent.append(("photo", kwargs.get("caption"), None))
+        return Message(self.sent, None, self.chat_id)
+
+    async def reply_document(self, document=None, **kwargs):
+        self.sent.append(("document", kwargs.get("caption"), None))
+        return Message(self.sent, None, self.chat_id)
+
+    async def pin(self, **kwargs):
+        return True
+
+
+class CallbackQuery:
+    def __init__(self, sent, data, user_id):
+        self.sent = sent
+        self.data = data
+        self.id = f"cq{next(_update_ids)}"
+        self.message = Message(sent, chat_id=user_id)
+
+    async def answer(self, text=None, **kwargs):
+        self.sent.append(("answer", text, None))
+
+    async def edit_message_text(self, text, **kwargs):
+        self.sent.append(("edit", text, kwargs.get("reply_markup")))
+
+
+class Bot:
+    # send_message ها در sent ثبت می‌شوند؛ delay برای سنجش هم‌زمانی ارسال‌ها
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.sent = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            self.sent.append((chat_id, text))
+        finally:
+            self.in_flight -= 1
+
+
+def make_update(user_id=1, text=None, data=None, sent=None):
+    sent = [] if sent is None else sent
+    update = types.SimpleNamespace(update_id=next(_update_ids), sent=sent)
+    update.effective_user = types.SimpleNamespace(id=user_id, full_name=f"user{user_id}", username=None)
+    update.effective_chat = types.SimpleNamespace(id=user_id, type="private")
+    update.message = Message(sent, text, user_id) if text is not None else None
+    update.callback_query = CallbackQuery(sent, data, user_id) if data is not None else None
+    update.effective_message = update.message or (update.callback_query and update.callback_query.message)
+    return update
+
+
+def make_context(user_data=None, args=None, bot_data=None):
+    return types.SimpleNamespace(
+        user_data={} if user_data is None else user_data,
+        chat_data={},
+        bot_data={} if bot_data is None else bot_data,
+        args=list(args or []),
+        bot=None,
+        application=None,
+    )
+
+
+def texts(update):
+    return [text for _, text, _ in update.sent]
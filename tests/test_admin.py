@@ -0,0 +1,95 @@
+# tests/test_admin.py
+
+import asyncio
+from datetime import datetime
+from telegram.error import Forbidden, RetryAfter
+from database.db import SessionLocal
+from database.models import User, Sprint, Task
+from handlers import admin, callbacks
+from fakes import make_update, make_context, texts
+
+
+class FlakyBot:
+    def __init__(self, blocked=(), rate_limited=()):
+        self.blocked = set(blocked)
+        self.rate_limited = set(rate_limited)
+        self.delivered = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if chat_id in self.blocked:
+            raise Forbidden("bot was blocked by the user")
+        if chat_id in self.rate_limited:
+            self.rate_limited.discard(chat_id)
+            raise RetryAfter(0)
+        self.delivered.append(chat_id)
+
+
+def test_standup_digest_reaches_everyone_despite_blocked_recipients(db):
+    session = SessionLocal()
+    session.add_all([User(telegram_id=chat_id, name=f"po{chat_id}", role="ProductOwner") for chat_id in (1, 2, 3)])
+    session.flush()
+    sprint = Sprint(status="Active", created_by=1, start_date=datetime.utcnow().date())
+    session.add(sprint)
+    session.flush()
+    session.add(Task(sprint_id=sprint.id, assigned_to=1, status="InProgress", story_point=1))
+    session.commit()
+    session.close()
+
+    bot = FlakyBot(blocked={1}, rate_limited={2})
+    context = make_context()
+    context.bot = bot
+    asyncio.run(admin.standup_digest_job(context))
+    assert sorted(bot.delivered) == [2, 3]
+
+
+def _in_review_task():
+    session = SessionLocal()
+    session.add_all([
+        User(telegram_id=1, name="po", role="ProductOwner", total_points=0),
+        User(telegram_id=2, name="dev", role="Developer", total_points=0),
+    ])
+    session.flush()
+    task = Task(title="t", assigned_to=2, status="InReview", story_point=5)
+    session.add(task)
+    session.commit()
+    ids = task.id, task.version
+    session.close()
+    return ids
+
+
+def _status_and_points(task_id):
+    session = SessionLocal()
+    try:
+        return session.get(Task, task_id).status, session.get(User, 2).total_points
+    finally:
+        session.close()
+
+
+def test_forged_approve_callback_from_developer_is_rejected(db):
+    task_id, version = _in_review_task()
+    # توسعه‌دهنده دکمه‌ی تایید مدیر را برای تسک خودش جعل می‌کند
+    update = make_update(2, data=callbacks.encode(callbacks.ADMIN_APPROVE, task_id, version))
+    state = asyncio.run(admin.review_decision_callback(update, make_context()))
+    assert state == admin.ConversationHandler.END
+    assert "⛔️ دسترسی محدود است." in texts(update)
+    assert _status_and_points(task_id) == ("InReview", 0)
+
+
+def test_reviewer_cannot_approve_own_task(db):
+    task_id, version = _in_review_task()
+    session = SessionLocal()
+    session.get(User, 2).role = "ProductOwner"
+    session.commit()
+    session.close()
+
+    update = make_update(2, data=callbacks.encode(callbacks.ADMIN_APPROVE, task_id, version))
+    asyncio.run(admin.review_decision_callback(update, make_context()))
+    assert "⛔️ نمی‌توانید تسک خودتان را بازبینی کنید." in texts(update)
+    assert _status_and_points(task_id) == ("InReview", 0)
+
+
+def test_admin_approves_someone_elses_task(db):
+    task_id, version = _in_review_task()
+    update = make_update(1, data=callbacks.encode(callbacks.ADMIN_APPROVE, task_id, version))
+    asyncio.run(admin.review_decision_callback(update, make_context()))
+    assert _status_and_points(task_id) == ("Completed", 5)
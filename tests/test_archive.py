@@ -0,0 +1,92 @@
+# tests/test_archive.py
+
+import asyncio
+import logging
+from datetime import date, datetime
+import bot
+from database.db import SessionLocal
+from database.models import (
+    User, Sprint, Task, DailyReport, Retrospective, ArchivedTask, ArchivedDailyReport, ArchivedRetrospective
+)
+from database.query_budget import counting
+from database import archive
+from handlers import admin, charts
+from fakes import make_update, make_context, texts
+
+
+def seed(sprints=4, per_sprint=5):
+    session = SessionLocal()
+    session.add(User(telegram_id=1, name="ceo", role="CEO"))
+    session.flush()
+    for i in range(sprints):
+        sprint = Sprint(status="Completed", created_by=1, start_date=date(2024, 1, 1 + i))
+        session.add(sprint)
+        session.flush()
+        session.add_all([
+            Task(sprint_id=sprint.id, assigned_to=1, status="Completed", story_point=2,
+                 completed_at=datetime(2024, 1, 2 + i))
+            for _ in range(per_sprint)
+        ])
+        # تسک ناتمام اسپرینت بسته‌شده در جدول اصلی می‌ماند
+        session.add(Task(sprint_id=sprint.id, status="Backlog", story_point=1))
+        session.add_all([
+            DailyReport(user_id=1, sprint_id=sprint.id, report_date=date(2024, 1, 1 + i),
+                        completed_tasks=f"s{sprint.id}", planned_tasks="-", blockers="-")
+            for _ in range(per_sprint)
+        ])
+        session.add(Retrospective(sprint_id=sprint.id, held_by=1, retro_date=date(2024, 1, 1 + i)))
+    session.commit()
+    session.close()
+
+
+def count(model):
+    session = SessionLocal()
+    try:
+        return session.query(model).count()
+    finally:
+        session.close()
+
+
+def test_archival_moves_old_sprints_in_batches(db):
+    seed()
+    with counting() as counter:
+        moved = archive.run_archival(keep=2, batch_size=3)
+
+    # اسپرینت‌های 1 و 2 آرشیو می‌شوند: 10 تسک، 10 گزارش، 2 جلسه‌ی رترو
+    assert moved == {"tasks": 10, "dailyreports": 10, "retrospectives": 2}
+    deletes = [s for s in counter.statements if s.lstrip().upper().startswith("DELETE")]
+    assert len(deletes) == 4 + 4 + 1  # ceil(10/3) + ceil(10/3) + ceil(2/3)
+
+    assert (count(ArchivedTask), count(ArchivedDailyReport), count(ArchivedRetrospective)) == (10, 10, 2)
+    assert (count(DailyReport), count(Retrospective)) == (10, 2)
+    session = SessionLocal()
+    assert session.query(Task).filter(Task.sprint_id.in_([1, 2])).count() == 2  # فقط تسک‌های Backlog
+    session.close()
+
+    assert archive.run_archival(keep=2, batch_size=3) == {"tasks": 0, "dailyreports": 0, "retrospectives": 0}
+
+
+def test_reports_still_reach_archived_rows(db):
+    seed()
+    archive.run_archival(keep=2, batch_size=3)
+
+    session = SessionLocal()
+    series = charts.velocity_series(session)
+    session.close()
+    # هر اسپرینت 5×2 امتیاز انجام‌شده، چه آرشیوشده چه نه
+    assert [(sid, done) for sid, _, done in series] == [(1, 10), (2, 10), (3, 10), (4, 10)]
+
+    update = make_update(1, text="/view_daily_reports")
+    asyncio.run(admin.view_daily_reports(update, make_context(args=["archive", "1"])))
+    reports = [t for t in texts(update) if t.startswith("📅")]
+    assert len(reports) == 5
+    assert all("s1" in t for t in reports)
+
+
+def test_missing_job_queue_is_reported(caplog):
+    with caplog.at_level(logging.ERROR):
+        app = bot.build_app("1000:test", team_id=1)
+    if app.job_queue is None:
+        assert "job queue unavailable" in caplog.text
+    else:
+        assert len(app.job_queue.jobs()) == 2
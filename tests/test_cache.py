@@ -0,0 +1,93 @@
+# tests/test_cache.py
+
+import asyncio
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+import database.db as db_module
+from database.db import SessionLocal
+from database.models import Base, User, Project, Task
+from database.tenancy import team_scope, setup_teams
+from database import cache
+from handlers import admin
+from fakes import make_update, make_context, texts
+
+
+def _two_teams():
+    # دو تیم با شناسه‌های یکسان کاربر/پروژه تا کلید بدون تیم با هم برخورد کند
+    t1, t2 = setup_teams(["111:a", "222:b"])
+    session = SessionLocal()
+    owner = User(team_id=t1, telegram_id=1, name="po", role="ProductOwner")
+    session.add(owner)
+    session.flush()
+    project = Project(team_id=t1, name="secret", created_by=owner.id)
+    session.add(project)
+    session.flush()
+    session.add(Task(team_id=t1, project_id=project.id, title="hidden", status="Backlog", story_point=3))
+    session.commit()
+    ids = (owner.id, project.id)
+    session.close()
+    return t1, t2, ids
+
+
+def _load(team_id, accessor, *args):
+    session = SessionLocal()
+    try:
+        with team_scope(team_id):
+            return accessor(session, *args)
+    finally:
+        session.close()
+
+
+def test_all_projects_is_per_team(db):
+    t1, t2, _ = _two_teams()
+    assert [p.name for p in _load(t1, cache.all_projects)] == ["secret"]
+    assert _load(t2, cache.all_projects) == []
+
+
+def test_projects_by_creator_is_per_team(db):
+    t1, t2, (owner_id, _) = _two_teams()
+    assert [p.name for p in _load(t1, cache.projects_by_creator, owner_id)] == ["secret"]
+    assert _load(t2, cache.projects_by_creator, owner_id) == []
+
+
+def test_backlog_tasks_is_per_team(db):
+    t1, t2, (_, project_id) = _two_teams()
+    assert [t.title for t in _load(t1, cache.backlog_tasks, project_id)] == ["hidden"]
+    assert _load(t2, cache.backlog_tasks, project_id) == []
+    # کش گرم تیم ۱ همچنان برقرار است
+    assert [t.title for t in _load(t1, cache.backlog_tasks, project_id)] == ["hidden"]
+
+
+def test_load_overlapping_an_invalidation_is_not_stored():
+    qc = cache.QueryCache()
+
+    def stale_loader():
+        # commitی که در حین بارگذاری جدول را باطل می‌کند
+        qc.invalidate_tables(["projects"])
+        return "stale"
+
+    assert qc.get_or_load("k", ["projects"], stale_loader) == "stale"
+    assert qc.get_or_load("k", ["projects"], lambda: "fresh") == "fresh"
+    assert qc.get_or_load("k", ["projects"], lambda: "unused") == "fresh"
+    # باطل‌سازی جدول دیگر روی این کلید اثری ندارد
+    qc.invalidate_tables(["tasks"])
+    assert qc.get_or_load("k", ["projects"], lambda: "unused") == "fresh"
+
+
+def test_cache_miss_in_read_only_handler_loads_from_primary(db, tmp_path, monkeypatch):
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    Base.metadata.create_all(bind=replica)
+    monkeypatch.setattr(db_module, "replica_engine", replica)
+    for bind, name in ((db, "primary"), (replica, "lagging")):
+        session = Session(bind=bind)
+        session.add(User(id=1, telegram_id=1, name="po", role="ProductOwner"))
+        session.add(Project(name=name, created_by=1, created_at=datetime(2024, 1, 1)))
+        session.commit()
+        session.close()
+
+    update = make_update(1, text="📋 لیست پروژه‌ها")
+    asyncio.run(admin.list_projects(update, make_context()))
+    assert any("primary" in t for t in texts(update))
+    assert not any("lagging" in t for t in texts(update))
+    replica.dispose()
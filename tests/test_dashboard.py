@@ -0,0 +1,111 @@
+# tests/test_dashboard.py
+
+import asyncio
+import types
+import pytest
+from sqlalchemy import update
+import bot
+from database.db import SessionLocal
+from database.models import User, Sprint, Task
+from database import transitions, planning
+from handlers import dashboard
+from fakes import make_update, make_context
+
+
+@pytest.fixture
+def dirty(monkeypatch):
+    calls = []
+    monkeypatch.setattr(dashboard, "mark_dirty", lambda sprints, tasks=(): calls.append((set(sprints), set(tasks))))
+    return calls
+
+
+def _seed():
+    session = SessionLocal()
+    session.add(User(id=1, telegram_id=1, name="po", role="ProductOwner"))
+    session.add_all([Sprint(id=1, status="Active", created_by=1), Sprint(id=2, status="Active", created_by=1)])
+    session.add_all([
+        Task(id=10, sprint_id=1, status="InProgress", story_point=3, assigned_to=1, version=0),
+        Task(id=20, sprint_id=2, status="InProgress", story_point=5, assigned_to=1, version=0),
+    ])
+    session.commit()
+    session.close()
+
+
+def test_transition_marks_only_its_task(db, dirty):
+    _seed()
+    dirty.clear()
+    session = SessionLocal()
+    assert transitions.transition_task(session, 10, "InProgress", "InReview", version=0)
+    session.commit()
+    session.close()
+    assert dirty == [(set(), {10})]
+
+
+def test_finalize_marks_only_its_sprint(db, dirty):
+    _seed()
+    dirty.clear()
+    session = SessionLocal()
+    planning.close_sprints(session, [2], closed_by=1)
+    session.commit()
+    session.close()
+    assert dirty == [({2}, set())]
+
+
+def test_unrecognised_bulk_update_refreshes_everything(db, dirty):
+    _seed()
+    dirty.clear()
+    session = SessionLocal()
+    session.execute(update(Task).where(Task.status == "InProgress").values(reviewed=True),
+                    execution_options={"synchronize_session": False})
+    session.commit()
+    session.close()
+    assert dirty == [({dashboard.ALL}, set())]
+
+
+class FakeApp:
+    def __init__(self):
+        self.chat_data = {}
+        self.bot_data = {"team_id": None}
+        self.persisted = set()
+        self.edits = []
+        self.bot = types.SimpleNamespace(edit_message_text=self._edit)
+
+    async def _edit(self, text, chat_id, message_id):
+        self.edits.append((chat_id, message_id))
+
+    def mark_data_for_update_persistence(self, chat_ids=None, user_ids=None):
+        self.persisted.update(chat_ids or ())
+
+
+def test_refresh_edits_only_the_affected_sprint(db, monkeypatch):
+    _seed()
+    app = FakeApp()
+    monkeypatch.setitem(dashboard._apps, None, app)
+
+    # /dashboard در دو چت برای دو اسپرینت
+    for chat_id, sprint_id in ((100, 1), (200, 2)):
+        context = make_context(args=[str(sprint_id)])
+        context.chat_data = app.chat_data.setdefault(chat_id, {})
+        context.bot = types.SimpleNamespace(pin_chat_message=lambda *a, **k: asyncio.sleep(0))
+        update = make_update(1, text="/dashboard")
+        update.effective_chat.id = chat_id
+        asyncio.run(dashboard.dashboard(update, context))
+    assert set(app.chat_data[100]["dashboards"]) == {1}
+
+    session = SessionLocal()
+    transitions.transition_task(session, 10, "InProgress", "InReview", version=0)
+    session.commit()
+    session.close()
+
+    monkeypatch.setattr(dashboard, "_dirty", set())
+    monkeypatch.setattr(dashboard, "_dirty_tasks", {10})
+    asyncio.run(dashboard.refresh())
+    assert app.edits == [(100, 1)]
+    assert app.persisted == {100}
+    assert "InReview" not in app.chat_data[200]["dashboards"][2][1]
+
+
+def test_dashboards_survive_restart_via_chat_data_persistence():
+    app = bot.build_app("1000:test", team_id=1)
+    assert app.persistence.store_data.chat_data
+    assert not app.persistence.store_data.bot_data
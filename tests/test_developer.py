@@ -0,0 +1,116 @@
+# tests/test_developer.py
+
+import asyncio
+from database.db import SessionLocal
+from database.models import User, Project, Task
+from database.tenancy import team_scope, setup_teams
+from handlers import developer, callbacks
+from fakes import make_update, make_context, texts
+
+
+def _two_teams():
+    t1, t2 = setup_teams(["111:a", "222:b"])
+    session = SessionLocal()
+    session.add_all([
+        User(team_id=t1, telegram_id=1, name="dev1", role="Developer"),
+        User(team_id=t2, telegram_id=1, name="dev2", role="Developer"),
+    ])
+    project = Project(team_id=t1, name="secret")
+    session.add(project)
+    session.flush()
+    session.add_all([
+        Task(team_id=t1, project_id=project.id, title=f"t{i}", status="Backlog", story_point=1)
+        for i in range(5)
+    ])
+    session.commit()
+    project_id = project.id
+    session.close()
+    return t1, t2, project_id
+
+
+def test_backlog_of_another_teams_project_is_rejected(db):
+    t1, t2, project_id = _two_teams()
+    data = callbacks.encode(callbacks.SPRINT_PROJECT, project_id)
+
+    # تیم ۱ بک‌لاگ را می‌بیند (و کش را گرم می‌کند)
+    with team_scope(t1):
+        update = make_update(data=data)
+        state = asyncio.run(developer.show_backlog_tasks(update, make_context()))
+    assert state == developer.SELECT_TASKS_FOR_SPRINT
+
+    with team_scope(t2):
+        update = make_update(data=data)
+        context = make_context()
+        state = asyncio.run(developer.show_backlog_tasks(update, context))
+    assert state == developer.ConversationHandler.END
+    assert "❌ پروژه نامعتبر است." in texts(update)
+    assert "backlog_project_id" not in context.user_data
+
+
+def test_picking_tasks_for_a_foreign_project_is_rejected(db):
+    t1, t2, project_id = _two_teams()
+    session = SessionLocal()
+    task_id = session.query(Task.id).filter_by(project_id=project_id).first().id
+    session.close()
+
+    with team_scope(t2):
+        update = make_update(data=callbacks.encode(callbacks.BACKLOG_TASK, task_id))
+        context = make_context({"backlog_project_id": project_id})
+        state = asyncio.run(developer.collect_tasks_for_sprint(update, context))
+    assert state == developer.ConversationHandler.END
+    assert not context.user_data.get("selected_task_ids")
+
+
+def _own_task_in_review():
+    session = SessionLocal()
+    me = User(telegram_id=1, name="dev", role="Developer", total_points=0)
+    session.add(me)
+    session.flush()
+    task = Task(title="mine", assigned_to=me.id, status="InReview", story_point=5)
+    session.add(task)
+    session.commit()
+    ids = task.id, task.version
+    session.close()
+    return ids
+
+
+def _status_and_points(task_id):
+    session = SessionLocal()
+    try:
+        task = session.get(Task, task_id)
+        return task.status, session.get(User, task.assigned_to).total_points
+    finally:
+        session.close()
+
+
+def test_selecting_own_task_for_review_is_rejected(db):
+    task_id, version = _own_task_in_review()
+    update = make_update(1, data=callbacks.encode(callbacks.REVIEW_SELECT, task_id, version))
+    context = make_context()
+    state = asyncio.run(developer.review_select_task(update, context))
+    assert state == developer.ConversationHandler.END
+    assert "review_task_id" not in context.user_data
+
+
+def test_approving_own_task_is_rejected(db):
+    task_id, version = _own_task_in_review()
+    update = make_update(1, text="✅ تأیید")
+    context = make_context({"review_task_id": task_id, "review_task_version": version})
+    state = asyncio.run(developer.review_decision(update, context))
+    assert state == developer.ConversationHandler.END
+    assert _status_and_points(task_id) == ("InReview", 0)
+
+
+def test_review_of_a_vanished_task_is_reported(db):
+    session = SessionLocal()
+    session.add(User(telegram_id=2, name="rev", role="Developer"))
+    session.commit()
+    session.close()
+
+    # شناسه‌ی تسکی که در این فاصله آرشیو/حذف شده است
+    for handler, text in ((developer.review_decision, "✅ تأیید"), (developer.review_reason, "دلیل")):
+        update = make_update(2, text=text)
+        context = make_context({"review_task_id": 999, "review_task_version": 0})
+        state = asyncio.run(handler(update, context))
+        assert state == developer.ConversationHandler.END
+        assert texts(update) == ["⚠️ این تسک دیگر در انتظار بازبینی نیست."]
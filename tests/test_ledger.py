@@ -0,0 +1,115 @@
+# tests/test_ledger.py
+
+import contextvars
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from database.db import SessionLocal
+from database.models import User, ProcessedUpdate
+from database import ledger
+
+
+def in_update(fn):
+    # هر آپدیت در context جدای خودش پردازش می‌شود (مانند تسک آپدیت در PTB)
+    return contextvars.copy_context().run(fn)
+
+
+def rows():
+    session = SessionLocal()
+    try:
+        return session.query(ProcessedUpdate.update_id, ProcessedUpdate.callback_id).order_by(ProcessedUpdate.update_id).all()
+    finally:
+        session.close()
+
+
+def committing_handler(update_id, callback_id=None):
+    def run():
+        assert ledger.claim(1, update_id, callback_id)
+        session = SessionLocal()
+        session.add(User(telegram_id=update_id, name="u", role="Developer"))
+        session.commit()
+        session.close()
+        ledger.finish()
+    return run
+
+
+def test_committed_update_is_claimed_once(db):
+    in_update(committing_handler(1, "cb1"))
+    assert rows() == [(1, "cb1")]
+    assert in_update(lambda: ledger.claim(1, 1)) is False
+    # همان callback با update_id دیگر هم تکراری است
+    assert in_update(lambda: ledger.claim(1, 2, "cb1")) is False
+    assert in_update(lambda: ledger.claim(2, 1)) is True
+
+
+def test_failed_handler_is_not_marked_processed(db):
+    def run():
+        assert ledger.claim(1, 5)
+        session = SessionLocal()
+        session.add(User(telegram_id=5, name="u", role="Developer"))
+        session.flush()
+        session.rollback()
+        session.close()
+        ledger.fail()
+        ledger.finish()
+
+    in_update(run)
+    assert rows() == []
+    # تحویل دوباره در همان پردازه دوباره پردازش می‌شود
+    in_update(committing_handler(5))
+    assert rows() == [(5, None)]
+
+
+def test_rolled_back_commit_is_recorded_by_the_next_commit(db):
+    def run():
+        assert ledger.claim(1, 7)
+        session = SessionLocal()
+        session.add(User(team_id=1, telegram_id=7, name="a", role="Developer"))
+        session.add(User(team_id=1, telegram_id=7, name="dup", role="Developer"))
+        try:
+            session.commit()
+        except IntegrityError:
+            session.rollback()
+        assert ledger.current_update.get()["recorded"] is False
+        session.add(User(telegram_id=7, name="a", role="Developer"))
+        session.commit()
+        session.close()
+        ledger.finish()
+
+    in_update(run)
+    assert rows() == [(7, None)]
+
+
+def test_read_only_update_is_recorded_on_finish(db):
+    def run():
+        assert ledger.claim(1, 9)
+        session = SessionLocal()
+        session.query(User).all()
+        session.close()
+        assert ledger.finish() is True
+
+    in_update(run)
+    assert rows() == [(9, None)]
+    assert in_update(lambda: ledger.claim(1, 9)) is False
+
+
+def test_restart_reloads_processed_updates(db):
+    in_update(committing_handler(11, "cb11"))
+    ledger._seen.clear()  # پردازه‌ی جدید
+    assert ledger.load_recent(1) == 1
+    assert in_update(lambda: ledger.claim(1, 11)) is False
+    assert in_update(lambda: ledger.claim(1, 12, "cb11")) is False
+    assert ledger.load_recent(2) == 0
+
+
+def test_prune_drops_only_expired_rows(db):
+    now = datetime.utcnow()
+    session = SessionLocal()
+    session.add_all([
+        ProcessedUpdate(team_id=1, update_id=1, processed_at=now - timedelta(hours=5)),
+        ProcessedUpdate(team_id=1, update_id=2, processed_at=now),
+    ])
+    session.commit()
+    session.close()
+
+    assert ledger.prune(retention_hours=1) == 1
+    assert rows() == [(2, None)]
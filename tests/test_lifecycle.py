@@ -0,0 +1,80 @@
+# tests/test_lifecycle.py
+
+import asyncio
+import os
+import time
+import types
+import pytest
+import config
+import lifecycle
+
+
+def test_drain_is_bounded_even_if_a_task_swallows_cancellation(monkeypatch):
+    monkeypatch.setattr(config, "SHUTDOWN_DRAIN_SECONDS", 0.1)
+    monkeypatch.setattr(lifecycle, "CANCEL_GRACE_SECONDS", 0.2)
+    release = asyncio.Event()
+
+    async def stubborn():
+        # مثل _update_fetcher در PTB: CancelledError را نادیده می‌گیرد
+        while not release.is_set():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                continue
+
+    async def hanging_stop():
+        await asyncio.Event().wait()
+
+    app = types.SimpleNamespace(stop=hanging_stop, update_queue=asyncio.Queue())
+
+    async def main():
+        task = asyncio.create_task(stubborn())
+        await asyncio.sleep(0)
+        started = time.monotonic()
+        drained = await lifecycle._drain([app], asyncio.Event())
+        elapsed = time.monotonic() - started
+        release.set()
+        task.cancel()
+        await asyncio.wait([task], timeout=1)
+        return drained, elapsed
+
+    drained, elapsed = asyncio.run(main())
+    assert drained is False
+    assert elapsed < 1
+
+
+def test_drain_returns_when_apps_stop_in_time(monkeypatch):
+    monkeypatch.setattr(config, "SHUTDOWN_DRAIN_SECONDS", 1)
+
+    async def quick_stop():
+        await asyncio.sleep(0)
+
+    app = types.SimpleNamespace(stop=quick_stop, update_queue=asyncio.Queue())
+    assert asyncio.run(lifecycle._drain([app], asyncio.Event())) is True
+
+
+def test_second_process_exits_before_building_apps(tmp_path, monkeypatch):
+    pid_file = tmp_path / "bot.pid"
+    pid_file.write_text(str(os.getppid()))  # پردازه‌ی زنده‌ی دیگر
+    monkeypatch.setattr(config, "PID_FILE", str(pid_file))
+    monkeypatch.setattr(lifecycle.logging_setup, "stop_logging", lambda: None)
+    built = []
+
+    with pytest.raises(SystemExit):
+        lifecycle.run(lambda: built.append(True), handover=False)
+    assert built == []  # init_db (مهاجرت) اجرا نشده است
+    assert pid_file.read_text() == str(os.getppid())
+
+
+def test_apps_are_built_after_takeover(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PID_FILE", str(tmp_path / "bot.pid"))
+    monkeypatch.setattr(lifecycle.logging_setup, "stop_logging", lambda: None)
+    calls = []
+    monkeypatch.setattr(lifecycle, "take_over", lambda handover: calls.append(("take_over", handover)))
+
+    async def serve(apps):
+        calls.append(("serve", apps))
+
+    monkeypatch.setattr(lifecycle, "serve", serve)
+    lifecycle.run(lambda: calls.append(("build",)) or ["app"], handover=True)
+    assert calls == [("take_over", True), ("build",), ("serve", ["app"])]
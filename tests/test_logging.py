@@ -0,0 +1,48 @@
+# tests/test_logging.py
+
+import logging
+import time
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+import logging_setup
+
+
+class Records(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def sql_records():
+    handler = Records()
+    logging_setup.sql_logger.addHandler(handler)
+    logging_setup.sql_logger.setLevel(logging.INFO)
+    yield handler.records
+    logging_setup.sql_logger.removeHandler(handler)
+
+
+def test_failed_statement_does_not_skew_later_sample_durations(sql_records):
+    engine = create_engine("sqlite://")
+    logging_setup.install_sql_sampling(engine, rate=1.0)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def slow_failure(conn, cursor, statement, parameters, context, executemany):
+        if "missing" in statement:
+            time.sleep(0.2)
+
+    with engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM missing"))
+        conn.execute(text("SELECT 1"))
+        assert not conn.info.get("sql_sample_start")
+
+    # فقط دستور موفق ثبت می‌شود و زمانش با شروع خودش سنجیده شده است
+    assert [r.sql for r in sql_records] == ["SELECT 1"]
+    assert sql_records[0].sql_ms < 100
+    engine.dispose()
@@ -0,0 +1,105 @@
+# tests/test_migrate.py
+
+import pytest
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError
+from database.db import SessionLocal, init_db
+from database.models import User, Task
+from database import migrate, transitions
+from database.tenancy import setup_teams
+from conftest import drop_everything
+
+# شِمای نسخه‌ی اولیه (پیش از ستون‌های version/reason و بقیه)، همان‌طور که create_all آن را ساخته بود
+BASELINE_SCHEMA = [
+    """CREATE TABLE users (
+        id INTEGER NOT NULL, telegram_id BIGINT, name VARCHAR(100), role VARCHAR(12),
+        joined_at DATETIME, last_login DATETIME, total_points INTEGER,
+        PRIMARY KEY (id), UNIQUE (telegram_id))""",
+    """CREATE TABLE projects (
+        id INTEGER NOT NULL, name VARCHAR(150), description TEXT, created_by INTEGER, created_at DATETIME,
+        PRIMARY KEY (id), FOREIGN KEY(created_by) REFERENCES users (id))""",
+    """CREATE TABLE sprints (
+        id INTEGER NOT NULL, start_date DATE, end_date DATE, status VARCHAR(9), created_by INTEGER,
+        PRIMARY KEY (id), FOREIGN KEY(created_by) REFERENCES users (id))""",
+    """CREATE TABLE dailyreports (
+        id INTEGER NOT NULL, user_id INTEGER, sprint_id INTEGER, report_date DATE,
+        completed_tasks TEXT, planned_tasks TEXT, blockers TEXT,
+        PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES users (id), FOREIGN KEY(sprint_id) REFERENCES sprints (id))""",
+    """CREATE TABLE retrospectives (
+        id INTEGER NOT NULL, sprint_id INTEGER, held_by INTEGER, retro_date DATE, discussion_points TEXT,
+        PRIMARY KEY (id), FOREIGN KEY(sprint_id) REFERENCES sprints (id), FOREIGN KEY(held_by) REFERENCES users (id))""",
+    """CREATE TABLE sprintreviews (
+        id INTEGER NOT NULL, sprint_id INTEGER, created_by INTEGER, review_date DATE, notes TEXT,
+        completed_percentage FLOAT,
+        PRIMARY KEY (id), FOREIGN KEY(sprint_id) REFERENCES sprints (id), FOREIGN KEY(created_by) REFERENCES users (id))""",
+    """CREATE TABLE tasks (
+        id INTEGER NOT NULL, sprint_id INTEGER, title VARCHAR(255), description TEXT, assigned_to INTEGER,
+        status VARCHAR(10), story_point INTEGER, created_at DATETIME, reviewed BOOLEAN, project_id INTEGER,
+        PRIMARY KEY (id), FOREIGN KEY(sprint_id) REFERENCES sprints (id),
+        FOREIGN KEY(assigned_to) REFERENCES users (id), FOREIGN KEY(project_id) REFERENCES projects (id))""",
+]
+
+
+def make_baseline(engine):
+    drop_everything()
+    with engine.begin() as conn:
+        for ddl in BASELINE_SCHEMA:
+            conn.exec_driver_sql(ddl)
+        conn.exec_driver_sql("INSERT INTO users (id, telegram_id, name, role, total_points) VALUES (1, 10, 'dev', 'Developer', 0)")
+        conn.exec_driver_sql("INSERT INTO projects (id, name, created_by) VALUES (1, 'P', 1)")
+        conn.exec_driver_sql("INSERT INTO sprints (id, status, created_by) VALUES (1, 'Active', 1)")
+        conn.exec_driver_sql(
+            "INSERT INTO tasks (id, sprint_id, title, assigned_to, status, story_point, project_id) "
+            "VALUES (1, 1, 't', 1, 'InReview', 3, 1)"
+        )
+
+
+def test_upgrade_adds_task_version_and_reason(db):
+    make_baseline(db)
+    init_db()
+
+    columns = {c["name"] for c in inspect(db).get_columns("tasks")}
+    assert {"version", "reason", "completed_at"} <= columns
+
+    session = SessionLocal()
+    try:
+        assert session.get(Task, 1).version == 0
+        assert transitions.transition_task(session, 1, "InReview", "NotStarted", version=0, reason="نیاز به تست")
+        session.commit()
+        assert session.get(Task, 1).version == 1
+    finally:
+        session.close()
+
+
+def test_upgrade_is_idempotent(db):
+    make_baseline(db)
+    init_db()
+    assert migrate.upgrade(db) == []
+
+
+def test_upgrade_then_setup_teams_adopts_existing_rows(db):
+    make_baseline(db)
+    init_db()
+    t1, t2 = setup_teams(["111:a", "222:b"])
+
+    inspector = inspect(db)
+    for table in ("users", "projects", "sprints", "tasks", "dailyreports", "sprintreviews", "retrospectives"):
+        assert "team_id" in {c["name"] for c in inspector.get_columns(table)}
+    assert "ix_tasks_team_status" in {ix["name"] for ix in inspector.get_indexes("tasks")}
+
+    session = SessionLocal()
+    try:
+        assert session.query(User.team_id).all() == [(t1,)]
+        assert session.query(Task.team_id).all() == [(t1,)]
+        # همان کاربر تلگرام در تیم دوم؛ در همان تیم هنوز یکتاست
+        session.add(User(team_id=t2, telegram_id=10, name="dev", role="Developer"))
+        session.commit()
+        session.add(User(team_id=t2, telegram_id=10, name="dup", role="Developer"))
+        with pytest.raises(IntegrityError):
+            session.commit()
+        session.rollback()
+        assert session.get(User, 1).name == "dev"
+    finally:
+        session.close()
+
+    assert migrate.upgrade(db) == []
@@ -0,0 +1,86 @@
+# tests/test_notifications.py
+
+import asyncio
+import types
+from database.db import SessionLocal
+from database.models import User, Task
+from database.tenancy import setup_teams
+from database import transitions
+from handlers import notifications
+from fakes import Bot
+
+
+def seed():
+    team_id, = setup_teams(["111:a"])
+    session = SessionLocal()
+    session.add_all([
+        User(id=1, team_id=team_id, telegram_id=10, name="dev", role="Developer"),
+        User(id=2, team_id=team_id, telegram_id=20, name="rev1", role="Developer"),
+        User(id=3, team_id=team_id, telegram_id=30, name="rev2", role="ProductOwner"),
+    ])
+    session.add_all([
+        Task(id=i, team_id=team_id, title=f"t{i}", assigned_to=1, status="InProgress", story_point=1)
+        for i in (1, 2, 3)
+    ])
+    session.commit()
+    session.close()
+    return team_id
+
+
+def run_transitions(team_id, steps):
+    # تغییر وضعیت‌ها از مسیر واقعی (رویداد پس از commit) و سپس یک flush دسته‌ای
+    bot = Bot()
+    app = types.SimpleNamespace(bot_data={"team_id": team_id}, bot=bot)
+
+    async def run():
+        notifications.start(app)
+        try:
+            for task_id, from_status, to_status, values in steps:
+                session = SessionLocal()
+                assert transitions.transition_task(session, task_id, from_status, to_status, **values)
+                session.commit()
+                session.close()
+            await asyncio.sleep(0)  # call_soon_threadsafe(_schedule)
+            return await notifications.flush()
+        finally:
+            notifications.stop(app)
+
+    sent = asyncio.run(run())
+    return sent, bot.sent
+
+
+def test_submissions_are_batched_per_reviewer(db):
+    team_id = seed()
+    sent, messages = run_transitions(team_id, [
+        (1, "InProgress", "InReview", {}),
+        (2, "InProgress", "InReview", {}),
+    ])
+    # یک پیام برای هر بازبین با هر دو تسک؛ صاحب تسک (10) چیزی دریافت نمی‌کند
+    assert sent == 2
+    assert sorted(chat_id for chat_id, _ in messages) == [20, 30]
+    for _, text in messages:
+        assert text.startswith("🔔 اعلان‌ها:")
+        assert "‘t1’" in text and "‘t2’" in text
+
+
+def test_rejection_notifies_the_assignee_with_reason(db):
+    team_id = seed()
+    session = SessionLocal()
+    session.query(Task).filter(Task.id == 3).update({"status": "InReview"})
+    session.commit()
+    session.close()
+
+    sent, messages = run_transitions(team_id, [(3, "InReview", "InProgress", {"reason": "تست ندارد"})])
+    assert sent == 1
+    (chat_id, text), = messages
+    assert chat_id == 10
+    assert "رد شد" in text and "تست ندارد" in text
+
+
+def test_send_all_respects_the_concurrency_bound():
+    bot = Bot(delay=0.01)
+    messages = {(1, chat_id): "hi" for chat_id in range(10)}
+    sent = asyncio.run(notifications.send_all({1: bot}, messages, concurrency=3))
+    assert sent == 10
+    assert len(bot.sent) == 10
+    assert bot.max_in_flight == 3
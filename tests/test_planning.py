@@ -0,0 +1,150 @@
+# tests/test_planning.py
+
+import itertools
+import random
+from database.db import SessionLocal
+from database.models import User, Sprint, Task, SprintReview
+from database import planning
+
+
+def _developer(session):
+    dev = User(telegram_id=10, name="dev", role="Developer")
+    session.add(dev)
+    session.flush()
+    return dev.id
+
+
+def test_velocity_counts_closed_sprints_without_completions_as_zero(db):
+    session = SessionLocal()
+    dev_id = _developer(session)
+    for points in (10, 0, 0):
+        sprint = Sprint(status="Completed", created_by=dev_id)
+        session.add(sprint)
+        session.flush()
+        session.add(Task(sprint_id=sprint.id, status="Completed" if points else "InProgress",
+                         story_point=points or 5, assigned_to=dev_id))
+    session.commit()
+    assert planning.velocity(session, dev_id) == 3
+    session.close()
+
+
+def test_velocity_without_history_is_none(db):
+    session = SessionLocal()
+    assert planning.velocity(session, _developer(session)) is None
+    session.close()
+
+
+def test_commit_sprint_creates_nothing_when_no_task_was_taken(db):
+    session = SessionLocal()
+    dev_id = _developer(session)
+    task = Task(title="t", status="NotStarted", story_point=3)
+    session.add(task)
+    session.commit()
+
+    sprint, taken = planning.commit_sprint(session, dev_id, [task.id])
+    session.commit()
+    assert (sprint, taken) == (None, 0)
+    assert session.query(Sprint).count() == 0
+    session.close()
+
+
+def test_commit_sprint_moves_only_backlog_tasks(db):
+    session = SessionLocal()
+    dev_id = _developer(session)
+    free = Task(title="a", status="Backlog", story_point=3)
+    taken_elsewhere = Task(title="b", status="NotStarted", story_point=2)
+    session.add_all([free, taken_elsewhere])
+    session.commit()
+
+    sprint, taken = planning.commit_sprint(session, dev_id, [free.id, taken_elsewhere.id])
+    session.commit()
+    assert taken == 1
+    rows = session.query(Task.title, Task.sprint_id, Task.status, Task.assigned_to).order_by(Task.title).all()
+    assert rows == [("a", sprint.id, "NotStarted", dev_id), ("b", None, "NotStarted", None)]
+    session.close()
+
+
+def _sprint_with_tasks(session, dev_id, tasks):
+    sprint = Sprint(status="Active", created_by=dev_id)
+    session.add(sprint)
+    session.flush()
+    session.add_all([
+        Task(title=f"s{sprint.id}-{i}", sprint_id=sprint.id, status=status, story_point=sp, assigned_to=dev_id)
+        for i, (status, sp) in enumerate(tasks)
+    ])
+    session.flush()
+    return sprint.id
+
+
+def test_close_sprints_computes_review_and_returns_unfinished_tasks(db):
+    session = SessionLocal()
+    dev_id = _developer(session)
+    by_points = _sprint_with_tasks(session, dev_id, [("Completed", 3), ("Completed", 1), ("InProgress", 4)])
+    by_count = _sprint_with_tasks(session, dev_id, [("Completed", None), ("NotStarted", None), ("InReview", None)])
+    session.commit()
+
+    reviews = planning.close_sprints(session, [by_points, by_count], dev_id)
+    session.commit()
+
+    assert reviews[by_points]["completed_percentage"] == 50.0   # 4 از 8 امتیاز
+    assert reviews[by_count]["completed_percentage"] == 33.3    # بدون امتیاز: 1 از 3 تسک
+    assert (reviews[by_points]["returned"], reviews[by_count]["returned"]) == (1, 2)
+    assert "dev: 4/8 امتیاز (2/3 تسک)" in reviews[by_points]["notes"]
+
+    stored = dict(session.query(SprintReview.sprint_id, SprintReview.completed_percentage).all())
+    assert stored == {by_points: 50.0, by_count: 33.3}
+    assert {s.status for s in session.query(Sprint).all()} == {"Completed"}
+    # تسک‌های ناتمام بدون اسپرینت و مسئول به Backlog برگشته‌اند
+    unfinished = session.query(Task.status, Task.sprint_id, Task.assigned_to).filter(Task.status != "Completed").all()
+    assert unfinished == [("Backlog", None, None)] * 3
+    assert session.query(Task).filter(Task.status == "Completed", Task.sprint_id.isnot(None)).count() == 3
+    session.close()
+
+
+def test_close_sprints_refuses_when_a_sprint_is_already_closed(db):
+    session = SessionLocal()
+    dev_id = _developer(session)
+    active = _sprint_with_tasks(session, dev_id, [("InProgress", 2)])
+    closed = _sprint_with_tasks(session, dev_id, [("InProgress", 2)])
+    session.query(Sprint).filter(Sprint.id == closed).update({"status": "Completed"})
+    session.commit()
+
+    assert planning.close_sprints(session, [active, closed], dev_id) is None
+    session.rollback()
+    # اسپرینت فعال هم دست‌نخورده می‌ماند
+    assert session.get(Sprint, active).status == "Active"
+    assert session.query(SprintReview).count() == 0
+    assert session.query(Task.status).filter(Task.sprint_id == active).all() == [("InProgress",)]
+    session.close()
+
+
+def _score(items, chosen):
+    # هدف propose: بیشترین امتیاز؛ در تساوی، بیشترین مجموع اولویت (n - رتبه) که تسک‌های قدیمی‌تر را ترجیح می‌دهد
+    rank = {tid: r for r, (tid, _) in enumerate(items)}
+    points = dict(items)
+    return sum(points[tid] for tid in chosen), sum(len(items) - rank[tid] for tid in chosen)
+
+
+def _brute_force(items, capacity):
+    best = (0, 0)
+    for mask in itertools.product((0, 1), repeat=len(items)):
+        chosen = [tid for (tid, _), bit in zip(items, mask) if bit]
+        score = _score(items, chosen)
+        if score[0] <= capacity:
+            best = max(best, score)
+    return best
+
+
+def test_propose_matches_brute_force():
+    rng = random.Random(7)
+    for _ in range(200):
+        items = [(i, rng.randint(1, 8)) for i in range(1, rng.randint(2, 10))]
+        capacity = rng.randint(0, 20)
+        chosen = planning.propose(items, capacity)
+        assert len(set(chosen)) == len(chosen)
+        assert _score(items, chosen) == _brute_force(items, capacity), (items, capacity)
+
+
+def test_propose_skips_tasks_without_points_or_larger_than_capacity():
+    assert planning.propose([(1, None), (2, 0), (3, 9), (4, 2)], 5) == [4]
+    assert planning.propose([(1, 3)], 0) == []
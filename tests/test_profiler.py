@@ -0,0 +1,81 @@
+# tests/test_profiler.py
+
+import asyncio
+import types
+import pytest
+from database.db import SessionLocal
+from database.models import User
+from handlers import profiler
+from fakes import make_update, make_context, texts
+
+CEO = 1
+
+
+class DocumentBot:
+    def __init__(self):
+        self.documents = []
+
+    async def send_document(self, chat_id, document, filename, **kwargs):
+        self.documents.append(filename)
+
+
+def ceo():
+    session = SessionLocal()
+    session.add(User(telegram_id=CEO, name="ceo", role="CEO"))
+    session.commit()
+    session.close()
+
+
+def profiling_context(bot_data, args=()):
+    context = make_context(bot_data=bot_data, args=args)
+    context.bot = DocumentBot()
+    context.application = types.SimpleNamespace(create_task=lambda coro, update=None: asyncio.create_task(coro))
+    return context
+
+
+@pytest.mark.parametrize("arg", ["-5", "0", "abc"])
+def test_profile_rejects_invalid_durations(db, arg):
+    ceo()
+    update = make_update(CEO, text="/profile")
+    context = make_context(args=[arg])
+    asyncio.run(profiler.profile(update, context))
+    assert texts(update)[-1].startswith("❌ استفاده")
+    assert "profiler" not in context.bot_data
+
+
+def test_profile_stop_sends_results_early(db):
+    ceo()
+    bot_data = {}
+
+    async def run():
+        context = profiling_context(bot_data, ["60"])
+        await profiler.profile(make_update(CEO, text="/profile"), context)
+        task = bot_data["profiler_task"]
+        await asyncio.sleep(0.02)
+        await profiler.profile_stop(make_update(CEO, text="/profile_stop"), context)
+        await asyncio.wait_for(task, timeout=2)
+        return context.bot.documents
+
+    assert asyncio.run(run()) == ["profile.collapsed.txt", "profile_summary.txt"]
+    assert bot_data == {}
+
+
+def test_cancelled_profile_stops_sampler_and_propagates(db):
+    ceo()
+    bot_data = {}
+
+    async def run():
+        context = profiling_context(bot_data, ["60"])
+        await profiler.profile(make_update(CEO, text="/profile"), context)
+        sampler, task = bot_data["profiler"], bot_data["profiler_task"]
+        await asyncio.sleep(0.02)
+        task.cancel()  # خاموش شدن ربات
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return sampler, context.bot.documents
+
+    sampler, documents = asyncio.run(run())
+    assert not sampler.running
+    assert documents == []
+    assert bot_data == {}
+
@@ -0,0 +1,262 @@
+# tests/test_query_budgets.py
+
+import asyncio
+import inspect
+import itertools
+from datetime import date, datetime, timedelta
+import pytest
+from sqlalchemy import insert
+from telegram.ext import ConversationHandler, TypeHandler
+import bot
+from database.db import SessionLocal, init_db
+from database.models import (
+    User, Project, Sprint, Task, DailyReport, SprintReview, ArchivedDailyReport
+)
+from database.query_budget import counting
+from database.cache import query_cache
+from database.tenancy import setup_teams, team_scope
+from database import ledger
+from handlers import admin, developer, charts, dashboard, callbacks, throttle, profiler
+from conftest import drop_everything
+from fakes import make_update, make_context
+
+# هر هندلر دارای بودجه روی داده‌ی N و 10N اجرا می‌شود. تعداد کوئری‌ها باید در بودجه بماند و
+# با حجم داده تغییر نکند؛ هندلری که N+1 شود در یکی از این دو شرط رد می‌شود.
+
+SCALES = (2, 20)
+CEO, DEV = 1, 2  # telegram_id ها؛ شناسه‌ی کاربری آن‌ها هم 1 و 2 است
+
+_update_ids = itertools.count(1)
+
+
+class FakeBot:
+    async def send_message(self, *args, **kwargs):
+        return None
+
+    async def pin_chat_message(self, *args, **kwargs):
+        return True
+
+    async def unpin_chat_message(self, *args, **kwargs):
+        return True
+
+
+def seed(n):
+    drop_everything()
+    init_db()
+    query_cache.clear()
+    ledger._seen.clear()
+    team_id, = setup_teams(["111:test"])
+    today = date.today()
+    now = datetime.utcnow()
+    session = SessionLocal()
+
+    session.execute(insert(User), [
+        dict(id=1, team_id=team_id, telegram_id=CEO, name="ceo", role="CEO", total_points=0),
+        dict(id=2, team_id=team_id, telegram_id=DEV, name="dev", role="Developer", total_points=0),
+    ] + [
+        dict(team_id=team_id, telegram_id=100 + i, name=f"d{i}", role="Developer", total_points=0)
+        for i in range(n)
+    ])
+    session.execute(insert(Project), [
+        dict(team_id=team_id, name=f"P{i}", created_by=1, created_at=now) for i in range(n)
+    ])
+    # اسپرینت‌های 1..n فعال، n+1..2n بسته‌شده
+    session.execute(insert(Sprint), [
+        dict(team_id=team_id, status="Active", created_by=1, start_date=today - timedelta(days=3))
+        for _ in range(n)
+    ] + [
+        dict(team_id=team_id, status="Completed", created_by=1, start_date=today - timedelta(days=20),
+             end_date=today - timedelta(days=6))
+        for _ in range(n)
+    ])
+
+    def tasks(status, assigned_to, sprint_offset, **extra):
+        return [
+            dict(team_id=team_id, project_id=1, sprint_id=(sprint_offset + i % n + 1) if sprint_offset is not None else None,
+                 title=f"{status}{i}", status=status, assigned_to=assigned_to, story_point=2,
+                 created_at=now, version=0, **extra)
+            for i in range(5 * n)
+        ]
+
+    session.execute(insert(Task),
+                    tasks("Backlog", None, None)
+                    + tasks("InReview", 2, 0)
+                    + tasks("NotStarted", 1, 0)
+                    + tasks("InProgress", 1, 0)
+                    + tasks("Completed", 2, n, completed_at=now - timedelta(days=7)))
+    session.execute(insert(DailyReport), [
+        dict(team_id=team_id, user_id=1 + i % 2, sprint_id=1 + i % n, report_date=today,
+             completed_tasks="a", planned_tasks="b", blockers="x")
+        for i in range(5 * n)
+    ])
+    session.execute(insert(ArchivedDailyReport), [
+        dict(id=i + 1, team_id=team_id, user_id=1, sprint_id=n + 1, report_date=today - timedelta(days=10),
+             completed_tasks="a", planned_tasks="b", blockers="x", archived_at=now)
+        for i in range(5 * n)
+    ])
+    session.execute(insert(SprintReview), [
+        dict(team_id=team_id, sprint_id=n + 1 + i, created_by=1, review_date=today, notes="-", completed_percentage=50)
+        for i in range(n)
+    ])
+    session.commit()
+
+    def first(status, assigned_to):
+        return session.query(Task.id).filter_by(status=status, assigned_to=assigned_to).order_by(Task.id).first().id
+
+    ids = {
+        "backlog": first("Backlog", None),
+        "in_review": first("InReview", 2),
+        "not_started": first("NotStarted", 1),
+        "in_progress": first("InProgress", 1),
+    }
+    ids["backlog_all"] = [t.id for t in session.query(Task.id).filter_by(status="Backlog").limit(3)]
+    session.close()
+    return team_id, ids
+
+
+def review(ids):
+    return {"review_task_id": ids["in_review"], "review_task_version": 0}
+
+
+# (نام، هندلر، سازنده‌ی (update, context) بر اساس n و شناسه‌ها)
+CASES = [
+    ("start", bot.start, lambda n, ids: (make_update(CEO, text="/start"), make_context())),
+    ("start new user", bot.start, lambda n, ids: (make_update(999, text="/start"), make_context())),
+    ("callback_handler", bot.callback_handler,
+     lambda n, ids: (make_update(CEO, data="promote_user_2"), make_context())),
+    ("handle_menu_buttons", bot.handle_menu_buttons,
+     lambda n, ids: (make_update(CEO, text="📋 لیست پروژه‌ها"), make_context())),
+    ("add_project", admin.add_project, lambda n, ids: (make_update(CEO, text="x"), make_context())),
+    ("save_project", admin.save_project, lambda n, ids: (make_update(CEO, text="NewP"), make_context())),
+    ("list_projects", admin.list_projects, lambda n, ids: (make_update(CEO, text="x"), make_context())),
+    ("add_task_to_backlog", admin.add_task_to_backlog, lambda n, ids: (make_update(CEO, text="x"), make_context())),
+    ("receive_backlog_tasks", admin.receive_backlog_tasks,
+     lambda n, ids: (make_update(CEO, data=callbacks.encode(callbacks.BACKLOG_PROJECT, 1)), make_context())),
+    ("save_backlog_tasks", admin.save_backlog_tasks,
+     lambda n, ids: (make_update(CEO, text="\n".join(f"t{i} 3" for i in range(n))),
+                     make_context({"selected_project_id": 1}))),
+    ("review_tasks", admin.review_tasks, lambda n, ids: (make_update(CEO, text="x"), make_context())),
+    ("review_decision_callback", admin.review_decision_callback,
+     lambda n, ids: (make_update(CEO, data=callbacks.encode(callbacks.ADMIN_APPROVE, ids["in_review"], 0)),
+                     make_context())),
+    ("admin review_reason", admin.review_reason,
+     lambda n, ids: (make_update(CEO, text="bad"), make_context(review(ids)))),
+    ("view_daily_reports", admin.view_daily_reports, lambda n, ids: (make_update(CEO, text="x"), make_context())),
+    ("view_daily_reports archive", admin.view_daily_reports,
+     lambda n, ids: (make_update(CEO, text="x"), make_context(args=["archive"]))),
+    ("standup_digest", admin.standup_digest, lambda n, ids: (make_update(CEO, text="x"), make_context())),
+    ("view_sprint_reviews", admin.view_sprint_reviews, lambda n, ids: (make_update(CEO, text="x"), make_context())),
+    ("finalize_sprint", admin.finalize_sprint, lambda n, ids: (make_update(CEO, text="x"), make_context())),
+    ("finalize_scope sprint", admin.finalize_scope,
+     lambda n, ids: (make_update(CEO, data=callbacks.encode(callbacks.FINALIZE_SPRINT, 1)), make_context())),
+    ("finalize_scope project", admin.finalize_scope,
+     lambda n, ids: (make_update(CEO, data=callbacks.encode(callbacks.FINALIZE_PROJECT, 1)), make_context())),
+    ("manage_users", admin.manage_users, lambda n, ids: (make_update(CEO, text="x"), make_context())),
+    ("cache_stats", admin.cache_stats, lambda n, ids: (make_update(CEO, text="x"), make_context())),
+    ("archive_old_sprints", admin.archive_old_sprints,
+     lambda n, ids: (make_update(CEO, text="/archive"), make_context())),
+    ("throttle_stats", throttle.throttle_stats, lambda n, ids: (make_update(CEO, text="x"), make_context())),
+    ("profile", profiler.profile, lambda n, ids: (make_update(CEO, text="/profile"), make_context(args=["x"]))),
+    ("profile_stop", profiler.profile_stop, lambda n, ids: (make_update(CEO, text="x"), make_context())),
+    ("memory_snapshot", profiler.memory_snapshot,
+     lambda n, ids: (make_update(CEO, text="/memsnap"), make_context(args=["stop"]))),
+    ("burndown", charts.burndown, lambda n, ids: (make_update(CEO, text="/burndown"), make_context())),
+    ("velocity", charts.velocity, lambda n, ids: (make_update(CEO, text="/velocity"), make_context())),
+    ("dashboard", dashboard.dashboard, lambda n, ids: (make_update(CEO, text="/dashboard"), make_context())),
+    ("send_daily_report", developer.send_daily_report, lambda n, ids: (make_update(DEV, text="x"), make_context())),
+    ("daily_report_completed", developer.daily_report_completed,
+     lambda n, ids: (make_update(DEV, text="a"), make_context())),
+    ("daily_report_planned", developer.daily_report_planned,
+     lambda n, ids: (make_update(DEV, text="b"), make_context({"completed_tasks": "a"}))),
+    ("daily_report_blockers", developer.daily_report_blockers,
+     lambda n, ids: (make_update(CEO, text="none"), make_context({"completed_tasks": "a", "planned_tasks": "b"}))),
+    ("cancel_inline", developer.cancel_inline,
+     lambda n, ids: (make_update(DEV, data=callbacks.encode(callbacks.CANCEL)), make_context())),
+    ("start_task_review", developer.start_task_review, lambda n, ids: (make_update(CEO, text="x"), make_context())),
+    ("select_task_for_review", developer.select_task_for_review,
+     lambda n, ids: (make_update(CEO, data=callbacks.encode(callbacks.SUBMIT_REVIEW, ids["in_progress"])),
+                     make_context())),
+    ("show_my_tasks", developer.show_my_tasks, lambda n, ids: (make_update(CEO, text="x"), make_context())),
+    ("start_task_selection", developer.start_task_selection,
+     lambda n, ids: (make_update(CEO, text="x"), make_context())),
+    ("confirm_task_start", developer.confirm_task_start,
+     lambda n, ids: (make_update(CEO, data=callbacks.encode(callbacks.START_TASK, ids["not_started"])),
+                     make_context())),
+    ("start_sprint_creation", developer.start_sprint_creation,
+     lambda n, ids: (make_update(CEO, text="x"), make_context())),
+    ("show_backlog_tasks", developer.show_backlog_tasks,
+     lambda n, ids: (make_update(CEO, data=callbacks.encode(callbacks.SPRINT_PROJECT, 1)), make_context())),
+    ("collect_tasks_for_sprint pick", developer.collect_tasks_for_sprint,
+     lambda n, ids: (make_update(CEO, data=callbacks.encode(callbacks.BACKLOG_TASK, ids["backlog"])),
+                     make_context({"backlog_project_id": 1, "selected_task_ids": []}))),
+    ("collect_tasks_for_sprint auto", developer.collect_tasks_for_sprint,
+     lambda n, ids: (make_update(CEO, data=callbacks.encode(callbacks.BACKLOG_AUTO)),
+                     make_context({"backlog_project_id": 1}))),
+    ("collect_tasks_for_sprint done", developer.collect_tasks_for_sprint,
+     lambda n, ids: (make_update(CEO, data=callbacks.encode(callbacks.BACKLOG_DONE)),
+                     make_context({"backlog_project_id": 1, "selected_task_ids": ids["backlog_all"]}))),
+    ("start_review_tasks", developer.start_review_tasks, lambda n, ids: (make_update(CEO, text="x"), make_context())),
+    ("review_select_task", developer.review_select_task,
+     lambda n, ids: (make_update(CEO, data=callbacks.encode(callbacks.REVIEW_SELECT, ids["in_review"], 0)),
+                     make_context())),
+    ("review_decision", developer.review_decision,
+     lambda n, ids: (make_update(CEO, text="✅ تأیید"), make_context(review(ids)))),
+    ("review_reason", developer.review_reason,
+     lambda n, ids: (make_update(CEO, text="bad"), make_context(review(ids)))),
+]
+
+
+def run_case(handler, build, n, monkeypatch):
+    team_id, ids = seed(n)
+    update, context = build(n, ids)
+    context.bot = FakeBot()
+    # رندر نمودار در پردازه‌ی جدا ربطی به کوئری‌ها ندارد
+    monkeypatch.setattr(charts, "_render", lambda *args: asyncio.sleep(0, result=b"png"))
+    callback_id = update.callback_query.id if update.callback_query else None
+
+    async def call():
+        with team_scope(team_id):
+            ledger.claim(team_id, next(_update_ids), callback_id)
+            return await handler(update, context)
+
+    with counting() as counter:
+        asyncio.run(call())
+    return counter
+
+
+@pytest.mark.parametrize("name,handler,build", CASES, ids=[c[0] for c in CASES])
+def test_query_count_within_budget_and_independent_of_data_size(db, monkeypatch, name, handler, build):
+    counts = {}
+    for n in SCALES:
+        counter = run_case(handler, build, n, monkeypatch)
+        assert counter.count <= handler.query_budget, "\n".join(counter.statements)
+        counts[n] = counter.count
+    assert counts[SCALES[0]] == counts[SCALES[1]], f"{name}: query count grows with data size {counts}"
+
+
+def test_every_budgeted_handler_is_covered():
+    covered = {handler for _, handler, _ in CASES}
+    budgeted = {
+        obj for module in (bot, admin, developer, charts, dashboard, throttle, profiler)
+        for obj in vars(module).values()
+        if inspect.isfunction(obj) and hasattr(obj, "query_budget")
+    }
+    missing = sorted(f"{h.__module__}.{h.__name__}" for h in budgeted - covered)
+    assert not missing, f"handlers without a budget test: {missing}"
+
+
+def test_every_registered_handler_has_a_budget():
+    app = bot.build_app("1000:test", team_id=1)
+    handlers = []
+    for group_id, group in app.handlers.items():
+        for handler in group:
+            if isinstance(handler, ConversationHandler):
+                handlers += list(handler.entry_points) + list(handler.fallbacks)
+                for state_handlers in handler.states.values():
+                    handlers += state_handlers
+            elif not isinstance(handler, TypeHandler):  # میان‌افزار ورودی/خروجی
+                handlers.append(handler)
+    missing = sorted({
+        f"{h.callback.__module__}.{h.callback.__name__}" for h in handlers if not hasattr(h.callback, "query_budget")
+    })
+    assert not missing, f"registered handlers without a query budget: {missing}"
@@ -0,0 +1,87 @@
+# tests/test_replica.py
+
+import asyncio
+from datetime import date
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+import database.db as db_module
+from database.db import SessionLocal, read_only, current_user_id
+from database.models import Base, User, Project, SprintReview
+from handlers import admin
+from fakes import make_update, make_context, texts
+
+# دو پایگاه‌داده‌ی SQLite جدا به‌عنوان primary و replica؛ محتوای متفاوت نشان می‌دهد هر خواندن از کجا آمده است.
+
+CEO = 1
+
+
+@pytest.fixture
+def replica(db, tmp_path, monkeypatch):
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    Base.metadata.create_all(bind=replica)
+    monkeypatch.setattr(db_module, "replica_engine", replica)
+    monkeypatch.setattr(db_module, "_last_write", {})
+    for bind, notes in ((db, "from primary"), (replica, "from replica")):
+        session = Session(bind=bind)
+        session.add(User(id=1, telegram_id=CEO, name="ceo", role="CEO"))
+        session.add(SprintReview(sprint_id=1, created_by=1, review_date=date.today(), notes=notes))
+        session.commit()
+        session.close()
+    yield replica
+    replica.dispose()
+
+
+def review_notes():
+    update = make_update(CEO, text="/view_sprint_reviews")
+
+    async def run():
+        current_user_id.set(CEO)
+        await admin.view_sprint_reviews(update, make_context())
+
+    asyncio.run(run())
+    return [t for t in texts(update) if "توضیحات" in t]
+
+
+def test_read_only_handler_reads_from_replica(replica):
+    notes = review_notes()
+    assert len(notes) == 1 and "from replica" in notes[0]
+
+
+def test_recent_write_reads_from_primary(replica):
+    async def write():
+        current_user_id.set(CEO)
+        session = SessionLocal()
+        session.add(Project(name="new", created_by=1))
+        session.commit()
+        session.close()
+
+    asyncio.run(write())
+    notes = review_notes()
+    assert len(notes) == 1 and "from primary" in notes[0]
+
+    # پس از پنجره‌ی read-your-writes دوباره از رپلیکا
+    db_module._last_write.clear()
+    assert "from replica" in review_notes()[0]
+
+
+def test_flush_inside_read_only_handler_goes_to_primary(db, replica):
+    @read_only
+    async def handler(update, context):
+        session = SessionLocal()
+        user = session.query(User).filter_by(telegram_id=CEO).first()  # از رپلیکا
+        session.add(Project(name="written", created_by=user.id))
+        session.commit()
+        session.close()
+
+    asyncio.run(handler(None, None))
+
+    def names(bind):
+        session = Session(bind=bind)
+        try:
+            return [p.name for p in session.query(Project).all()]
+        finally:
+            session.close()
+
+    assert names(db) == ["written"]
+    assert names(replica) == []
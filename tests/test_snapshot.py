@@ -0,0 +1,64 @@
+# tests/test_snapshot.py
+
+from datetime import date, datetime
+import pytest
+from sqlalchemy import create_engine, select
+from database.db import SessionLocal
+from database.models import Base, User, Project, Sprint, Task, DailyReport
+from database.tenancy import setup_teams
+from database import snapshot
+
+
+def seed():
+    team_id, = setup_teams(["111:a"])
+    session = SessionLocal()
+    user = User(team_id=team_id, telegram_id=1, name="کاربر", role="CEO", joined_at=datetime(2024, 1, 1, 9, 30))
+    session.add(user)
+    session.flush()
+    project = Project(team_id=team_id, name="P", created_by=user.id, created_at=datetime(2024, 1, 2))
+    sprint = Sprint(team_id=team_id, status="Active", created_by=user.id, start_date=date(2024, 1, 3))
+    session.add_all([project, sprint])
+    session.flush()
+    session.add_all([
+        Task(team_id=team_id, project_id=project.id, sprint_id=sprint.id, title=f"t{i}",
+             status="Backlog", story_point=i, created_at=datetime(2024, 1, 4))
+        for i in range(7)
+    ])
+    session.add(DailyReport(team_id=team_id, user_id=user.id, sprint_id=sprint.id, report_date=date(2024, 1, 5),
+                            completed_tasks="a", planned_tasks="b", blockers=None))
+    session.commit()
+    session.close()
+
+
+def dump(engine):
+    with engine.connect() as conn:
+        return {
+            table.name: conn.execute(select(table).order_by(*table.primary_key.columns)).all()
+            for table in Base.metadata.sorted_tables
+        }
+
+
+def test_export_import_round_trip(db, tmp_path):
+    seed()
+    path = tmp_path / "backup.jsonl.gz"
+    exported = snapshot.export_snapshot(path, db, chunk_size=3)
+    assert exported["tasks"] == 7
+
+    target = create_engine(f"sqlite:///{tmp_path / 'target.db'}")
+    imported = snapshot.import_snapshot(path, target, chunk_size=3)
+    assert imported == exported
+    # تاریخ‌ها، یونیکد و NULL همان مقادیر مبدأ هستند
+    assert dump(target) == dump(db)
+    target.dispose()
+
+
+def test_import_refuses_non_empty_target(db, tmp_path):
+    seed()
+    path = tmp_path / "backup.jsonl.gz"
+    snapshot.export_snapshot(path, db)
+
+    with pytest.raises(ValueError, match="not empty"):
+        snapshot.import_snapshot(path, db)
+    session = SessionLocal()
+    assert session.query(Task).count() == 7
+    session.close()
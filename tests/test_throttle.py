@@ -0,0 +1,54 @@
+# tests/test_throttle.py
+
+import asyncio
+import time
+import pytest
+from telegram.ext import ApplicationHandlerStop
+from handlers import throttle
+from fakes import make_update, make_context
+
+
+@pytest.fixture
+def fresh_throttle(monkeypatch):
+    limiter = throttle.Throttle(rate=1, burst=3, dedupe_window=0)
+    monkeypatch.setattr(throttle, "throttle", limiter)
+    return limiter
+
+
+def _send(user_id, text):
+    update = make_update(user_id, text=text)
+    try:
+        asyncio.run(throttle.throttle_updates(update, make_context(bot_data={"team_id": 1})))
+        return True, update
+    except ApplicationHandlerStop:
+        return False, update
+
+
+def test_flood_is_dropped_without_waiting(fresh_throttle):
+    started = time.monotonic()
+    results = [_send(1, f"m{i}") for i in range(10)]
+    assert time.monotonic() - started < 0.5
+
+    passed = [ok for ok, _ in results]
+    assert passed[:3] == [True] * 3
+    assert not any(passed[3:])
+    # فقط یک بار پیام «آهسته‌تر»
+    notices = [text for _, update in results for _, text, _ in update.sent]
+    assert notices == [throttle.SLOW_DOWN]
+    assert fresh_throttle.stats["dropped_rate"] == 7
+
+
+def test_other_users_are_not_held_back_by_a_flood(fresh_throttle):
+    for i in range(10):
+        _send(1, f"m{i}")
+    assert _send(2, "hi")[0]
+
+
+def test_callback_flood_is_answered(fresh_throttle):
+    for i in range(3):
+        update = make_update(1, data=f"d{i}")
+        asyncio.run(throttle.throttle_updates(update, make_context(bot_data={"team_id": 1})))
+    update = make_update(1, data="d9")
+    with pytest.raises(ApplicationHandlerStop):
+        asyncio.run(throttle.throttle_updates(update, make_context(bot_data={"team_id": 1})))
+    assert update.sent == [("answer", throttle.SLOW_DOWN, None)]
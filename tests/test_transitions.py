@@ -0,0 +1,69 @@
+# tests/test_transitions.py
+
+import threading
+from database.db import SessionLocal
+from database.models import User, Task
+from database import transitions, events
+
+
+def _seed(story_point=5):
+    session = SessionLocal()
+    dev = User(telegram_id=10, name="dev", role="Developer", total_points=0)
+    session.add(dev)
+    session.flush()
+    task = Task(title="t", status="InReview", story_point=story_point, assigned_to=dev.id, version=0)
+    session.add(task)
+    session.commit()
+    ids = dev.id, task.id
+    session.close()
+    return ids
+
+
+def test_concurrent_approvals_on_same_version_award_points_once(db, monkeypatch):
+    dev_id, task_id = _seed()
+    published = []
+    monkeypatch.setattr(events, "_subscribers", [published.extend])
+
+    racers = 8
+    barrier = threading.Barrier(racers)
+    results = []
+
+    def approve():
+        session = SessionLocal()
+        try:
+            barrier.wait()
+            ok = transitions.approve_task(session, task_id, version=0)
+            session.commit()
+            results.append(ok)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=approve) for _ in range(racers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results.count(True) == 1
+    assert results.count(False) == racers - 1
+    session = SessionLocal()
+    task = session.get(Task, task_id)
+    assert task.status == "Completed" and task.version == 1
+    assert session.get(User, dev_id).total_points == 5
+    session.close()
+    assert [(e.task_id, e.to_status) for e in published] == [(task_id, "Completed")]
+
+
+def test_transition_with_stale_version_is_rejected(db):
+    _, task_id = _seed()
+    first, second = SessionLocal(), SessionLocal()
+    try:
+        assert transitions.transition_task(first, task_id, "InReview", "NotStarted", version=0, reason="x")
+        first.commit()
+        assert not transitions.transition_task(second, task_id, "InReview", "Completed", version=0)
+        second.commit()
+        task = second.get(Task, task_id)
+        assert (task.status, task.version, task.reason) == ("NotStarted", 1, "x")
+    finally:
+        first.close()
+        second.close()
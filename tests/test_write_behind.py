@@ -0,0 +1,78 @@
+# tests/test_write_behind.py
+
+import asyncio
+import types
+from datetime import datetime
+import pytest
+import bot
+from database.db import SessionLocal
+from database.models import User
+from database.query_budget import counting
+from database import write_behind
+
+
+def seed_users(n=3):
+    session = SessionLocal()
+    session.add_all([User(id=i, telegram_id=i, name=f"u{i}", role="Developer") for i in range(1, n + 1)])
+    session.commit()
+    session.close()
+
+
+def last_logins():
+    session = SessionLocal()
+    try:
+        return dict(session.query(User.id, User.last_login).order_by(User.id).all())
+    finally:
+        session.close()
+
+
+def test_flush_writes_all_touches_in_one_case_update(db):
+    seed_users()
+    buffer = write_behind.TouchBuffer(User, "last_login")
+    stamps = {i: datetime(2024, 1, i, 12) for i in (1, 2, 3)}
+    buffer.touch(1, datetime(2023, 1, 1))
+    for pk, ts in stamps.items():
+        buffer.touch(pk, ts)  # آخرین مقدار برنده است
+
+    with counting() as counter:
+        assert buffer.flush() == 3
+    updates = [s for s in counter.statements if s.lstrip().upper().startswith("UPDATE")]
+    assert len(updates) == 1 and "CASE" in updates[0]
+    assert last_logins() == stamps
+    assert len(buffer) == 0
+
+
+def test_failed_flush_requeues_without_overwriting_newer_touches(db, monkeypatch):
+    buffer = write_behind.TouchBuffer(User, "last_login")
+    old, newer = datetime(2024, 1, 1), datetime(2024, 2, 1)
+    buffer.touch(1, old)
+    buffer.touch(2, old)
+
+    class FailingSession:
+        def execute(self, *args, **kwargs):
+            buffer.touch(1, newer)  # touch هم‌زمان در حین flush
+            raise RuntimeError("database is down")
+
+        def rollback(self):
+            pass
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(write_behind, "SessionLocal", FailingSession)
+    with pytest.raises(RuntimeError):
+        buffer.flush()
+    assert buffer._pending == {1: newer, 2: old}
+
+
+def test_pending_touches_are_flushed_on_shutdown(db, monkeypatch):
+    seed_users(2)
+    monkeypatch.setattr(write_behind.last_login_buffer, "_pending", {})  # touchهای تست‌های دیگر
+    ts = datetime(2024, 3, 1, 8)
+    write_behind.last_login_buffer.touch(2, ts)
+    monkeypatch.setattr(bot.charts, "shutdown_pool", lambda: None)
+
+    app = types.SimpleNamespace(bot_data={"team_id": None})
+    asyncio.run(bot.post_shutdown(app))
+    assert last_logins() == {1: None, 2: ts}
+    assert len(write_behind.last_login_buffer) == 0